@@ -0,0 +1,209 @@
+
+import numpy as np
+import cv2
+
+from constants import ThermappConstants
+
+
+class AutomaticGainControl:
+    """
+    Maps calibrated 16-bit frames to 8 bits through a lookup table derived from their histogram.
+
+    Every frame is counted with one cv2.calcHist over the levels between its minimum
+    and maximum, into a preallocated buffer, and the 8-bit result is read from the
+    table with one np.take. Nothing is allocated per frame.
+    The histogram is averaged over time, so the mapping follows scene changes
+    smoothly instead of pumping from frame to frame.
+
+    The averaged histogram is only touched where it holds pixels: it is decayed
+    through a global scale factor instead of bin by bin, new counts are added over
+    the frame's range, and the table is rebuilt over the histogram's support. Bins
+    at the ends of the support that no longer hold half a pixel are dropped, so the
+    support follows the scene. Modes:
+        LINEAR: maps the full occupied range linearly.
+        PERCENTILE: maps the range between two percentiles linearly, so a few
+            hot or cold pixels do not compress the rest of the scene.
+        PLATEAU: histogram equalization with every level's count limited to a
+            plateau, which spreads the output over the levels actually present
+            without letting a large uniform background take all of it.
+
+    Frames are expected as uint16 values with ZERO_LEVEL added, so calibrated
+    values below zero are kept.
+
+    Attributes:
+        LINEAR (str): Linear mapping of the occupied range.
+        PERCENTILE (str): Linear mapping between two percentiles.
+        PLATEAU (str): Plateau-limited histogram equalization.
+        ZERO_LEVEL (int): Value representing a calibrated value of zero.
+        mode (str): One of LINEAR, PERCENTILE or PLATEAU.
+        low_percentile (float): Percentile mapped to 0 in PERCENTILE mode.
+        high_percentile (float): Percentile mapped to 255 in PERCENTILE mode.
+        plateau (float): In PLATEAU mode, the most a level may count, as a multiple of
+            the pixels per output level.
+        smoothing (float): Weight of a new frame in the averaged histogram, 0 to 1.
+        histogram (np.ndarray): The averaged histogram (65,536 float64), in units of
+            `histogram_scale` pixels.
+        histogram_scale (float): Number of pixels one histogram unit stands for.
+        lut (np.ndarray): The current 16 to 8-bit table (65,536 uint8).
+        low (int): Lowest level of the mapped range.
+        high (int): Highest level of the mapped range.
+    """
+    LINEAR = "linear"
+    PERCENTILE = "percentile"
+    PLATEAU = "plateau"
+    ZERO_LEVEL = 1 << 15
+    LEVELS = 1 << 16
+
+    def __init__(self, mode: str = PERCENTILE, low_percentile: float = 1.0, high_percentile: float = 99.0,
+                 plateau: float = 2.0, smoothing: float = 0.2, pixel_count: int = ThermappConstants.PIXEL_DATA_SIZE):
+        """
+        Initializes the AutomaticGainControl and allocates its buffers.
+
+        Args:
+            mode (str): One of LINEAR, PERCENTILE or PLATEAU.
+            low_percentile (float): Percentile mapped to 0 in PERCENTILE mode.
+            high_percentile (float): Percentile mapped to 255 in PERCENTILE mode.
+            plateau (float): Plateau in PLATEAU mode, as a multiple of the pixels per output level.
+            smoothing (float): Weight of a new frame in the averaged histogram, 0 to 1;
+                1 follows every frame.
+            pixel_count (int): Number of pixels per frame.
+
+        Raises:
+            ValueError: If a parameter is out of range.
+        """
+        if mode not in (self.LINEAR, self.PERCENTILE, self.PLATEAU):
+            raise ValueError(f"Unknown gain control mode '{mode}'.")
+        if not 0 <= low_percentile < high_percentile <= 100:
+            raise ValueError("Percentiles must satisfy 0 <= low < high <= 100.")
+        if not 0 < smoothing <= 1:
+            raise ValueError("Smoothing must be in (0, 1].")
+        if plateau <= 0:
+            raise ValueError("The plateau must be positive.")
+        self.mode = mode
+        self.low_percentile = low_percentile
+        self.high_percentile = high_percentile
+        self.plateau = plateau
+        self.smoothing = smoothing
+        self.pixel_count = pixel_count
+
+        self.histogram = np.zeros(self.LEVELS, dtype=np.float64)
+        self.histogram_scale = 1.0
+        self.lut = np.zeros(self.LEVELS, dtype=np.uint8)
+        self.low = 0
+        self.high = self.LEVELS - 1
+        # Levels [support_start, support_end) may hold pixels
+        self._support_start = 0
+        self._support_end = 0
+        # np.take converts other index types to intp in a temporary array
+        self._indices = np.empty(pixel_count, dtype=np.intp)
+        # calcHist counts exactly up to 2 ** 24 pixels per level in float32, and writes
+        # into this buffer when given a (levels, 1) view of it
+        self._frame_counts = np.empty((self.LEVELS, 1), dtype=np.float32)
+        self._work = np.empty(self.LEVELS, dtype=np.float64)
+        self._cumulative = np.empty(self.LEVELS, dtype=np.float64)
+        self._levels = np.arange(self.LEVELS, dtype=np.float64)
+
+    def reset(self) -> None:
+        """
+        Forgets the averaged histogram; the next frame sets it anew.
+        """
+        self.histogram[self._support_start:self._support_end] = 0
+        self.histogram_scale = 1.0
+        self._support_start = self._support_end = 0
+
+    def apply(self, frame: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """
+        Counts a frame into the histogram, updates the table and maps the frame to 8 bits.
+
+        Args:
+            frame (np.ndarray): Calibrated uint16 pixel data with ZERO_LEVEL added.
+            out (np.ndarray): uint8 buffer of the same size to write the result into.
+
+        Returns:
+            np.ndarray: `out`.
+        """
+        # cv2 takes a flat array as one column, which it walks row by row
+        pixels = frame.reshape(1, -1)
+        minimum, maximum = cv2.minMaxLoc(pixels)[:2]
+        start, end = int(minimum), int(maximum) + 1
+        # Counting only the occupied levels is much faster than np.bincount, which
+        # allocates its int64 result on every call
+        counts = cv2.calcHist([pixels], [0], None, [end - start], [start, end],
+                              hist=self._frame_counts[:end - start]).reshape(-1)
+        self._update(counts, start, end)
+        indices = self._indices
+        np.copyto(indices, frame.reshape(-1))
+        return np.take(self.lut, indices, out=out.reshape(-1), mode="clip").reshape(out.shape)
+
+    def _update(self, counts: np.ndarray, start: int, end: int):
+        # `counts` holds the frame's counts of levels [start, end)
+        histogram = self.histogram
+        if self._support_end <= self._support_start:
+            np.copyto(histogram[start:end], counts)
+            self.histogram_scale = 1.0
+            self._support_start, self._support_end = start, end
+        else:
+            # Decay everything through the scale, then add the frame's share
+            self.histogram_scale *= 1 - self.smoothing
+            weight = self.smoothing / self.histogram_scale
+            window = self._work[start:end]
+            # Widen before scaling; a ufunc casting its input allocates a buffer
+            np.copyto(window, counts)
+            window *= weight
+            histogram[start:end] += window
+            if self.histogram_scale < 1e-100:
+                histogram[self._support_start:self._support_end] *= self.histogram_scale
+                self.histogram_scale = 1.0
+            self._trim_support(start, end)
+
+        support_start, support_end = self._support_start, self._support_end
+        size = support_end - support_start
+        bins = histogram[support_start:support_end]
+        cumulative = self._cumulative[:size]
+        if self.mode == self.PLATEAU:
+            clipped = self._work[:size]
+            np.minimum(bins, self.plateau * self.pixel_count / 256 / self.histogram_scale, out=clipped)
+            np.cumsum(clipped, out=cumulative)
+        else:
+            np.cumsum(bins, out=cumulative)
+        total = cumulative[-1]
+        if total <= 0:
+            return
+
+        if self.mode == self.PLATEAU:
+            # Equalization: the output level is the cumulative share of the clipped histogram
+            cumulative *= 255 / total
+            np.copyto(self.lut[support_start:support_end], cumulative, casting="unsafe")
+            self.low = support_start + int(np.searchsorted(cumulative, 0, side="right"))
+            self.high = support_start + int(np.searchsorted(cumulative, 255 * (1 - 1e-9)))
+        else:
+            if self.mode == self.LINEAR:
+                low_fraction, high_fraction = 0.0, 1.0
+            else:
+                low_fraction, high_fraction = self.low_percentile / 100, self.high_percentile / 100
+            # First level above the low share, last level below the high share
+            self.low = support_start + int(np.searchsorted(cumulative, total * low_fraction, side="right"))
+            self.high = max(support_start + int(np.searchsorted(cumulative, total * high_fraction)),
+                            self.low + 1)
+            ramp = self._work[:size]
+            np.subtract(self._levels[support_start:support_end], self.low, out=ramp)
+            ramp *= 255 / (self.high - self.low)
+            np.clip(ramp, 0, 255, out=ramp)
+            np.copyto(self.lut[support_start:support_end], ramp, casting="unsafe")
+        self.lut[:support_start] = 0
+        self.lut[support_end:] = 255
+
+    def _trim_support(self, start: int, end: int):
+        # Widen the support to the frame's range, then drop end bins of the averaged
+        # histogram outside that range which together hold less than half a pixel
+        histogram = self.histogram
+        support_start = min(self._support_start, start)
+        support_end = max(self._support_end, end)
+        threshold = 0.5 / self.histogram_scale
+        if support_start < start and histogram[support_start:start].sum() < threshold:
+            histogram[support_start:start] = 0
+            support_start = start
+        if end < support_end and histogram[end:support_end].sum() < threshold:
+            histogram[end:support_end] = 0
+            support_end = end
+        self._support_start, self._support_end = support_start, support_end
@@ -1,188 +1,631 @@
-import threading
-import numpy as np
-import cv2
-import time
-import os
-from collections import deque
-from config import ThermappConfig
-from constants import ThermappConstants
-from data_processing import ThermappDataProcessing
-from frame import FrameReader, DisplayThread
-from device import ThermappDevice
-from transfer import AsyncTransferManager, TransferManager
-import matplotlib.pyplot as plt
-
-
-
-
-class ThermappApplication:
-    
-
-    def __init__(self, device: ThermappDevice):
-        # Device and transfer setup
-        self.device = device
-        self.config = ThermappConfig().config_package
-        self.transfer_manager = TransferManager(self.device, self.config)
-        self.async_transfer_manager = AsyncTransferManager(self.transfer_manager)
-
-        # Data processing and display
-        self.data_processing = ThermappDataProcessing()
-        self.frame_reader = FrameReader()
-        self.display_thread = DisplayThread()
-        
-        
-
-        # Control flags
-        self.running = True
-
-        # Circular buffer for recalibration
-        self.circular_buffer_size = 300
-        self.circular_buffer = deque(maxlen=self.circular_buffer_size)
-
-        # Timing and calibration parameters
-        self.start_time = time.time()
-        self.warmup_duration = 300  # Seconds
-        self.recalibration_frames_to_average = 50
-        self.recalibration_interval_fast = 30   # seconds during warmup
-        self.recalibration_interval_slow = 300  # seconds after warmup
-        self.last_recalibration_time = self.start_time
-
-        # Calibration & offset
-        self.calibration_image = np.zeros(ThermappConstants.PIXEL_DATA_SIZE, dtype=np.float32)
-        self.global_offset = 70  # initial brightness offset
-
-        # Dataset saving configuration
-        self.save_dir = "dataset"
-        os.makedirs(self.save_dir, exist_ok=True)
-        self.save_interval = 30       # save every 30 frames
-        self.frame_counter = 0        # initialize frame counter
-       # self.plotted_raw = True  # added for raw data plot
-
-        
-       
-
-    def start(self):
-        print("[DEBUG] Starting async transfer thread")
-        thread_async_transfer = threading.Thread(target=self.async_transfer_manager.start_async_read)
-        thread_async_transfer.start()
-
-        print("[DEBUG] Performing initial calibration")
-        self.initial_calibration()
-
-        
-
-
-        print("[DEBUG] Starting main loop thread")
-        self.running = True
-        thread_main_loop = threading.Thread(target=self.main_loop)
-        thread_main_loop.start()
-
-    def stop(self):
-        self.async_transfer_manager.stop_async_read()
-        self.running = False
-        self.display_thread.stop()
-        cv2.destroyAllWindows()
-
-    def initial_calibration(self):
-        sum_calibration = np.zeros((ThermappConstants.PIXEL_DATA_SIZE), dtype=np.float32)
-        for i in range(self.recalibration_frames_to_average):
-            frame = self.frame_reader.read_frame()
-            print(f"[DEBUG] Initial calibration frame {i+1}/{self.recalibration_frames_to_average}")
-            if frame is not None:
-                packet = self.data_processing.parse_frame_data(frame)
-                sum_calibration += packet["pixels_data"]
-        self.calibration_image = (sum_calibration / self.recalibration_frames_to_average).astype(np.float32)
-        print("[DEBUG] Initial calibration complete.")
-
-    def main_loop(self):
-        print("[DEBUG] Main loop started")
-        while self.running:
-            frame = self.frame_reader.read_frame()
-            if frame is not None:
-                try:
-                    # Parse raw data
-                    packet = self.data_processing.parse_frame_data(frame)
-                   # print("Raw pixel values:", packet["pixels_data"]) ########### uncomment to print the raw values from camera input
-
-                    pixels_data = packet["pixels_data"]
-                    self.circular_buffer.append(pixels_data)
-
-                    # Process and display
-                    processed_frame = self.process_frame(pixels_data)
-                    self.display_thread.enqueue_frame(processed_frame)
-
-                    # Save frame for dataset every Nth frame
-                    self.frame_counter += 1
-                    if self.frame_counter % self.save_interval == 0:
-                        save_path = os.path.join(self.save_dir,
-                                                f"frame_{self.frame_counter}.jpg")
-
-                        # RGB conversion / resize / rotate steps …
-                        img_reshaped = processed_frame.reshape((288, 384, 1))
-                        img_rgb      = np.repeat(img_reshaped, 3, axis=2)
-                        img_resized  = cv2.resize(img_rgb, (384*2, 288*2))
-                        img_rotated  = cv2.rotate(img_resized, cv2.ROTATE_90_CLOCKWISE)
-
-
-                        
-
-                        # write out the JPEG
-                        cv2.imwrite(save_path, img_rotated)
-
-                        #rollign recalibration 
-                        #self.check_recalibration() ######  uncomment it o apply rolling recalibration
-
-                        
-
-                        
-                except Exception as e:
-                    print(f"Error processing frame: {e}")
-
-
-
-    def process_frame(self, frame: np.ndarray) -> np.ndarray:
-        """
-        Applies calibration and global offset to raw frame data.
-        """
-        frame_trans = (frame.astype(np.float32) - self.calibration_image) + self.global_offset
-        frame_trans = np.clip(frame_trans, 0, 255).astype(np.uint8)
-        print(f"[DEBUG] Displaying frame | min: {frame_trans.min()} max: {frame_trans.max()}")
-        return frame_trans
-
-    def check_recalibration(self):
-        """
-        Periodically re-calibrates using the circular buffer of recent frames.
-        """
-        current_time = time.time()
-        elapsed = current_time - self.start_time
-        # choose interval based on warmup
-        interval = (self.recalibration_interval_fast
-                    if elapsed < self.warmup_duration
-                    else self.recalibration_interval_slow)
-
-        if (current_time - self.last_recalibration_time >= interval and
-                len(self.circular_buffer) >= self.recalibration_frames_to_average):
-            self.last_recalibration_time = current_time
-            print("[DEBUG] Performing recalibration from circular buffer...")
-            frames = list(self.circular_buffer)[-self.recalibration_frames_to_average:]
-            stacked = np.stack(frames)
-            average_calibration = np.mean(stacked, axis=0).astype(np.float32)
-            self.apply_blended_calibration(average_calibration)
-            self.auto_adjust_global_offset()
-            print("[DEBUG] Recalibration applied.")
-
-    def apply_blended_calibration(self, new_calibration: np.ndarray):
-        self.calibration_image = 0.9 * self.calibration_image + 0.1 * new_calibration
-
-    def auto_adjust_global_offset(self):
-        """
-        Adjusts global offset to center image brightness around mid-range.
-        """
-        test_frame = (list(self.circular_buffer)[-1].astype(np.float32)
-                      - self.calibration_image)
-        mean_value = np.mean(test_frame)
-        desired_mean = 128
-        offset_adjustment = desired_mean - mean_value
-        self.global_offset += 0.5 * offset_adjustment
-        self.global_offset = np.clip(self.global_offset, 50, 150)
-        print(f"[DEBUG] Adjusted global offset to: {self.global_offset}")
+import threading
+import numpy as np
+import cv2
+import time
+import os
+from agc import AutomaticGainControl
+from calibration import BadPixelMap, CalibrationCache, CalibrationRing, NonUniformityCorrection
+from config import ThermappConfig
+from constants import ThermappConstants
+from data_processing import ThermappDataProcessing
+from denoise import TemporalDenoiser
+from frame import FrameReader, DisplayThread
+from frame_pool import FramePool
+from metrics import MetricsServer, metrics_registry
+from processing import FrameProcessor
+from queue_handler import ThermappDataQueueHandler
+from radiometry import RadiometricConverter
+from roi import RoiEngine
+from recording import RawFrameRecorder
+from sequence_tracker import FrameSequenceTracker
+from shared_frames import AcquisitionProcess, SharedFrameReader
+from device import ThermappDevice
+from transfer import AsyncTransferManager, TransferManager, TransferStrategy
+import matplotlib.pyplot as plt
+
+
+
+
+class ThermappApplication:
+    
+
+    def __init__(self, device: ThermappDevice | None, transfer_strategy: TransferStrategy | None = None,
+                 frame_source=None, headless: bool = False, calibration_cache: CalibrationCache | None = None,
+                 save_dir: str = "dataset"):
+        # Device and transfer setup; a frame source such as ReplayDevice or an
+        # AcquisitionProcess stands in for the USB transfers
+        self.device = device
+        self.config = ThermappConfig().config_package
+        self.transfer_manager = TransferManager(self.device, self.config)
+        self.async_transfer_manager = frame_source or AsyncTransferManager(self.transfer_manager, transfer_strategy)
+
+        # Reusable frame buffers
+        self.frame_pool = FramePool()
+
+        # Data processing and display
+        self.data_processing = ThermappDataProcessing()
+        if isinstance(self.async_transfer_manager, AcquisitionProcess):
+            # Frames are framed in the acquisition process and read from shared memory
+            self.frame_reader = SharedFrameReader(self.async_transfer_manager, frame_pool=self.frame_pool)
+        else:
+            self.frame_reader = FrameReader(frame_pool=self.frame_pool)
+        self.headless = headless
+        # Raw count to temperature conversion through a lookup table, shared with the
+        # display for its readouts
+        self.radiometric_converter = RadiometricConverter()
+        self.temperature_map = np.empty(ThermappConstants.PIXEL_DATA_SIZE, dtype=np.float32)
+        self.display_thread = DisplayThread(frame_pool=self.frame_pool, headless=headless,
+                                            radiometric_converter=self.radiometric_converter)
+
+        # Optional temporal filtering of the raw frames before calibration, a TemporalDenoiser
+        self.denoiser = None
+
+        # Temperature statistics of the regions added to the ROI engine, updated every frame
+        self.roi_engine = RoiEngine(radiometric_converter=self.radiometric_converter)
+        self.roi_statistics = None
+        
+        
+
+        # Control flags
+        self.running = True
+        self.main_loop_thread = None
+
+        # Longest time a frame read blocks before the main loop checks whether it should stop
+        self.read_timeout = 0.5
+        ThermappDataQueueHandler.read_timeout = self.read_timeout
+
+        # Timing and calibration parameters
+        self.start_time = time.time()
+        self.warmup_duration = 300  # Seconds
+        self.recalibration_frames_to_average = 50
+        self.recalibration_interval_fast = 30   # seconds during warmup
+        self.recalibration_interval_slow = 300  # seconds after warmup
+        self.last_recalibration_time = self.start_time
+
+        # Preallocated ring of recent frames for recalibration, with a running sum
+        # over the newest frames so their average is always ready
+        self.circular_buffer_size = 300
+        self.calibration_ring = CalibrationRing(self.circular_buffer_size, self.recalibration_frames_to_average)
+        self.recalibration_average = np.empty(ThermappConstants.PIXEL_DATA_SIZE, dtype=np.float32)
+
+        # Calibration profiles cached on disk per device and sensor temperature; on a
+        # cache hit, startup skips the frame averaging and the live average of the next
+        # few calibration windows is blended in instead
+        self.calibration_cache = calibration_cache if calibration_cache is not None else CalibrationCache()
+        self.calibration_key = CalibrationCache.device_key(device)
+        self.sensor_temperature = None
+        self.live_blend_windows = 0
+        self.live_blend_weight = 0.5
+
+        # Calibration, global offset or automatic gain control, non-uniformity correction
+        # and bad pixel replacement, shared with ThermappCamera. Dead and noisy pixels are
+        # detected from the calibration ring once it holds a full window and at every
+        # recalibration, and replaced in the raw pixel data of every frame, before
+        # denoising, calibration, ROI statistics and probes
+        self.processor = FrameProcessor(self.frame_pool)
+        self.processor.load_corrections(self.calibration_cache, self.calibration_key)
+        self.bad_pixel_variance = np.empty(ThermappConstants.PIXEL_DATA_SIZE, dtype=np.float32)
+        self.nuc_references = []
+
+        # Dataset saving configuration
+        self.save_dir = save_dir
+        os.makedirs(self.save_dir, exist_ok=True)
+        self.save_interval = 30       # save every 30 frames
+        self.frame_counter = 0        # initialize frame counter
+
+        # Frame loss accounting from the frame_number header counter; lost frames are
+        # attributed to the stage whose drop counters moved since the previous frame
+        self.sequence_tracker = FrameSequenceTracker()
+        self.lost_frames_by_stage = {}
+        self.loss_indicators = None
+
+        # Raw 16-bit recording, enabled with start_recording(). Frames are indexed with
+        # their capture time, converted from the monotonic clock to seconds since the epoch
+        self.recorder = None
+        self.wall_clock_offset = time.time() - time.monotonic()
+
+        # Pipeline metrics, served over HTTP with start_metrics_server()
+        self.metrics_server = None
+        self.register_metrics()
+       # self.plotted_raw = True  # added for raw data plot
+
+        
+       
+
+    def start(self):
+        print("[DEBUG] Starting async transfer thread")
+        thread_async_transfer = threading.Thread(target=self.async_transfer_manager.start_async_read)
+        thread_async_transfer.start()
+
+        print("[DEBUG] Performing initial calibration")
+        self.initial_calibration()
+
+        
+
+
+        print("[DEBUG] Starting main loop thread")
+        self.running = True
+        self.main_loop_thread = threading.Thread(target=self.main_loop)
+        self.main_loop_thread.start()
+
+    def stop(self):
+        self.async_transfer_manager.stop_async_read()
+        self.running = False
+        if self.main_loop_thread is not None and self.main_loop_thread is not threading.current_thread():
+            self.main_loop_thread.join()
+        self.main_loop_thread = None
+        if isinstance(self.frame_reader, SharedFrameReader):
+            self.frame_reader.close()
+        if isinstance(self.async_transfer_manager, AcquisitionProcess):
+            self.async_transfer_manager.close()
+        self.display_thread.stop()
+        self.stop_recording()
+        self.stop_metrics_server()
+        if not self.headless:
+            cv2.destroyAllWindows()
+
+    def register_metrics(self):
+        """
+        Exposes queue depths, drop and resync counters of the pipeline components.
+
+        These are read from the components when the metrics are scraped, so they cost
+        nothing per frame.
+        """
+        if isinstance(self.frame_reader, SharedFrameReader):
+            # Framing runs in the acquisition process, which reports through the ring header
+            shared_ring = self.frame_reader.ring
+            metrics_registry.register("ring_buffer_overflow_bytes_total", lambda: shared_ring.get("overflow_bytes"),
+                                      "Bytes dropped because the USB ring buffer was full", kind="counter")
+            metrics_registry.register("resyncs_total", lambda: shared_ring.get("resync_count"),
+                                      "Times the frame synchronizer lost and found the start header", kind="counter")
+            metrics_registry.register("skipped_bytes_total", lambda: shared_ring.get("skipped_bytes"),
+                                      "Bytes skipped while looking for a start header", kind="counter")
+            metrics_registry.register("frames_total", lambda: shared_ring.sequence,
+                                      "Complete frames assembled from the USB stream", kind="counter")
+            metrics_registry.register("shared_ring_missed_frames_total", lambda: self.frame_reader.missed_frames,
+                                      "Frames overwritten in the shared ring before they were read", kind="counter")
+        else:
+            ring = ThermappDataQueueHandler.received_data_ring
+            synchronizer = self.frame_reader.synchronizer
+            metrics_registry.register("ring_buffer_bytes", lambda: ring.available,
+                                      "Bytes waiting in the USB ring buffer")
+            metrics_registry.register("ring_buffer_overflow_bytes_total", lambda: ring.overflow_bytes,
+                                      "Bytes dropped because the USB ring buffer was full", kind="counter")
+            metrics_registry.register("ring_buffer_wait_seconds_total", lambda: ring.wait_seconds,
+                                      "Time the frame reader spent waiting for USB data", kind="counter")
+            metrics_registry.register("resyncs_total", lambda: synchronizer.resync_count,
+                                      "Times the frame synchronizer lost and found the start header", kind="counter")
+            metrics_registry.register("skipped_bytes_total", lambda: synchronizer.skipped_bytes,
+                                      "Bytes skipped while looking for a start header", kind="counter")
+            metrics_registry.register("frames_total", lambda: synchronizer.frame_count,
+                                      "Complete frames assembled from the USB stream", kind="counter")
+        tracker = self.sequence_tracker
+        metrics_registry.register("sequence_received_frames_total", lambda: tracker.received,
+                                  "Distinct frames received according to the frame counter", kind="counter")
+        metrics_registry.register("sequence_lost_frames_total", lambda: tracker.lost,
+                                  "Frames missing from the frame counter sequence", kind="counter")
+        metrics_registry.register("sequence_lost_frames_by_stage_total", lambda: dict(self.lost_frames_by_stage),
+                                  "Lost frames by the stage that most likely dropped them",
+                                  kind="counter", label="stage")
+        metrics_registry.register("sequence_duplicate_frames_total", lambda: tracker.duplicates,
+                                  "Frames received twice", kind="counter")
+        metrics_registry.register("sequence_reordered_frames_total", lambda: tracker.reordered,
+                                  "Frames received after a later frame", kind="counter")
+        metrics_registry.register("sequence_resets_total", lambda: tracker.resets,
+                                  "Jumps of the frame counter not counted as loss", kind="counter")
+
+        def per_roi(field):
+            def values():
+                statistics = self.roi_statistics
+                if statistics is None:
+                    return None
+                return dict(zip(self.roi_engine.names, getattr(statistics, field)))
+            return values
+
+        metrics_registry.register("roi_mean_celsius", per_roi("mean"), "Mean temperature per region of interest",
+                                  label="roi")
+        metrics_registry.register("roi_max_celsius", per_roi("max"), "Maximum temperature per region of interest",
+                                  label="roi")
+        metrics_registry.register("sequence_loss_ratio", lambda: tracker.loss_ratio,
+                                  "Fraction of the frames sent by the camera that were lost")
+        metrics_registry.register("capture_rate_frames_per_second", lambda: tracker.capture_rate,
+                                  "Received frames per second of capture time")
+        metrics_registry.register("display_queue_frames", lambda: len(self.display_thread.frame_channel),
+                                  "Frames waiting for the display thread")
+        metrics_registry.register("display_dropped_frames_total", lambda: self.display_thread.dropped_frames,
+                                  "Frames replaced before the display thread could show them", kind="counter")
+        metrics_registry.register("frame_pool_available", lambda: {kind: self.frame_pool.available(kind)
+                                                                   for kind in self.frame_pool.specs},
+                                  "Free buffers in the frame pool")
+        metrics_registry.register("frame_pool_misses_total", lambda: dict(self.frame_pool.miss_counts),
+                                  "Frame pool acquisitions that had to allocate", kind="counter")
+        metrics_registry.register("frame_pool_bad_releases_total",
+                                  lambda: {"double": self.frame_pool.double_release_count,
+                                           "foreign": self.frame_pool.foreign_release_count},
+                                  "Frame pool releases of free or foreign buffers", kind="counter")
+        metrics_registry.register("recording_queue_frames",
+                                  lambda: self.recorder.frame_queue.qsize() if self.recorder else None,
+                                  "Frames waiting to be written to the raw recording")
+        metrics_registry.register("recording_dropped_frames_total",
+                                  lambda: self.recorder.dropped_frames if self.recorder else None,
+                                  "Frames the raw recording dropped because its queue was full", kind="counter")
+
+        if isinstance(self.async_transfer_manager, AsyncTransferManager):
+            manager = self.async_transfer_manager
+            metrics_registry.register("usb_throughput_bytes_per_second",
+                                      lambda: manager.current_statistics.throughput,
+                                      "Bytes received per second from the USB transfers")
+            metrics_registry.register("usb_callback_rate", lambda: manager.current_statistics.callback_rate,
+                                      "Completed USB transfers per second")
+
+    def _loss_indicators(self) -> dict:
+        """
+        Returns the drop counters of the stages before the main loop, by stage name.
+        """
+        if isinstance(self.frame_reader, SharedFrameReader):
+            ring = self.frame_reader.ring
+            return {"ring_overflow": ring.get("overflow_bytes"), "framing": ring.get("skipped_bytes"),
+                    "shared_ring": self.frame_reader.missed_frames}
+        return {"ring_overflow": ThermappDataQueueHandler.received_data_ring.overflow_bytes,
+                "framing": self.frame_reader.synchronizer.skipped_bytes}
+
+    def track_sequence(self, frame_number: int):
+        """
+        Accounts for a received frame and attributes any frames missing before it.
+
+        Frames missing while no host-side drop counter moved were lost before reaching
+        the host, on the camera or USB side, and are attributed to "usb".
+
+        Args:
+            frame_number (int): The frame_number header field of the frame.
+
+        Returns:
+            FrameSequenceInfo: The sequence information of the frame.
+        """
+        info = self.sequence_tracker.observe(frame_number, self.frame_reader.capture_time)
+        indicators = self._loss_indicators()
+        if info.missing:
+            stage = "usb"
+            if self.loss_indicators is not None:
+                for name, value in indicators.items():
+                    if value != self.loss_indicators.get(name):
+                        stage = name
+                        break
+            self.lost_frames_by_stage[stage] = self.lost_frames_by_stage.get(stage, 0) + info.missing
+        self.loss_indicators = indicators
+        return info
+
+    def start_metrics_server(self, port: int = 9108, host: str = "127.0.0.1") -> int:
+        """
+        Serves the pipeline metrics in the Prometheus text format at http://<host>:<port>/metrics.
+
+        Returns:
+            int: The port the server listens on.
+        """
+        self.stop_metrics_server()
+        self.metrics_server = MetricsServer(metrics_registry, host=host, port=port)
+        self.metrics_server.start()
+        return self.metrics_server.port
+
+    def stop_metrics_server(self):
+        server, self.metrics_server = self.metrics_server, None
+        if server is not None:
+            server.stop()
+
+    def start_recording(self, path_prefix: str):
+        """
+        Starts recording complete raw frames to `<path_prefix>.raw` with a `.idx` index.
+        """
+        self.stop_recording()
+        self.recorder = RawFrameRecorder(path_prefix)
+
+    def stop_recording(self):
+        """
+        Stops the current raw recording, if any, once the queued frames are written.
+        """
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
+
+    def initial_calibration(self):
+        sum_calibration = np.zeros((ThermappConstants.PIXEL_DATA_SIZE), dtype=np.float32)
+        # Frames of a shared ring are summed in place, into the second buffer, and the
+        # sum is only kept if the producer did not overwrite the frame meanwhile
+        next_sum = np.empty_like(sum_calibration)
+        shared = isinstance(self.frame_reader, SharedFrameReader)
+        collected = 0
+        while collected < self.recalibration_frames_to_average and self.running:
+            # Reads time out while the camera is paused; wait for the frames we need
+            if shared:
+                sequence, frame = self.frame_reader.read_frame_view() or (0, None)
+            else:
+                frame = self.frame_reader.read_frame()
+            if frame is not None:
+                packet = self.data_processing.parse_frame_data(frame)
+                np.add(sum_calibration, packet["pixels_data"], out=next_sum)
+                if shared:
+                    if not self.frame_reader.ring.is_current(sequence):
+                        self.frame_reader.missed_frames += 1
+                        continue
+                else:
+                    self.frame_pool.release(frame)
+                sum_calibration, next_sum = next_sum, sum_calibration
+                collected += 1
+                print(f"[DEBUG] Initial calibration frame {collected}/{self.recalibration_frames_to_average}")
+                self.track_sequence(packet["frame_number"])
+                self.sensor_temperature = int(packet["temperature"])
+
+                if collected == 1 and self.load_cached_calibration():
+                    return
+        if collected == 0:
+            return
+        self.processor.set_calibration(sum_calibration / collected)
+        self.save_calibration()
+        print("[DEBUG] Initial calibration complete.")
+
+    def load_cached_calibration(self) -> bool:
+        """
+        Loads the cached calibration profile closest to the current sensor temperature.
+
+        Returns:
+            bool: True if a profile was loaded.
+        """
+        cached = self.calibration_cache.load(self.calibration_key, self.sensor_temperature)
+        if cached is None:
+            return False
+        calibration_image, profile_temperature = cached
+        self.processor.set_calibration(calibration_image)
+        self.live_blend_windows = 3
+        print(f"[DEBUG] Loaded cached calibration for {self.calibration_key} recorded at sensor "
+              f"temperature {profile_temperature} (now {self.sensor_temperature}).")
+        return True
+
+    def save_calibration(self):
+        """
+        Stores the current calibration image in the calibration cache.
+        """
+        if self.sensor_temperature is None:
+            return
+        try:
+            self.calibration_cache.save(self.calibration_key, self.sensor_temperature, self.processor.calibration_image)
+        except OSError as error:
+            print(f"Saving calibration failed: {error}")
+
+    def blend_live_calibration(self):
+        """
+        Blends the live average of the calibration ring into a calibration loaded from
+        the cache, once per full window, and stores the result when done.
+        """
+        average = self.calibration_ring.average(out=self.recalibration_average)
+        self.apply_blended_calibration(average, self.live_blend_weight)
+        self.live_blend_windows -= 1
+        if self.live_blend_windows == 0:
+            self.save_calibration()
+            print("[DEBUG] Cached calibration refined with live frames.")
+
+    def main_loop(self):
+        print("[DEBUG] Main loop started")
+        while self.running:
+            # Frames from a shared ring are copied here, since they outlive the ring's
+            # overwrite check: their pixels are corrected in place and handed on
+            frame = self.frame_reader.read_frame()
+            if frame is not None:
+                try:
+                    # Parse raw data
+                    frame_start = time.perf_counter()
+                    packet = self.data_processing.parse_frame_data(frame)
+                   # print("Raw pixel values:", packet["pixels_data"]) ########### uncomment to print the raw values from camera input
+                    parsed = time.perf_counter()
+                    metrics_registry.observe_stage("parse", parsed - frame_start)
+
+                    sequence_info = self.track_sequence(packet["frame_number"])
+
+                    recorder = self.recorder
+                    if recorder is not None:
+                        recorder.record(frame, packet["frame_number"], packet["temperature"],
+                                        sequence_info.capture_time + self.wall_clock_offset)
+
+                    pixels_data = packet["pixels_data"]
+                    self.sensor_temperature = int(packet["temperature"])
+                    self.calibration_ring.append(pixels_data)
+                    if self.live_blend_windows and self.calibration_ring.count % self.calibration_ring.window == 0:
+                        self.blend_live_calibration()
+                    if self.processor.bad_pixels is None and self.calibration_ring.count == self.calibration_ring.window:
+                        self.update_bad_pixels()
+
+                    # Replace bad pixels in the raw frame itself; the calibration ring
+                    # keeps them, so they can be detected again
+                    self.processor.correct_raw(pixels_data)
+
+                    # Denoise; the calibration ring, probes and ROIs keep the unfiltered frame
+                    filtered = pixels_data
+                    if self.denoiser is not None:
+                        start = time.perf_counter()
+                        filtered = self.denoiser.filter(pixels_data)
+                        metrics_registry.observe_stage("denoise", time.perf_counter() - start)
+
+                    # Process
+                    start = time.perf_counter()
+                    processed_frame = self.process_frame(filtered)
+                    metrics_registry.observe_stage("calibration", time.perf_counter() - start)
+
+                    if len(self.roi_engine):
+                        start = time.perf_counter()
+                        self.roi_statistics = self.roi_engine.compute(pixels_data)
+                        metrics_registry.observe_stage("roi", time.perf_counter() - start)
+
+                    # Save frame for dataset every Nth frame
+                    self.frame_counter += 1
+                    if self.frame_counter % self.save_interval == 0:
+                        start = time.perf_counter()
+                        self.save_dataset_frame(processed_frame)
+                        metrics_registry.observe_stage("save", time.perf_counter() - start)
+
+                        #rollign recalibration 
+                        #self.check_recalibration() ######  uncomment it o apply rolling recalibration
+
+                    # Display; the display thread releases the image and the raw frame,
+                    # kept for temperature readouts, once they are replaced
+                    self.display_thread.enqueue_frame(processed_frame, raw=pixels_data)
+                    frame = None
+                    metrics_registry.observe_stage("pipeline", time.perf_counter() - frame_start)
+                    metrics_registry.observe_stage("capture_to_display", time.monotonic() - sequence_info.capture_time)
+
+                except Exception as e:
+                    print(f"Error processing frame: {e}")
+                finally:
+                    self.frame_pool.release(frame)
+
+
+
+    def save_dataset_frame(self, processed_frame: np.ndarray):
+        """
+        Writes a processed frame to the dataset directory as an upscaled, rotated JPEG.
+        """
+        save_path = os.path.join(self.save_dir,
+                                 f"frame_{self.frame_counter}.jpg")
+
+        # RGB conversion / resize / rotate steps …
+        img_reshaped = processed_frame.reshape((288, 384, 1))
+        img_rgb      = np.repeat(img_reshaped, 3, axis=2)
+        img_resized  = cv2.resize(img_rgb, (384*2, 288*2))
+        img_rotated  = cv2.rotate(img_resized, cv2.ROTATE_90_CLOCKWISE)
+
+        # write out the JPEG
+        cv2.imwrite(save_path, img_rotated)
+
+    def process_frame(self, frame: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Turns raw frame data, whose bad pixels have been replaced already, into an
+        8-bit image with the application's FrameProcessor.
+        """
+        return self.processor.process(frame, out)
+
+    def frame_temperatures(self, pixels: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Converts a raw frame to degrees Celsius.
+
+        Args:
+            pixels (np.ndarray): The raw uint16 pixel data.
+            out (np.ndarray | None): float32 buffer to write into. Defaults to
+                `temperature_map`, which is overwritten by the next call.
+
+        Returns:
+            np.ndarray: The temperatures, in the shape of `pixels`.
+        """
+        if out is None:
+            out = self.temperature_map.reshape(pixels.shape)
+        return self.radiometric_converter.to_celsius(pixels, out=out)
+
+    def check_recalibration(self):
+        """
+        Periodically re-calibrates using the running average of the calibration ring.
+
+        The average is kept up to date as frames arrive, so recalibrating costs a few
+        passes over one frame and does not stall the frame loop.
+        """
+        current_time = time.time()
+        elapsed = current_time - self.start_time
+        # choose interval based on warmup
+        interval = (self.recalibration_interval_fast
+                    if elapsed < self.warmup_duration
+                    else self.recalibration_interval_slow)
+
+        if (current_time - self.last_recalibration_time >= interval and
+                self.calibration_ring.window_count >= self.recalibration_frames_to_average):
+            self.last_recalibration_time = current_time
+            print("[DEBUG] Performing recalibration from circular buffer...")
+            average_calibration = self.calibration_ring.average(out=self.recalibration_average)
+            self.apply_blended_calibration(average_calibration)
+            self.auto_adjust_global_offset()
+            self.update_bad_pixels()
+            print("[DEBUG] Recalibration applied.")
+
+    def apply_blended_calibration(self, new_calibration: np.ndarray, weight: float = 0.1):
+        self.processor.blend_calibration(new_calibration, weight)
+
+    def update_correction(self):
+        """
+        Recomputes the correction maps, after changing the calibration, global offset,
+        non-uniformity correction or bad pixel map.
+        """
+        self.processor.update_correction()
+
+    def set_agc(self, agc: AutomaticGainControl | None):
+        """
+        Maps frames to 8 bits with an automatic gain control, or with the global
+        offset again if None.
+        """
+        self.processor.set_agc(agc)
+
+    def _save_stored(self, path: str, stored, description: str):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            stored.save(path)
+        except OSError as error:
+            print(f"Saving {description} failed: {error}")
+
+    def update_bad_pixels(self):
+        """
+        Detects dead and noisy pixels from the newest window of the calibration ring,
+        then uses and stores the new map.
+        """
+        if self.calibration_ring.window_count < self.recalibration_frames_to_average:
+            return
+        with metrics_registry.time_stage("bad_pixel_detection"):
+            variance = self.calibration_ring.variance(out=self.bad_pixel_variance)
+            self.processor.bad_pixels = BadPixelMap.detect(self.calibration_ring.average(), variance)
+        self.update_correction()
+        self._save_stored(self.calibration_cache.bad_pixel_path(self.calibration_key), self.processor.bad_pixels,
+                          "bad pixel map")
+        print(f"[DEBUG] {len(self.processor.bad_pixels)} bad pixels detected.")
+
+    def capture_nuc_reference(self) -> bool:
+        """
+        Captures the average of the calibration ring's newest frames as a reference
+        scene for the non-uniformity correction: first a uniform cold scene, then a
+        uniform hot one. After the second, the correction is computed, stored and used.
+
+        Returns:
+            bool: True if the correction was computed with this reference.
+
+        Raises:
+            ValueError: If the ring does not hold a full window of frames, or the
+                references do not give a valid correction.
+        """
+        if self.calibration_ring.window_count < self.recalibration_frames_to_average:
+            raise ValueError("Not enough frames in the calibration ring for a reference.")
+        self.nuc_references.append(self.calibration_ring.average())
+        if len(self.nuc_references) < 2:
+            print("[DEBUG] Cold reference captured, point the camera at the hot reference.")
+            return False
+
+        cold, hot = self.nuc_references
+        self.nuc_references = []
+        self.processor.nuc = NonUniformityCorrection.from_references(cold, hot)
+        self.update_correction()
+        self._save_stored(self.calibration_cache.nuc_path(self.calibration_key), self.processor.nuc,
+                          "non-uniformity correction")
+        print("[DEBUG] Non-uniformity correction computed.")
+        return True
+
+    def clear_nuc(self):
+        """
+        Stops applying the non-uniformity correction. The stored file is kept.
+        """
+        self.processor.nuc = None
+        self.nuc_references = []
+        self.update_correction()
+
+    def auto_adjust_global_offset(self):
+        """
+        Adjusts global offset to center image brightness around mid-range.
+        """
+        # Mean of (latest frame - calibration), without building the difference image
+        mean_value = np.mean(self.calibration_ring.latest(), dtype=np.float64) - np.mean(self.processor.calibration_image, dtype=np.float64)
+        desired_mean = 128
+        offset_adjustment = desired_mean - mean_value
+        self.processor.global_offset += 0.5 * offset_adjustment
+        self.processor.global_offset = np.clip(self.processor.global_offset, 50, 150)
+        self.update_correction()
+        print(f"[DEBUG] Adjusted global offset to: {self.processor.global_offset}")
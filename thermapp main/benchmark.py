@@ -0,0 +1,357 @@
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import cv2
+
+from agc import AutomaticGainControl
+from calibration import CalibrationCache, NonUniformityCorrection
+from constants import ThermappConstants
+from data_processing import ThermappDataProcessing
+from denoise import TemporalDenoiser
+from frame import FrameReader
+from queue_handler import ThermappDataQueueHandler
+from replay import ReplayDevice, SyntheticFrameGenerator
+from ring_buffer import ByteRingBuffer
+from roi import RoiEngine
+from application import ThermappApplication
+
+# The face detection tree, next to this one, holds the inference module
+FACE_DETECTION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "thermapp with face detection")
+
+
+def _import_inference():
+    # The face detection tree has its own `config` module, which the inference module
+    # imports `cfg` from; import it under that name for the inference module only
+    main_config = sys.modules.pop("config", None)
+    sys.path.insert(0, FACE_DETECTION_DIR)
+    try:
+        from inference import Inference
+    finally:
+        sys.path.remove(FACE_DETECTION_DIR)
+        sys.modules.pop("config", None)
+        if main_config is not None:
+            sys.modules["config"] = main_config
+    return Inference
+
+
+class PipelineBenchmark:
+    """
+    Drives synthetic packets through each pipeline stage, in isolation and end to end,
+    and measures throughput, per-frame latency and memory allocated per frame.
+
+    The inference stage imports the face detection modules from FACE_DETECTION_DIR, and
+    is reported as skipped, with a warning, if they or their dependencies are missing.
+
+    The application runs in a temporary directory with an empty calibration cache, so
+    no stored calibration is loaded and nothing is written to the working directory.
+
+    Attributes:
+        frame_count (int): Number of measured frames per stage.
+        warmup_count (int): Number of unmeasured frames run first.
+        alloc_samples (int): Number of frames traced for allocations.
+        results (list): One result dictionary per stage that was run.
+    """
+    STAGES = ["chunk_queueing", "read_frame", "parse_frame_data", "process_frame", "process_frame_nuc",
+              "process_frame_agc", "denoise", "denoise_motion", "temperature_map", "roi_statistics", "render_frame", "dataset_write", "inference", "end_to_end"]
+
+    def __init__(self, frame_count: int = 300, warmup_count: int = 20, alloc_samples: int = 5, seed: int = 0):
+        """
+        Initializes the benchmark and prepares synthetic packets and a headless application.
+
+        Args:
+            frame_count (int): Number of measured frames per stage.
+            warmup_count (int): Number of unmeasured frames run first.
+            alloc_samples (int): Number of frames traced for allocations.
+            seed (int): Seed of the synthetic data.
+        """
+        self.frame_count = frame_count
+        self.warmup_count = warmup_count
+        self.alloc_samples = alloc_samples
+        self.results = []
+
+        generator = SyntheticFrameGenerator(seed)
+        self.packets = [generator.generate(i) for i in range(32)]
+        self.data_processing = ThermappDataProcessing()
+
+        self.work_dir = tempfile.TemporaryDirectory(prefix="thermapp_benchmark_")
+        calibration_cache = CalibrationCache(os.path.join(self.work_dir.name, "calibration_cache"))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            self.app = ThermappApplication(None, frame_source=ReplayDevice(frame_count=0), headless=True,
+                                           calibration_cache=calibration_cache,
+                                           save_dir=os.path.join(self.work_dir.name, "dataset"))
+        pixels = [self.data_processing.parse_frame_data(packet)["pixels_data"] for packet in self.packets]
+        self.app.processor.nuc = None
+        self.app.processor.set_calibration(np.mean(pixels, axis=0))
+
+    def packet(self, index: int) -> np.ndarray:
+        return self.packets[index % len(self.packets)]
+
+    def measure(self, stage: str, step, prepare=None) -> dict:
+        """
+        Runs and times one stage.
+
+        Args:
+            stage (str): Name of the stage.
+            step (callable): Timed function, called with the value returned by `prepare`.
+            prepare (callable | None): Untimed function called with the frame index before each step.
+
+        Returns:
+            dict: The stage result.
+        """
+        def run(index):
+            argument = prepare(index) if prepare is not None else index
+            start = time.perf_counter()
+            step(argument)
+            return time.perf_counter() - start
+
+        for index in range(self.warmup_count):
+            run(index)
+        durations = np.array([run(index) for index in range(self.frame_count)])
+
+        # Allocations are traced separately, tracing slows every allocation down
+        allocated = []
+        tracemalloc.start()
+        for index in range(self.alloc_samples):
+            argument = prepare(index) if prepare is not None else index
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            step(argument)
+            allocated.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+        result = {
+            "stage": stage,
+            "frames": int(durations.size),
+            "fps": float(durations.size / durations.sum()) if durations.sum() > 0 else float("inf"),
+            "mean_ms": float(durations.mean() * 1e3),
+            "p50_ms": float(np.percentile(durations, 50) * 1e3),
+            "p99_ms": float(np.percentile(durations, 99) * 1e3),
+            "peak_alloc_bytes_per_frame": int(np.median(allocated)) if allocated else 0,
+        }
+        self.results.append(result)
+        return result
+
+    def skip(self, stage: str, reason: str) -> dict:
+        result = {"stage": stage, "skipped": reason}
+        self.results.append(result)
+        return result
+
+    def _queue_packet(self, index: int):
+        ring = ThermappDataQueueHandler.received_data_ring
+        packet = self.packet(index)
+        for position in range(0, packet.size, ThermappConstants.DEFAULT_BUFFER_LENGTH):
+            ring.write(packet[position:position + ThermappConstants.DEFAULT_BUFFER_LENGTH])
+
+    def bench_chunk_queueing(self):
+        ring = ByteRingBuffer()
+        frame = np.empty(ThermappConstants.PACKET_LENGTH, dtype=np.uint8)
+
+        def step(index):
+            packet = self.packet(index)
+            for position in range(0, packet.size, ThermappConstants.DEFAULT_BUFFER_LENGTH):
+                ring.write(packet[position:position + ThermappConstants.DEFAULT_BUFFER_LENGTH])
+            filled = 0
+            while filled < frame.size:
+                filled += ring.read_into(frame[filled:])
+
+        return self.measure("chunk_queueing", step)
+
+    def bench_read_frame(self):
+        ThermappDataQueueHandler.received_data_ring.clear()
+        reader = FrameReader(frame_pool=self.app.frame_pool)
+
+        def step(_):
+            self.app.frame_pool.release(reader.read_frame())
+
+        return self.measure("read_frame", step, self._queue_packet)
+
+    def bench_parse_frame_data(self):
+        return self.measure("parse_frame_data",
+                            lambda packet: self.data_processing.parse_frame_data(packet), self.packet)
+
+    def _pixels(self, index: int) -> np.ndarray:
+        return self.data_processing.parse_frame_data(self.packet(index))["pixels_data"]
+
+    def bench_process_frame(self):
+        def step(pixels):
+            self.app.frame_pool.release(self.app.process_frame(pixels))
+
+        return self.measure("process_frame", step, self._pixels)
+
+    def bench_process_frame_nuc(self):
+        # Reference scenes with a per-pixel response spread of about 10 %
+        cold = self.app.processor.calibration_image
+        response = np.random.default_rng(0).uniform(900, 1100, cold.size).astype(np.float32)
+        self.app.processor.nuc = NonUniformityCorrection.from_references(cold, cold + response)
+        self.app.update_correction()
+
+        def step(pixels):
+            self.app.frame_pool.release(self.app.process_frame(pixels))
+
+        try:
+            return self.measure("process_frame_nuc", step, self._pixels)
+        finally:
+            self.app.processor.nuc = None
+            self.app.update_correction()
+
+    def bench_process_frame_agc(self):
+        self.app.set_agc(AutomaticGainControl(AutomaticGainControl.PLATEAU))
+
+        def step(pixels):
+            self.app.frame_pool.release(self.app.process_frame(pixels))
+
+        try:
+            return self.measure("process_frame_agc", step, self._pixels)
+        finally:
+            self.app.set_agc(None)
+
+    def bench_denoise(self):
+        return self.measure("denoise", TemporalDenoiser(alpha=0.3).filter, self._pixels)
+
+    def bench_denoise_motion(self):
+        return self.measure("denoise_motion", TemporalDenoiser(alpha=0.3, motion_threshold=60).filter, self._pixels)
+
+    def bench_temperature_map(self):
+        return self.measure("temperature_map", self.app.frame_temperatures, self._pixels)
+
+    def bench_roi_statistics(self):
+        # 48 regions of 40x40 pixels, as when monitoring many fixed spots of a scene
+        engine = RoiEngine(radiometric_converter=self.app.radiometric_converter)
+        for index in range(48):
+            engine.add_rectangle(f"roi{index}", (index * 37) % 340, (index * 23) % 250, 40, 40)
+        return self.measure("roi_statistics", engine.compute, self._pixels)
+
+    def _processed(self, index: int) -> np.ndarray:
+        out = np.empty(ThermappConstants.PIXEL_DATA_SIZE, dtype=np.uint8)
+        return self.app.process_frame(self._pixels(index), out=out)
+
+    def bench_render_frame(self):
+        display = self.app.display_thread
+        return self.measure("render_frame", display.render_frame, self._processed)
+
+    def bench_dataset_write(self):
+        return self.measure("dataset_write", self.app.save_dataset_frame, self._processed)
+
+    def bench_inference(self):
+        try:
+            inference = _import_inference()()
+        except Exception as error:
+            print(f"Skipping the inference stage: {type(error).__name__}: {error}", file=sys.stderr)
+            return self.skip("inference", f"{type(error).__name__}: {error}")
+
+        def prepare(index):
+            image = self._processed(index).reshape((ThermappConstants.FRAME_HEIGHT, ThermappConstants.FRAME_WIDTH, 1))
+            return cv2.resize(np.repeat(image, 3, axis=2),
+                              (ThermappConstants.FRAME_WIDTH * 2, ThermappConstants.FRAME_HEIGHT * 2))
+
+        return self.measure("inference", inference.infer, prepare)
+
+    def bench_end_to_end(self):
+        ThermappDataQueueHandler.received_data_ring.clear()
+        reader = FrameReader(frame_pool=self.app.frame_pool)
+        display = self.app.display_thread
+
+        def step(_):
+            frame = reader.read_frame()
+            packet = self.data_processing.parse_frame_data(frame)
+            processed = self.app.process_frame(packet["pixels_data"])
+            display.render_frame(processed)
+            self.app.frame_pool.release(processed)
+            self.app.frame_pool.release(frame)
+
+        return self.measure("end_to_end", step, self._queue_packet)
+
+    def run(self, stages=None) -> list:
+        """
+        Runs the selected stages.
+
+        Args:
+            stages (list | None): Names of the stages to run. Defaults to all of them.
+
+        Returns:
+            list: The stage results.
+        """
+        for stage in stages or self.STAGES:
+            if stage not in self.STAGES:
+                raise ValueError(f"Unknown stage '{stage}', expected one of {', '.join(self.STAGES)}")
+            getattr(self, f"bench_{stage}")()
+        return self.results
+
+    def close(self):
+        self.app.display_thread.stop()
+        self.work_dir.cleanup()
+
+    def report(self) -> dict:
+        """
+        Returns the results together with a description of the host and code revision.
+        """
+        try:
+            revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                      cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except OSError:
+            revision = ""
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": revision or None,
+            "host": {
+                "node": platform.node(),
+                "machine": platform.machine(),
+                "processor": platform.processor(),
+                "cpu_count": os.cpu_count(),
+                "system": platform.platform(),
+                "python": sys.version.split()[0],
+                "numpy": np.__version__,
+                "opencv": cv2.__version__,
+            },
+            "config": {
+                "frame_count": self.frame_count,
+                "warmup_count": self.warmup_count,
+                "alloc_samples": self.alloc_samples,
+            },
+            "stages": self.results,
+        }
+
+
+def print_results(results):
+    print(f"{'stage':<18}{'fps':>10}{'p50 ms':>10}{'p99 ms':>10}{'alloc/frame':>14}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['stage']:<18}  skipped: {result['skipped']}")
+            continue
+        print(f"{result['stage']:<18}{result['fps']:>10.1f}{result['p50_ms']:>10.3f}"
+              f"{result['p99_ms']:>10.3f}{result['peak_alloc_bytes_per_frame']:>14d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ThermApp frame pipeline with synthetic packets")
+    parser.add_argument("--frames", type=int, default=300, help="measured frames per stage")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured frames per stage")
+    parser.add_argument("--stages", help=f"comma-separated stages to run ({','.join(PipelineBenchmark.STAGES)})")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    benchmark = PipelineBenchmark(frame_count=args.frames, warmup_count=args.warmup)
+    try:
+        benchmark.run(args.stages.split(",") if args.stages else None)
+    finally:
+        benchmark.close()
+
+    print_results(benchmark.results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(benchmark.report(), output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+
+import os
+import numpy as np
+import cv2
+
+from constants import ThermappConstants
+
+
+class CalibrationRing:
+    """
+    Preallocated ring of recent raw frames with a running sum over the newest ones.
+
+    Frames are copied into one (capacity, pixels) uint16 array, so appending never
+    allocates. A float32 sum of the newest `window` frames is updated on every
+    append by adding the new frame and subtracting the one leaving the window,
+    so their average is available at any time for the cost of one division.
+
+    The sum stays exact: it only ever holds sums of at most `window` integers below
+    2**16, which float32 represents without rounding as long as they stay below
+    2**24. The window is limited accordingly.
+
+    Attributes:
+        capacity (int): Number of frames kept.
+        window (int): Number of newest frames summed.
+        frames (np.ndarray): The (capacity, pixel_count) uint16 frame storage.
+        window_sum (np.ndarray): Per-pixel float32 sum of the newest `window` frames.
+        count (int): Total number of frames appended.
+    """
+    MAX_WINDOW = (1 << 24) // (1 << 16)
+
+    def __init__(self, capacity: int = 300, window: int = 50, pixel_count: int = ThermappConstants.PIXEL_DATA_SIZE):
+        """
+        Initializes the CalibrationRing and allocates its storage.
+
+        Args:
+            capacity (int): Number of frames kept.
+            window (int): Number of newest frames summed, at most `capacity` and MAX_WINDOW.
+            pixel_count (int): Number of pixels per frame.
+
+        Raises:
+            ValueError: If the window is not between 1 and the capacity or MAX_WINDOW.
+        """
+        if not 1 <= window <= min(capacity, self.MAX_WINDOW):
+            raise ValueError(f"Window must be between 1 and {min(capacity, self.MAX_WINDOW)}.")
+        self.capacity = capacity
+        self.window = window
+        self.frames = np.zeros((capacity, pixel_count), dtype=np.uint16)
+        self.window_sum = np.zeros(pixel_count, dtype=np.float32)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, pixels: np.ndarray) -> None:
+        """
+        Copies a frame into the ring and updates the running sum.
+
+        Args:
+            pixels (np.ndarray): The raw pixel data (pixel_count uint16, any shape).
+        """
+        if self.count >= self.window:
+            np.subtract(self.window_sum, self.frames[(self.count - self.window) % self.capacity],
+                        out=self.window_sum)
+        slot = self.frames[self.count % self.capacity]
+        np.copyto(slot, pixels.reshape(-1))
+        np.add(self.window_sum, slot, out=self.window_sum)
+        self.count += 1
+
+    @property
+    def window_count(self) -> int:
+        """
+        int: Number of frames currently in the running sum.
+        """
+        return min(self.count, self.window)
+
+    def average(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Returns the per-pixel average of the newest `window` frames.
+
+        Args:
+            out (np.ndarray | None): float32 buffer to write the average into.
+
+        Returns:
+            np.ndarray: The float32 average.
+
+        Raises:
+            ValueError: If the ring is empty.
+        """
+        if self.count == 0:
+            raise ValueError("No frames in the calibration ring.")
+        return np.divide(self.window_sum, np.float32(self.window_count), out=out)
+
+    def variance(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Returns the per-pixel temporal variance of the newest `window` frames.
+
+        Computed one frame at a time against the running average, so it needs no
+        (window, pixels) temporaries. It is not meant to be called for every frame.
+
+        Args:
+            out (np.ndarray | None): float32 buffer to write the variance into.
+
+        Returns:
+            np.ndarray: The float32 variance.
+
+        Raises:
+            ValueError: If the ring is empty.
+        """
+        mean = self.average()
+        if out is None:
+            out = np.zeros_like(mean)
+        else:
+            out.fill(0)
+        difference = np.empty_like(mean)
+        for age in range(self.window_count):
+            np.subtract(self.latest(age), mean, out=difference)
+            np.multiply(difference, difference, out=difference)
+            out += difference
+        out /= np.float32(self.window_count)
+        return out
+
+    def latest(self, age: int = 0) -> np.ndarray:
+        """
+        Returns a stored frame in place.
+
+        Args:
+            age (int): 0 for the newest frame, 1 for the one before, and so on.
+
+        Returns:
+            np.ndarray: The frame (pixel_count uint16).
+
+        Raises:
+            IndexError: If the frame is no longer, or not yet, in the ring.
+        """
+        if not 0 <= age < len(self):
+            raise IndexError(f"Frame {age} is not in the calibration ring.")
+        return self.frames[(self.count - 1 - age) % self.capacity]
+
+    def clear(self) -> None:
+        """
+        Forgets all frames.
+        """
+        self.window_sum.fill(0)
+        self.count = 0
+
+
+class CalibrationCache:
+    """
+    Flat-field calibration images saved on disk, keyed by device and sensor temperature.
+
+    Profiles are stored as `<directory>/<device key>/t<temperature>.npy`, with the
+    sensor temperature header field rounded to `temperature_step`. Loading picks the
+    profile recorded at the closest sensor temperature, so a restarted application
+    can display calibrated frames right away instead of averaging frames first.
+
+    Attributes:
+        directory (str): Directory holding the profiles.
+        temperature_step (int): Resolution of the temperature keys, in header units.
+    """
+
+    def __init__(self, directory: str = "calibration_cache", temperature_step: int = 16):
+        """
+        Initializes the CalibrationCache.
+
+        Args:
+            directory (str): Directory holding the profiles. Created on the first save.
+            temperature_step (int): Resolution of the temperature keys, in header units.
+        """
+        self.directory = directory
+        self.temperature_step = temperature_step
+
+    @staticmethod
+    def device_key(device) -> str:
+        """
+        Returns the key identifying a device's profiles: its serial number when known,
+        otherwise its vendor and product IDs.
+
+        Args:
+            device: The ThermappDevice, or None for a replay or synthetic source.
+        """
+        if device is None:
+            return "replay"
+        serial = getattr(device, "serial", None)
+        if serial:
+            return "".join(c if c.isalnum() or c in "-_" else "_" for c in serial)
+        return f"{device.vendor_id:04x}-{device.product_id:04x}"
+
+    def _device_directory(self, device_key: str) -> str:
+        return os.path.join(self.directory, device_key)
+
+    def temperatures(self, device_key: str) -> list:
+        """
+        Returns the sensor temperatures with a stored profile for a device, in ascending order.
+
+        Args:
+            device_key (str): Key of the device, see `device_key`.
+        """
+        directory = self._device_directory(device_key)
+        if not os.path.isdir(directory):
+            return []
+        temperatures = []
+        for name in os.listdir(directory):
+            if name.startswith("t") and name.endswith(".npy") and name[1:-4].isdigit():
+                temperatures.append(int(name[1:-4]))
+        return sorted(temperatures)
+
+    def load(self, device_key: str, temperature: int) -> tuple | None:
+        """
+        Loads the profile recorded at the sensor temperature closest to `temperature`.
+
+        Args:
+            device_key (str): Key of the device, see `device_key`.
+            temperature (int): Current sensor temperature header field.
+
+        Returns:
+            tuple | None: The float32 calibration image and the temperature it was
+            recorded at, or None if the device has no valid profile.
+        """
+        temperatures = self.temperatures(device_key)
+        for profile_temperature in sorted(temperatures, key=lambda t: abs(t - temperature)):
+            path = os.path.join(self._device_directory(device_key), f"t{profile_temperature}.npy")
+            try:
+                image = np.load(path)
+            except (OSError, ValueError) as error:
+                print(f"Ignoring unreadable calibration profile {path}: {error}")
+                continue
+            if image.shape == (ThermappConstants.PIXEL_DATA_SIZE,):
+                return image.astype(np.float32, copy=False), profile_temperature
+        return None
+
+    def nuc_path(self, device_key: str) -> str:
+        """
+        Returns the path of a device's non-uniformity correction file.
+
+        Args:
+            device_key (str): Key of the device, see `device_key`.
+        """
+        return os.path.join(self._device_directory(device_key), "nuc.npz")
+
+    def bad_pixel_path(self, device_key: str) -> str:
+        """
+        Returns the path of a device's bad pixel map file.
+
+        Args:
+            device_key (str): Key of the device, see `device_key`.
+        """
+        return os.path.join(self._device_directory(device_key), "bad_pixels.npz")
+
+    def save(self, device_key: str, temperature: int, image: np.ndarray) -> str:
+        """
+        Stores a calibration image, replacing the profile of the same temperature step.
+
+        Args:
+            device_key (str): Key of the device, see `device_key`.
+            temperature (int): Sensor temperature header field the image was recorded at.
+            image (np.ndarray): The calibration image (PIXEL_DATA_SIZE float32).
+
+        Returns:
+            str: Path of the profile.
+        """
+        directory = self._device_directory(device_key)
+        os.makedirs(directory, exist_ok=True)
+        step = self.temperature_step
+        key = int(round(temperature / step) * step)
+        path = os.path.join(directory, f"t{key}.npy")
+        # Write to a temporary file first, so a crash never leaves a truncated profile
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as profile_file:
+            np.save(profile_file, np.asarray(image, dtype=np.float32))
+        os.replace(temporary_path, path)
+        return path
+
+
+class NonUniformityCorrection:
+    """
+    Two-point non-uniformity correction with per-pixel gain and offset maps.
+
+    The maps are computed from the average raw frames of two uniform reference
+    scenes, a cold and a hot one, so that every pixel gives the array's mean
+    response to both: corrected = gain * raw + offset.
+
+    The pixel gains are stable, while the offsets drift with the sensor
+    temperature. The application therefore keeps refreshing the offset from its
+    flat-field calibration image and applies gain * (raw - calibration); `offset`
+    is used when frames are corrected on their own with `apply`.
+
+    Attributes:
+        gain (np.ndarray): Per-pixel float32 gain.
+        offset (np.ndarray): Per-pixel float32 offset.
+    """
+    VERSION = 1
+    MIN_GAIN = 0.1
+    MAX_GAIN = 10.0
+
+    def __init__(self, gain: np.ndarray | None = None, offset: np.ndarray | None = None,
+                 pixel_count: int = ThermappConstants.PIXEL_DATA_SIZE):
+        """
+        Initializes the correction, by default as the identity.
+
+        Args:
+            gain (np.ndarray | None): Per-pixel gain. Defaults to ones.
+            offset (np.ndarray | None): Per-pixel offset. Defaults to zeros.
+            pixel_count (int): Number of pixels per frame.
+        """
+        self.gain = (np.ones(pixel_count, dtype=np.float32) if gain is None
+                     else np.ascontiguousarray(gain, dtype=np.float32).reshape(-1))
+        self.offset = (np.zeros(pixel_count, dtype=np.float32) if offset is None
+                       else np.ascontiguousarray(offset, dtype=np.float32).reshape(-1))
+        if self.gain.shape != self.offset.shape:
+            raise ValueError("Gain and offset maps must have the same size.")
+
+    @classmethod
+    def from_references(cls, cold: np.ndarray, hot: np.ndarray) -> "NonUniformityCorrection":
+        """
+        Computes the gain and offset maps from two reference scenes.
+
+        Pixels that do not respond to the difference between the scenes keep a gain
+        of 1; gains are limited to MIN_GAIN..MAX_GAIN.
+
+        Args:
+            cold (np.ndarray): Average raw frame of the colder uniform scene.
+            hot (np.ndarray): Average raw frame of the hotter uniform scene.
+
+        Returns:
+            NonUniformityCorrection: The correction.
+
+        Raises:
+            ValueError: If the references differ in size or the hot scene is not
+                brighter than the cold one on average.
+        """
+        cold = np.asarray(cold, dtype=np.float32).reshape(-1)
+        hot = np.asarray(hot, dtype=np.float32).reshape(-1)
+        if cold.shape != hot.shape:
+            raise ValueError("Reference frames must have the same size.")
+        response = hot - cold
+        mean_response = np.mean(response, dtype=np.float64)
+        if mean_response <= 0:
+            raise ValueError("The hot reference must be brighter than the cold one.")
+
+        gain = np.ones_like(response)
+        np.divide(np.float32(mean_response), response, out=gain, where=response > 0)
+        np.clip(gain, cls.MIN_GAIN, cls.MAX_GAIN, out=gain)
+        offset = np.float32(np.mean(cold, dtype=np.float64)) - gain * cold
+        return cls(gain, offset)
+
+    def apply(self, raw: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Corrects a raw frame with the gain and offset maps.
+
+        Args:
+            raw (np.ndarray): The raw pixel data (pixel_count values, any shape).
+            out (np.ndarray | None): float32 buffer to write the result into.
+
+        Returns:
+            np.ndarray: The corrected float32 pixels.
+        """
+        out = np.multiply(raw.reshape(-1), self.gain, out=out)
+        np.add(out, self.offset, out=out)
+        return out
+
+    def save(self, path: str) -> None:
+        """
+        Stores the maps, with the format version, in a .npz file.
+
+        Args:
+            path (str): Path of the file.
+        """
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as nuc_file:
+            np.savez(nuc_file, version=np.int32(self.VERSION), gain=self.gain, offset=self.offset)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "NonUniformityCorrection":
+        """
+        Loads maps stored with `save`.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            NonUniformityCorrection: The correction.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file is not a correction of a supported version.
+        """
+        with np.load(path) as data:
+            if "version" not in data or "gain" not in data or "offset" not in data:
+                raise ValueError(f"{path} is not a non-uniformity correction.")
+            version = int(data["version"])
+            if version != cls.VERSION:
+                raise ValueError(f"Unsupported non-uniformity correction version {version} in {path}.")
+            return cls(data["gain"], data["offset"])
+
+
+class BadPixelMap:
+    """
+    Map of dead, stuck and noisy pixels, with the neighbour replacing each of them.
+
+    Pixels are flagged by two tests on a stack of recent frames:
+        Temporal: a pixel whose variance is zero (stuck), or far above both the
+            frame's median variance and that of its 3x3 neighbourhood (flickering).
+            Comparing with the neighbourhood keeps moving edges, which raise the
+            variance of whole regions, from being flagged.
+        Spatial: a pixel whose mean deviates from the 3x3 median of the means by
+            more than `outlier_factor` robust standard deviations (hot or cold spots).
+
+    Every bad pixel is assigned the nearest good pixel within two rows and columns,
+    so correcting a frame is a single gather: frame[bad] = frame[source].
+
+    Attributes:
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        mask (np.ndarray): Flat bool array, True for bad pixels.
+        bad_indices (np.ndarray): Flat indices of the bad pixels that have a replacement.
+        source_indices (np.ndarray): Flat indices of their replacements.
+    """
+    VERSION = 1
+    # Neighbour offsets (row, column), nearest first
+    NEIGHBOUR_OFFSETS = sorted(((dy, dx) for dy in range(-2, 3) for dx in range(-2, 3) if dy or dx),
+                               key=lambda offset: (offset[0] ** 2 + offset[1] ** 2, offset))
+
+    def __init__(self, mask: np.ndarray | None = None, width: int = ThermappConstants.FRAME_WIDTH,
+                 height: int = ThermappConstants.FRAME_HEIGHT):
+        """
+        Initializes the map and precomputes the replacement indices.
+
+        Args:
+            mask (np.ndarray | None): Bool array of height * width values, True for bad
+                pixels. Defaults to no bad pixels.
+            width (int): Frame width in pixels.
+            height (int): Frame height in pixels.
+
+        Raises:
+            ValueError: If the mask does not match the frame size.
+        """
+        self.width = width
+        self.height = height
+        if mask is None:
+            mask = np.zeros(width * height, dtype=bool)
+        self.mask = np.asarray(mask, dtype=bool).reshape(-1)
+        if self.mask.size != width * height:
+            raise ValueError(f"Bad pixel mask has {self.mask.size} values, expected {width * height}.")
+        self._compute_sources()
+
+    def _compute_sources(self):
+        bad = np.flatnonzero(self.mask)
+        rows, columns = np.divmod(bad, self.width)
+        source = np.full(bad.size, -1, dtype=np.int64)
+        for dy, dx in self.NEIGHBOUR_OFFSETS:
+            pending = source < 0
+            if not pending.any():
+                break
+            neighbour_rows = rows[pending] + dy
+            neighbour_columns = columns[pending] + dx
+            inside = ((neighbour_rows >= 0) & (neighbour_rows < self.height) &
+                      (neighbour_columns >= 0) & (neighbour_columns < self.width))
+            candidates = np.where(inside, neighbour_rows * self.width + neighbour_columns, 0)
+            usable = inside & ~self.mask[candidates]
+            pending_positions = np.flatnonzero(pending)
+            source[pending_positions[usable]] = candidates[usable]
+        # Pixels in a cluster too large to find a good neighbour stay as they are
+        replaced = source >= 0
+        self.bad_indices = bad[replaced].astype(np.intp)
+        self.source_indices = source[replaced].astype(np.intp)
+
+    @classmethod
+    def detect(cls, mean: np.ndarray, variance: np.ndarray, width: int = ThermappConstants.FRAME_WIDTH,
+               height: int = ThermappConstants.FRAME_HEIGHT, noise_factor: float = 10.0,
+               outlier_factor: float = 8.0) -> "BadPixelMap":
+        """
+        Builds a map from the per-pixel temporal mean and variance of recent frames,
+        such as CalibrationRing.average() and CalibrationRing.variance().
+
+        Args:
+            mean (np.ndarray): Per-pixel mean (height * width values).
+            variance (np.ndarray): Per-pixel temporal variance (height * width values).
+            width (int): Frame width in pixels.
+            height (int): Frame height in pixels.
+            noise_factor (float): How many times the typical standard deviation a
+                pixel's must exceed to be flagged as noisy.
+            outlier_factor (float): How many robust standard deviations a pixel's mean
+                must deviate from its neighbours' to be flagged.
+
+        Returns:
+            BadPixelMap: The map.
+        """
+        mean = np.asarray(mean, dtype=np.float32).reshape(height, width)
+        deviation = np.sqrt(np.asarray(variance, dtype=np.float32)).reshape(height, width)
+
+        typical_deviation = max(float(np.median(deviation)), 1e-3)
+        local_deviation = cv2.medianBlur(deviation, 3)
+        noisy = (deviation > noise_factor * typical_deviation) & (deviation > noise_factor * local_deviation)
+        stuck = deviation == 0 if typical_deviation > 1e-3 else np.zeros_like(noisy)
+
+        residual = mean - cv2.medianBlur(mean, 3)
+        spread = max(1.4826 * float(np.median(np.abs(residual))), 1.0)
+        outlier = np.abs(residual) > outlier_factor * spread
+
+        return cls(noisy | stuck | outlier, width, height)
+
+    def __len__(self) -> int:
+        return int(self.bad_indices.size)
+
+    def correct(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Replaces the bad pixels of a frame in place with their neighbours.
+
+        Args:
+            frame (np.ndarray): Pixel data of any dtype (height * width values, contiguous).
+
+        Returns:
+            np.ndarray: The same frame.
+        """
+        if self.bad_indices.size:
+            flat = frame.reshape(-1)
+            flat[self.bad_indices] = flat[self.source_indices]
+        return frame
+
+    def save(self, path: str) -> None:
+        """
+        Stores the mask, with the format version, in a .npz file.
+
+        Args:
+            path (str): Path of the file.
+        """
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as map_file:
+            np.savez(map_file, version=np.int32(self.VERSION), width=np.int32(self.width),
+                     height=np.int32(self.height), mask=np.packbits(self.mask))
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BadPixelMap":
+        """
+        Loads a map stored with `save`.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            BadPixelMap: The map.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file is not a bad pixel map of a supported version.
+        """
+        with np.load(path) as data:
+            if "version" not in data or "mask" not in data:
+                raise ValueError(f"{path} is not a bad pixel map.")
+            version = int(data["version"])
+            if version != cls.VERSION:
+                raise ValueError(f"Unsupported bad pixel map version {version} in {path}.")
+            width, height = int(data["width"]), int(data["height"])
+            mask = np.unpackbits(data["mask"], count=width * height).astype(bool)
+            return cls(mask, width, height)
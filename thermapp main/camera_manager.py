@@ -0,0 +1,327 @@
+
+import itertools
+import threading
+import ctypes as ct
+import libusb as usb
+import numpy as np
+
+from calibration import CalibrationCache
+from config import ThermappConfig
+from constants import ThermappConstants
+from data_processing import ThermappDataProcessing
+from device import ThermappDevice
+from frame import FrameChannel, FrameReader
+from frame_pool import FramePool
+from metrics import metrics_registry
+from processing import FrameProcessor
+from queue_handler import ThermappDataQueueHandler
+from ring_buffer import ByteRingBuffer
+from transfer import AsyncTransferManager, TransferManager, TransferStrategy
+from usb_callbacks import USBCallbacks
+
+
+class ThermappCamera:
+    """
+    One camera of a ThermappCameraManager with its own data path: ring buffer,
+    framer, calibration and output channel.
+
+    Frames are processed by a FrameProcessor, as in ThermappApplication, with the
+    non-uniformity correction and bad pixel map stored for the device.
+
+    Processed 8-bit frames are put into `output`, which keeps only the newest one
+    by default. Frames taken from it must be released to `frame_pool`.
+
+    Attributes:
+        device (ThermappDevice | None): The camera, None when a frame source stands in for it.
+        name (str): Identification of the camera, its serial number or bus and address,
+            or a numbered source name for a frame source.
+        ring (ByteRingBuffer): Ring buffer the camera's USB data is routed to.
+        frame_reader (FrameReader): Assembles the camera's frames.
+        processor (FrameProcessor): Calibration and processing of the camera's frames.
+        output (FrameChannel): Channel of the processed frames.
+        frame_count (int): Number of frames processed.
+    """
+    _source_numbers = itertools.count(1)
+
+    def __init__(self, device: ThermappDevice | None, transfer_strategy: TransferStrategy | None = None,
+                 frame_source=None, name: str | None = None, calibration_frames: int = 50,
+                 output_policy: str = FrameChannel.LATEST, output_capacity: int = 1,
+                 calibration_cache: CalibrationCache | None = None):
+        """
+        Initializes the ThermappCamera.
+
+        Args:
+            device (ThermappDevice | None): The opened camera.
+            transfer_strategy (TransferStrategy | None): How incoming transfers are sized.
+            frame_source: Object with start_async_read/stop_async_read writing into `ring`,
+                such as a ReplayDevice, used instead of the USB transfers.
+            name (str | None): Identification of the camera. Defaults to the device's, or
+                to a numbered source name when a frame source is used.
+            calibration_frames (int): Number of frames averaged for the initial calibration.
+            output_policy (str): FrameChannel policy of the output channel.
+            output_capacity (int): Capacity of the output channel.
+            calibration_cache (CalibrationCache | None): Cache the device's corrections
+                are loaded from. Defaults to the default cache directory.
+        """
+        self.device = device
+        if name is None:
+            name = device.name if device is not None else f"source{next(ThermappCamera._source_numbers)}"
+        self.name = name
+        self.ring = ByteRingBuffer()
+        if frame_source is not None:
+            frame_source.ring = self.ring
+            self.async_transfer_manager = frame_source
+        else:
+            transfer_manager = TransferManager(device, ThermappConfig().config_package)
+            self.async_transfer_manager = AsyncTransferManager(transfer_manager, transfer_strategy, ring=self.ring)
+
+        self.frame_pool = FramePool(raw_count=8, calibrated_count=2, display_count=4)
+        self.frame_reader = FrameReader(frame_pool=self.frame_pool, ring=self.ring)
+        self.data_processing = ThermappDataProcessing()
+        self.output = FrameChannel(output_policy, output_capacity, on_drop=self.frame_pool.release)
+
+        self.calibration_frames = calibration_frames
+        self.processor = FrameProcessor(self.frame_pool)
+        if calibration_cache is None:
+            calibration_cache = CalibrationCache()
+        self.processor.load_corrections(calibration_cache, CalibrationCache.device_key(device))
+        self.frame_count = 0
+        self.running = False
+        self.thread = None
+
+    def calibrate(self) -> bool:
+        """
+        Averages the next `calibration_frames` frames into the calibration image.
+
+        Returns:
+            bool: False if the camera was stopped before any frame arrived.
+        """
+        sum_calibration = np.zeros(ThermappConstants.PIXEL_DATA_SIZE, dtype=np.float32)
+        collected = 0
+        while collected < self.calibration_frames and self.running:
+            frame = self.frame_reader.read_frame()
+            if frame is not None:
+                sum_calibration += self.data_processing.parse_frame_data(frame)["pixels_data"]
+                self.frame_pool.release(frame)
+                collected += 1
+        if collected == 0:
+            return False
+        self.processor.set_calibration(sum_calibration / collected)
+        return True
+
+    def process_frame(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Replaces the bad pixels of raw pixel data in place and processes it into a pooled display buffer.
+        """
+        return self.processor.process(self.processor.correct_raw(pixels))
+
+    def run(self):
+        if not self.calibrate():
+            return
+        while self.running:
+            frame = self.frame_reader.read_frame()
+            if frame is None:
+                continue
+            try:
+                packet = self.data_processing.parse_frame_data(frame)
+                self.output.put(self.process_frame(packet["pixels_data"]))
+                self.frame_count += 1
+            except Exception as e:
+                print(f"Error processing frame of camera {self.name}: {e}")
+            finally:
+                self.frame_pool.release(frame)
+
+    def start(self):
+        """
+        Starts the processing thread. The transfers are started by the manager.
+        """
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the transfers and the processing thread.
+        """
+        self.async_transfer_manager.stop_async_read()
+        self.running = False
+        self.output.close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        """
+        Stops the camera, removes its route from the USB callbacks and closes the device.
+        """
+        self.stop()
+        if isinstance(self.async_transfer_manager, AsyncTransferManager):
+            USBCallbacks.routes.pop(self.async_transfer_manager.route_id, None)
+        if self.device is not None:
+            self.device.close()
+
+
+class ThermappCameraManager:
+    """
+    Runs several ThermApp cameras from one host.
+
+    Every camera has its own ring buffer, framer, calibration and output channel,
+    and is processed in its own thread. The USB transfers of all cameras are
+    handled by a single libusb event thread; each camera's transfers carry a route
+    id as user data, so the callback writes their data to that camera's ring buffer.
+
+    libusb must be initialized before cameras are added.
+
+    Attributes:
+        cameras (list): The ThermappCamera instances, in the order they were added.
+        event_timeout (float): Longest time the event thread blocks before checking whether to stop.
+        read_timeout (float): Longest time a camera thread waits for data before checking whether to stop.
+    """
+
+    def __init__(self, vendor_id: int = 0x1772, product_id: int = 2, event_timeout: float = 1.0,
+                 read_timeout: float = 0.5):
+        """
+        Initializes the ThermappCameraManager.
+
+        Args:
+            vendor_id (int): USB vendor ID of the cameras.
+            product_id (int): USB product ID of the cameras.
+            event_timeout (float): Longest time the event thread blocks before checking whether to stop.
+            read_timeout (float): Longest time a camera thread waits for data before checking whether to stop.
+        """
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.event_timeout = event_timeout
+        self.read_timeout = read_timeout
+        self.cameras = []
+        self.running = False
+        self.event_thread = None
+        self.source_threads = []
+
+    def enumerate(self) -> list:
+        """
+        Lists the connected cameras.
+
+        Returns:
+            list: A ThermappDeviceInfo (bus, address, serial) for every camera.
+        """
+        return ThermappDevice.enumerate(self.vendor_id, self.product_id)
+
+    def add_camera(self, bus: int | None = None, address: int | None = None, serial: str | None = None,
+                   frame_source=None, **camera_options) -> ThermappCamera:
+        """
+        Opens a camera selected by bus/address or serial number and adds it.
+
+        Args:
+            bus (int | None): USB bus number of the camera.
+            address (int | None): USB address of the camera.
+            serial (str | None): Serial number of the camera.
+            frame_source: Source such as a ReplayDevice to use instead of a USB camera.
+            **camera_options: Further arguments of ThermappCamera.
+
+        Returns:
+            ThermappCamera: The added camera.
+        """
+        device = None
+        if frame_source is None:
+            device = ThermappDevice(self.vendor_id, self.product_id, bus=bus, address=address, serial=serial)
+            device.open()
+        camera = ThermappCamera(device, frame_source=frame_source, **camera_options)
+        self.cameras.append(camera)
+        return camera
+
+    def add_all_cameras(self, **camera_options) -> list:
+        """
+        Opens and adds every connected camera.
+
+        Returns:
+            list: The added cameras.
+        """
+        return [self.add_camera(bus=info.bus, address=info.address, **camera_options)
+                for info in self.enumerate()]
+
+    def camera(self, name: str) -> ThermappCamera:
+        """
+        Returns the camera with the given name.
+
+        Raises:
+            KeyError: If there is no such camera.
+        """
+        for camera in self.cameras:
+            if camera.name == name:
+                return camera
+        raise KeyError(name)
+
+    def handle_events(self):
+        tv = usb.timeval(int(self.event_timeout), int(self.event_timeout % 1 * 1e6))
+        while self.running:
+            usb.handle_events_timeout_completed(None, ct.byref(tv), None)
+
+    def start(self):
+        """
+        Starts the transfers and processing of all cameras and the shared event thread.
+        """
+        self.running = True
+        ThermappDataQueueHandler.read_timeout = self.read_timeout
+        usb_cameras = False
+        for camera in self.cameras:
+            camera.start()
+            manager = camera.async_transfer_manager
+            if isinstance(manager, AsyncTransferManager):
+                result = manager.submit_transfers()
+                if result < 0:
+                    self.stop()
+                    raise IOError(f"Starting the transfers of camera {camera.name} failed: error {result}.")
+                usb_cameras = True
+            else:
+                thread = threading.Thread(target=manager.start_async_read, daemon=True)
+                thread.start()
+                self.source_threads.append(thread)
+
+        if usb_cameras:
+            self.event_thread = threading.Thread(target=self.handle_events, daemon=True)
+            self.event_thread.start()
+        self.register_metrics()
+
+    def stop(self):
+        """
+        Stops all cameras, the event thread and closes the devices.
+        """
+        for camera in self.cameras:
+            camera.stop()
+        self.running = False
+        if self.event_thread is not None:
+            self.event_thread.join()
+            self.event_thread = None
+        for thread in self.source_threads:
+            thread.join()
+        self.source_threads = []
+        for camera in self.cameras:
+            camera.close()
+
+    @property
+    def throughput(self) -> float:
+        """
+        float: Bytes received per second by all USB cameras together.
+        """
+        return sum(camera.async_transfer_manager.current_statistics.throughput for camera in self.cameras
+                   if isinstance(camera.async_transfer_manager, AsyncTransferManager))
+
+    def register_metrics(self):
+        """
+        Exposes per-camera frame, resync, overflow and drop counters, labelled by camera name.
+        """
+        def per_camera(function):
+            return lambda: {camera.name: function(camera) for camera in self.cameras}
+
+        metrics_registry.register("camera_frames_total", per_camera(lambda camera: camera.frame_count),
+                                  "Frames processed per camera", kind="counter", label="camera")
+        metrics_registry.register("camera_resyncs_total",
+                                  per_camera(lambda camera: camera.frame_reader.synchronizer.resync_count),
+                                  "Start header resyncs per camera", kind="counter", label="camera")
+        metrics_registry.register("camera_overflow_bytes_total", per_camera(lambda camera: camera.ring.overflow_bytes),
+                                  "Bytes dropped because a camera's ring buffer was full",
+                                  kind="counter", label="camera")
+        metrics_registry.register("camera_dropped_frames_total", per_camera(lambda camera: camera.output.dropped_count),
+                                  "Processed frames replaced before they were taken from the output",
+                                  kind="counter", label="camera")
@@ -1,100 +1,127 @@
-
-import numpy as np
-
-from constants import ThermappConstants
-from collections import namedtuple
-from typing import Union, Dict
-
-class ThermappDataProcessing:
-    """
-    A class to handle the data processing for the Thermapp device.
-    """
-    FieldSpec = namedtuple("FieldSpec", ["name", "length", "dtype"])
-
-    def __init__(self):
-        """
-        Initializes the ThermappDataProcessing class with the frame fields specification.
-        """
-        self.frame_fields = [
-            self.FieldSpec("Start_Header", 4, int),
-            self.FieldSpec("some_data0", 2, int),
-            self.FieldSpec("id", 4, int),
-            self.FieldSpec("some_data1", 16, int),
-            self.FieldSpec("temperature", 2, int),
-            self.FieldSpec("some_data2", 20, int),
-            self.FieldSpec("frame_number", 2, int),
-            self.FieldSpec("some_data3", 10, int),
-            self.FieldSpec("pixels_data", ThermappConstants.PIXEL_DATA_SIZE * 2, np.ndarray),
-            self.FieldSpec("some_data4", 448, int),
-            self.FieldSpec("End_Header", 4, int)
-        ]
-
-    @staticmethod
-    def bytes_to_int(data: bytes) -> int:
-        """
-        Converts a byte array to an integer.
-
-        Args:
-            data (bytes): The byte array to convert.
-
-        Returns:
-            int: The integer representation of the byte array.
-        """
-        return int.from_bytes(data[::-1], "big")
-
-    @staticmethod
-    def bytes_to_uint16_list(data: bytes) -> np.ndarray:
-        """
-        Converts a byte array to a list of unsigned 16-bit integers.
-
-        Args:
-            data (bytes): The byte array to convert.
-
-        Returns:
-            np.ndarray: The array of 16-bit unsigned integers.
-        """
-        return np.frombuffer(data, dtype=np.uint16)
-
-    def parse_frame_data(self, data: bytes) -> Dict[str, Union[int, np.ndarray, None]]:
-        """
-        Extracts and processes received frame data according to the frame fields specification.
-
-        Args:
-            data (bytes): The raw data received.
-
-        Returns:
-            dict: A dictionary containing the processed fields from the data.
-        """
-        expected_length = sum(field.length for field in self.frame_fields)
-        if len(data) != expected_length:
-            raise ValueError(f"Input data length ({len(data)}) does not match the expected frame length ({expected_length})")
-
-        result = {}
-        idx = 0
-
-        for field_name, field_length, field_dtype in self.frame_fields:
-            field_data = data[idx:idx + field_length]
-            result[field_name] = self.parse_field_data(field_data, field_dtype)
-            idx += field_length
-
-        return result
-
-    def parse_field_data(self, field_data: bytes, field_dtype) -> Union[int, np.ndarray, None]:
-        """
-        Parses the raw data for a single field based on its type.
-
-        Args:
-            field_data (bytes): The raw data for the field.
-            field_dtype (type): The data type of the field.
-
-        Returns:
-            int or np.ndarray: The parsed data.
-        """
-        
-        try:
-            if field_dtype == np.ndarray:
-                return self.bytes_to_uint16_list(field_data)
-            else:
-                return self.bytes_to_int(field_data)
-        except ValueError as e:
-            raise ValueError(f"Error parsing field data: {e}")
\ No newline at end of file
+
+import numpy as np
+
+from constants import ThermappConstants
+from collections import namedtuple
+from typing import Union, Dict
+
+class ThermappDataProcessing:
+    """
+    A class to handle the data processing for the Thermapp device.
+    """
+    FieldSpec = namedtuple("FieldSpec", ["name", "length", "dtype"])
+
+    def __init__(self):
+        """
+        Initializes the ThermappDataProcessing class with the frame fields specification.
+        """
+        self.frame_fields = [
+            self.FieldSpec("Start_Header", 4, int),
+            self.FieldSpec("some_data0", 2, int),
+            self.FieldSpec("id", 4, int),
+            self.FieldSpec("some_data1", 16, int),
+            self.FieldSpec("temperature", 2, int),
+            self.FieldSpec("some_data2", 20, int),
+            self.FieldSpec("frame_number", 2, int),
+            self.FieldSpec("some_data3", 10, int),
+            self.FieldSpec("pixels_data", ThermappConstants.PIXEL_DATA_SIZE * 2, np.ndarray),
+            self.FieldSpec("some_data4", 448, int),
+            self.FieldSpec("End_Header", 4, int)
+        ]
+        self.frame_dtype = self.compile_frame_dtype(self.frame_fields)
+        self.frame_length = self.frame_dtype.itemsize
+
+    @staticmethod
+    def compile_frame_dtype(frame_fields) -> np.dtype:
+        """
+        Compiles a frame fields specification into a NumPy structured dtype.
+
+        Integer fields of 1, 2, 4 or 8 bytes become little-endian unsigned integers,
+        other integer fields become byte arrays and the pixel data becomes a
+        (FRAME_HEIGHT, FRAME_WIDTH) array of little-endian uint16.
+
+        Args:
+            frame_fields (list): The FieldSpec list describing the frame layout.
+
+        Returns:
+            np.dtype: The structured dtype of one frame.
+        """
+        dtype_fields = []
+        for field_name, field_length, field_dtype in frame_fields:
+            if field_dtype == np.ndarray:
+                shape = (ThermappConstants.FRAME_HEIGHT, ThermappConstants.FRAME_WIDTH)
+                if field_length != ThermappConstants.PIXEL_DATA_SIZE * 2:
+                    shape = (field_length // 2,)
+                dtype_fields.append((field_name, "<u2", shape))
+            elif field_length in (1, 2, 4, 8):
+                dtype_fields.append((field_name, f"<u{field_length}"))
+            else:
+                dtype_fields.append((field_name, "u1", (field_length,)))
+        return np.dtype(dtype_fields)
+
+    @staticmethod
+    def bytes_to_int(data: bytes) -> int:
+        """
+        Converts a byte array to an integer.
+
+        Args:
+            data (bytes): The byte array to convert.
+
+        Returns:
+            int: The integer representation of the byte array.
+        """
+        return int.from_bytes(data[::-1], "big")
+
+    def parse_frame_view(self, data: bytes) -> np.ndarray:
+        """
+        Views one frame as a structured record without copying it.
+
+        Args:
+            data (bytes): The raw data of one frame.
+
+        Returns:
+            np.ndarray: A 0-d record array with the named frame fields, backed by `data`.
+        """
+        if len(data) != self.frame_length:
+            raise ValueError(f"Input data length ({len(data)}) does not match the expected frame length ({self.frame_length})")
+        return np.frombuffer(data, dtype=self.frame_dtype, count=1)[0, ...]
+
+    def parse_frames(self, data: bytes) -> np.ndarray:
+        """
+        Views a sequence of concatenated frames as a structured record array without copying it.
+
+        Args:
+            data (bytes): The raw data of N back-to-back frames, e.g. from a recording.
+
+        Returns:
+            np.ndarray: A record array of shape (N,) with the named frame fields, backed by `data`.
+        """
+        data_length = data.nbytes if isinstance(data, np.ndarray) else len(data)
+        if data_length % self.frame_length:
+            raise ValueError(f"Input data length ({data_length}) is not a multiple of the frame length ({self.frame_length})")
+        return np.frombuffer(data, dtype=self.frame_dtype)
+
+    def parse_frame_data(self, data: bytes) -> Dict[str, Union[int, np.ndarray, None]]:
+        """
+        Extracts and processes received frame data according to the frame fields specification.
+
+        Args:
+            data (bytes): The raw data received.
+
+        Returns:
+            dict: A dictionary containing the processed fields from the data. The pixel
+            data is a flat uint16 view of `data`.
+        """
+        record = self.parse_frame_view(data)
+
+        result = {}
+        for field_name, field_length, field_dtype in self.frame_fields:
+            value = record[field_name]
+            if field_dtype == np.ndarray:
+                result[field_name] = value.reshape(-1)
+            elif value.ndim:
+                result[field_name] = self.bytes_to_int(value.tobytes())
+            else:
+                result[field_name] = int(value)
+
+        return result
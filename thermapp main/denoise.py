@@ -0,0 +1,89 @@
+
+import numpy as np
+import cv2
+
+from constants import ThermappConstants
+
+
+class TemporalDenoiser:
+    """
+    Per-pixel recursive (IIR) filter that averages frames over time to reduce flicker.
+
+    The filtered frame is kept in a float32 state buffer and updated in place:
+        state += k * (frame - state)
+    With a fixed k = `alpha`, noise is reduced by about sqrt(alpha / (2 - alpha)),
+    at the cost of trails behind moving objects. With a `motion_threshold`, the
+    filter is motion adaptive: k rises from `alpha` to 1 as a pixel's difference to
+    the state grows to the threshold, so changes larger than the noise pass through
+    at once while static areas keep being averaged.
+
+    All work buffers are allocated once; filtering a frame allocates nothing.
+
+    Attributes:
+        alpha (float): Weight of a new frame in static areas, 0 to 1; lower filters more.
+        motion_threshold (float | None): Difference in raw counts at which a pixel is
+            taken as moving and no longer filtered, or None for a fixed weight.
+        state (np.ndarray): The filtered frame (pixel_count float32).
+    """
+
+    def __init__(self, alpha: float = 0.3, motion_threshold: float | None = None,
+                 pixel_count: int = ThermappConstants.PIXEL_DATA_SIZE):
+        """
+        Initializes the TemporalDenoiser.
+
+        Args:
+            alpha (float): Weight of a new frame in static areas, 0 to 1.
+            motion_threshold (float | None): Difference in raw counts at which a pixel is
+                no longer filtered, or None for a fixed weight.
+            pixel_count (int): Number of pixels per frame.
+
+        Raises:
+            ValueError: If alpha or the motion threshold is out of range.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("The denoiser weight must be in (0, 1].")
+        if motion_threshold is not None and motion_threshold <= 0:
+            raise ValueError("The motion threshold must be positive.")
+        self.alpha = alpha
+        self.motion_threshold = motion_threshold
+        self.state = np.zeros(pixel_count, dtype=np.float32)
+        self._difference = np.empty(pixel_count, dtype=np.float32)
+        self._weight = np.empty(pixel_count, dtype=np.float32)
+        self._initialized = False
+
+    def reset(self) -> None:
+        """
+        Forgets the filtered frame; the next frame is taken as it is.
+        """
+        self._initialized = False
+
+    def filter(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Adds a frame to the filter.
+
+        Args:
+            frame (np.ndarray): Raw pixel data (pixel_count values, any shape).
+
+        Returns:
+            np.ndarray: The state buffer holding the filtered frame. It is overwritten
+            by the next call.
+        """
+        frame = frame.reshape(-1)
+        if not self._initialized:
+            np.copyto(self.state, frame)
+            self._initialized = True
+            return self.state
+
+        # cv2 converts the raw counts on the fly, where numpy would buffer them
+        difference = cv2.subtract(frame, self.state, dst=self._difference, dtype=cv2.CV_32F).reshape(-1)
+        if self.motion_threshold is None:
+            difference *= np.float32(self.alpha)
+        else:
+            # k = alpha + (1 - alpha) * min(|difference| / threshold, 1)
+            weight = np.abs(difference, out=self._weight)
+            weight *= np.float32((1 - self.alpha) / self.motion_threshold)
+            np.minimum(weight, np.float32(1 - self.alpha), out=weight)
+            weight += np.float32(self.alpha)
+            difference *= weight
+        self.state += difference
+        return self.state
@@ -1,136 +1,254 @@
-
-
-import libusb as usb
-import ctypes as ct
-
-class ThermappDevice:
-    """
-    Class representing a Thermapp device.
-
-    Attributes:
-        vendor_id (int): USB vendor ID of the device.
-        product_id (int): USB product ID of the device.
-        handler (ctypes.POINTER): Handler for the USB device.
-    """
-    
-    def __init__(self, vendor_id=0x1772, product_id=2):
-        """
-        Initializes the ThermappDevice with the given vendor and product IDs.
-
-        Args:
-            vendor_id (int): USB vendor ID of the device. Defaults to 0x1772.
-            product_id (int): USB product ID of the device. Defaults to 2.
-        """
-        self.vendor_id = vendor_id
-        self.product_id = product_id
-        self.handler = None
-
-    def open(self):
-        """
-        Opens the USB device, claims the interface, and configures the device.
-
-        Raises:
-            IOError: If there is an I/O error.
-            usb.USBError: If there is a USB error.
-            Exception: If any other unexpected error occurs.
-        """
-        try:
-            self.handler = self._open_device()
-            self._claim_interface()
-            self._perform_control_transfers()
-        except IOError as io_error:
-            print(f"I/O error: {io_error}")
-            self.close()
-            raise
-        except usb.USBError as usb_error:
-            print(f"USB error: {usb_error}")
-            self.close()
-            raise
-        except Exception as error:
-            print(f"Unexpected error: {error}, {type(error)}")
-            self.close()
-            raise
-
-    def close(self):
-        """
-        Releases the claimed interface and closes the USB device.
-        """
-        if self.handler:
-            usb.release_interface(self.handler, 0)
-            usb.close(self.handler)
-            self.handler = None
-
-    def _open_device(self):
-        """
-        Opens the USB device with the specified vendor and product IDs.
-
-        Returns:
-            ctypes.POINTER: Pointer to the opened USB device.
-
-        Raises:
-            IOError: If the device cannot be found.
-        """
-        device_pointer = usb.open_device_with_vid_pid(None, self.vendor_id, self.product_id)
-        if not device_pointer:
-            raise IOError(f"Unable to find USB device with Vendor ID {self.vendor_id} and Product ID {self.product_id}.")
-        return device_pointer.contents
-
-    def _claim_interface(self):
-        """
-        Claims the interface of the opened USB device.
-
-        Raises:
-            IOError: If claiming the interface fails.
-        """
-        status = usb.claim_interface(self.handler, 0)
-        if status != usb.LIBUSB_SUCCESS:
-            raise IOError(f"Claim interface failed: {usb.error_name(status)}.")
-
-    def _perform_control_transfers(self):
-        """
-        Configures the USB device by performing a series of control transfers.
-        """
-        buffer = (ct.c_ubyte * 255)()
-        control_transfers = self._get_control_transfers()
-
-        for direction, request, value, index, length in control_transfers:
-            self._perform_control_transfer(direction, request, value, index, buffer, length)
-
-    def _get_control_transfers(self):
-        """
-        Returns a list of control transfer parameters for device configuration.
-
-        Returns:
-            list: A list of tuples containing control transfer parameters.
-        """
-        return [
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0100, 0x0000, 0x12),
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0200, 0x0000, 0x09),
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0200, 0x0000, 0x20),
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0300, 0x0000, 0xff),
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0302, 0x0409, 0xff),
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0301, 0x0409, 0xff),
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0303, 0x0409, 0xff),
-            (usb.LIBUSB_TRANSFER_TYPE_CONTROL, 0x09, 0x0001, 0x0000, 0x00),
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0304, 0x0409, 0xff),
-            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0305, 0x0409, 0xff)
-        ]
-
-    def _perform_control_transfer(self, direction, request, value, index, buffer, length):
-        """
-        Performs a control transfer to the USB device.
-
-        Args:
-            direction (int): Direction of the transfer.
-            request (int): Request type.
-            value (int): Value parameter.
-            index (int): Index parameter.
-            buffer (ctypes array): Data buffer.
-            length (int): Length of the data to transfer.
-
-        Raises:
-            IOError: If the control transfer fails.
-        """
-        status = usb.control_transfer(self.handler, direction, request, value, index, buffer, length, 0)
-        if status < 0:
+
+
+import libusb as usb
+import ctypes as ct
+from collections import namedtuple
+
+# Location and serial number of a connected device, as returned by ThermappDevice.enumerate
+ThermappDeviceInfo = namedtuple("ThermappDeviceInfo", ["bus", "address", "serial"])
+
+
+class ThermappDevice:
+    """
+    Class representing a Thermapp device.
+
+    Without a bus/address or serial number, the first device with matching IDs is opened.
+
+    Attributes:
+        vendor_id (int): USB vendor ID of the device.
+        product_id (int): USB product ID of the device.
+        bus (int | None): USB bus number of the device to open.
+        address (int | None): USB address of the device to open.
+        serial (str | None): Serial number of the device to open.
+        handler (ctypes.POINTER): Handler for the USB device.
+    """
+    
+    def __init__(self, vendor_id=0x1772, product_id=2, bus=None, address=None, serial=None):
+        """
+        Initializes the ThermappDevice with the given vendor and product IDs.
+
+        Args:
+            vendor_id (int): USB vendor ID of the device. Defaults to 0x1772.
+            product_id (int): USB product ID of the device. Defaults to 2.
+            bus (int | None): USB bus number of the device to open, used together with `address`.
+            address (int | None): USB address of the device to open.
+            serial (str | None): Serial number of the device to open.
+        """
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.bus = bus
+        self.address = address
+        self.serial = serial
+        self.handler = None
+
+    @property
+    def name(self) -> str:
+        """
+        str: Short identification of the device, its serial number or bus and address.
+        """
+        if self.serial:
+            return self.serial
+        if self.bus is not None:
+            return f"{self.bus}-{self.address}"
+        return f"{self.vendor_id:04x}:{self.product_id:04x}"
+
+    @staticmethod
+    def enumerate(vendor_id=0x1772, product_id=2) -> list:
+        """
+        Lists the connected devices with the given vendor and product IDs.
+
+        Args:
+            vendor_id (int): USB vendor ID of the devices. Defaults to 0x1772.
+            product_id (int): USB product ID of the devices. Defaults to 2.
+
+        Returns:
+            list: A ThermappDeviceInfo for every device. The serial number is None when
+            the device cannot be opened, e.g. because another process uses it.
+        """
+        return [info for info, _ in ThermappDevice._matching_devices(vendor_id, product_id, open_devices=False)]
+
+    @staticmethod
+    def _matching_devices(vendor_id, product_id, open_devices=False):
+        """
+        Returns the ThermappDeviceInfo and libusb device of every matching device.
+        With `open_devices`, a reference is kept on each device, to be dropped with unref_device.
+        """
+        device_list = ct.POINTER(ct.POINTER(usb.device))()
+        count = usb.get_device_list(None, ct.byref(device_list))
+        if count < 0:
+            raise IOError(f"Listing USB devices failed: {usb.error_name(count)}.")
+        matches = []
+        try:
+            for i in range(count):
+                device = device_list[i]
+                descriptor = usb.device_descriptor()
+                if usb.get_device_descriptor(device, ct.byref(descriptor)) != usb.LIBUSB_SUCCESS:
+                    continue
+                if descriptor.idVendor != vendor_id or descriptor.idProduct != product_id:
+                    continue
+                serial = ThermappDevice._read_serial(device, descriptor.iSerialNumber)
+                info = ThermappDeviceInfo(usb.get_bus_number(device), usb.get_device_address(device), serial)
+                if open_devices:
+                    usb.ref_device(device)
+                matches.append((info, device))
+        finally:
+            usb.free_device_list(device_list, 1)
+        return matches
+
+    @staticmethod
+    def _read_serial(device, string_index):
+        if not string_index:
+            return None
+        handle = ct.POINTER(usb.device_handle)()
+        if usb.open(device, ct.byref(handle)) != usb.LIBUSB_SUCCESS:
+            return None
+        try:
+            buffer = (ct.c_ubyte * 256)()
+            length = usb.get_string_descriptor_ascii(handle, string_index, buffer, len(buffer))
+            return bytes(buffer[:length]).decode("ascii", "replace") if length > 0 else None
+        finally:
+            usb.close(handle)
+
+    def open(self):
+        """
+        Opens the USB device, claims the interface, and configures the device.
+
+        Raises:
+            IOError: If there is an I/O error.
+            usb.USBError: If there is a USB error.
+            Exception: If any other unexpected error occurs.
+        """
+        try:
+            self.handler = self._open_device()
+            self._claim_interface()
+            self._perform_control_transfers()
+        except IOError as io_error:
+            print(f"I/O error: {io_error}")
+            self.close()
+            raise
+        except usb.USBError as usb_error:
+            print(f"USB error: {usb_error}")
+            self.close()
+            raise
+        except Exception as error:
+            print(f"Unexpected error: {error}, {type(error)}")
+            self.close()
+            raise
+
+    def close(self):
+        """
+        Releases the claimed interface and closes the USB device.
+        """
+        if self.handler:
+            usb.release_interface(self.handler, 0)
+            usb.close(self.handler)
+            self.handler = None
+
+    def _open_device(self):
+        """
+        Opens the USB device with the specified vendor and product IDs, and location or serial number if given.
+
+        Returns:
+            ctypes.POINTER: Pointer to the opened USB device.
+
+        Raises:
+            IOError: If the device cannot be found.
+        """
+        if self.bus is not None or self.serial is not None:
+            return self._open_selected_device()
+
+        device_pointer = usb.open_device_with_vid_pid(None, self.vendor_id, self.product_id)
+        if not device_pointer:
+            raise IOError(f"Unable to find USB device with Vendor ID {self.vendor_id} and Product ID {self.product_id}.")
+        return device_pointer.contents
+
+    def _open_selected_device(self):
+        """
+        Opens the device matching the bus/address or serial number.
+
+        Returns:
+            ctypes.POINTER: Pointer to the opened USB device.
+
+        Raises:
+            IOError: If the device cannot be found or opened.
+        """
+        matches = ThermappDevice._matching_devices(self.vendor_id, self.product_id, open_devices=True)
+        selected = None
+        for info, device in matches:
+            if (selected is None
+                    and (self.serial is None or info.serial == self.serial)
+                    and (self.bus is None or (info.bus, info.address) == (self.bus, self.address))):
+                selected = device
+                self.bus, self.address, self.serial = info
+            else:
+                usb.unref_device(device)
+        if selected is None:
+            raise IOError(f"Unable to find USB device {self.name} with Vendor ID {self.vendor_id} "
+                          f"and Product ID {self.product_id}.")
+
+        handle = ct.POINTER(usb.device_handle)()
+        status = usb.open(selected, ct.byref(handle))
+        usb.unref_device(selected)
+        if status != usb.LIBUSB_SUCCESS:
+            raise IOError(f"Opening USB device {self.name} failed: {usb.error_name(status)}.")
+        return handle.contents
+
+    def _claim_interface(self):
+        """
+        Claims the interface of the opened USB device.
+
+        Raises:
+            IOError: If claiming the interface fails.
+        """
+        status = usb.claim_interface(self.handler, 0)
+        if status != usb.LIBUSB_SUCCESS:
+            raise IOError(f"Claim interface failed: {usb.error_name(status)}.")
+
+    def _perform_control_transfers(self):
+        """
+        Configures the USB device by performing a series of control transfers.
+        """
+        buffer = (ct.c_ubyte * 255)()
+        control_transfers = self._get_control_transfers()
+
+        for direction, request, value, index, length in control_transfers:
+            self._perform_control_transfer(direction, request, value, index, buffer, length)
+
+    def _get_control_transfers(self):
+        """
+        Returns a list of control transfer parameters for device configuration.
+
+        Returns:
+            list: A list of tuples containing control transfer parameters.
+        """
+        return [
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0100, 0x0000, 0x12),
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0200, 0x0000, 0x09),
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0200, 0x0000, 0x20),
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0300, 0x0000, 0xff),
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0302, 0x0409, 0xff),
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0301, 0x0409, 0xff),
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0303, 0x0409, 0xff),
+            (usb.LIBUSB_TRANSFER_TYPE_CONTROL, 0x09, 0x0001, 0x0000, 0x00),
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0304, 0x0409, 0xff),
+            (usb.LIBUSB_ENDPOINT_IN, 0x06, 0x0305, 0x0409, 0xff)
+        ]
+
+    def _perform_control_transfer(self, direction, request, value, index, buffer, length):
+        """
+        Performs a control transfer to the USB device.
+
+        Args:
+            direction (int): Direction of the transfer.
+            request (int): Request type.
+            value (int): Value parameter.
+            index (int): Index parameter.
+            buffer (ctypes array): Data buffer.
+            length (int): Length of the data to transfer.
+
+        Raises:
+            IOError: If the control transfer fails.
+        """
+        status = usb.control_transfer(self.handler, direction, request, value, index, buffer, length, 0)
+        if status < 0:
             raise IOError(f"Control transfer failed with status {status}: {usb.error_name(status)}.")
\ No newline at end of file
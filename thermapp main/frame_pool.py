@@ -0,0 +1,152 @@
+
+import threading
+import numpy as np
+
+from constants import ThermappConstants
+
+
+class FramePool:
+    """
+    Hands out reusable frame buffers so the pipeline does not allocate for every frame.
+
+    Buffers are acquired by kind and returned with `release` once their consumer is
+    done with them. A view of a pooled buffer (e.g. the pixel data parsed out of a
+    raw frame) may be released in place of the buffer itself. When a kind runs out,
+    a new buffer is allocated, added to the pool and counted as a miss.
+
+    Releasing a buffer that is already free, or one the pool does not own, is a bug
+    in the caller: it is counted, or raises ValueError in strict mode.
+
+    Attributes:
+        RAW (str): Raw frames as assembled from the USB stream (PACKET_LENGTH uint8).
+        CALIBRATED (str): Calibrated pixel data (PIXEL_DATA_SIZE float32).
+        DISPLAY (str): 8-bit display images (PIXEL_DATA_SIZE uint8).
+        miss_counts (dict): Number of acquisitions that had to allocate, per kind.
+        strict (bool): Whether double and foreign releases raise instead of being counted.
+        double_release_count (int): Number of releases of buffers that were already free.
+        foreign_release_count (int): Number of releases of buffers the pool does not own.
+    """
+    RAW = "raw"
+    CALIBRATED = "calibrated"
+    DISPLAY = "display"
+
+    def __init__(self, raw_count: int = 8, calibrated_count: int = 2, display_count: int = 4,
+                 strict: bool = False):
+        """
+        Initializes the FramePool and preallocates its buffers.
+
+        Args:
+            raw_count (int): Number of raw frame buffers.
+            calibrated_count (int): Number of calibrated frame buffers.
+            display_count (int): Number of display frame buffers.
+            strict (bool): Whether double and foreign releases raise ValueError.
+        """
+        self.lock = threading.Lock()
+        self.specs = {
+            self.RAW: (ThermappConstants.PACKET_LENGTH, np.uint8),
+            self.CALIBRATED: (ThermappConstants.PIXEL_DATA_SIZE, np.float32),
+            self.DISPLAY: (ThermappConstants.PIXEL_DATA_SIZE, np.uint8),
+        }
+        self.miss_counts = {kind: 0 for kind in self.specs}
+        self.strict = strict
+        self.double_release_count = 0
+        self.foreign_release_count = 0
+        self._allocated_counts = {kind: 0 for kind in self.specs}
+        self._owners = {}
+        self._free = {kind: [] for kind in self.specs}
+        self._free_ids = set()
+
+        counts = {self.RAW: raw_count, self.CALIBRATED: calibrated_count, self.DISPLAY: display_count}
+        for kind, count in counts.items():
+            for _ in range(count):
+                buffer = self._allocate(kind)
+                self._free[kind].append(buffer)
+                self._free_ids.add(id(buffer))
+
+    def _allocate(self, kind: str) -> np.ndarray:
+        size, dtype = self.specs[kind]
+        buffer = np.empty(size, dtype=dtype)
+        self._owners[id(buffer)] = (kind, buffer)
+        self._allocated_counts[kind] += 1
+        return buffer
+
+    def _find_owner(self, buffer: np.ndarray):
+        # Follow the chain of views back to the pooled array
+        while buffer is not None:
+            owner = self._owners.get(id(buffer))
+            if owner is not None and owner[1] is buffer:
+                return owner
+            buffer = buffer.obj if isinstance(buffer, memoryview) else getattr(buffer, "base", None)
+        return None
+
+    def acquire(self, kind: str) -> np.ndarray:
+        """
+        Takes a buffer of the given kind from the pool.
+
+        Args:
+            kind (str): One of RAW, CALIBRATED or DISPLAY.
+
+        Returns:
+            np.ndarray: A flat buffer with undefined contents.
+        """
+        with self.lock:
+            if self._free[kind]:
+                buffer = self._free[kind].pop()
+                self._free_ids.discard(id(buffer))
+                return buffer
+            self.miss_counts[kind] += 1
+            return self._allocate(kind)
+
+    def release(self, buffer: np.ndarray | None) -> None:
+        """
+        Returns a buffer, or a view of one, to the pool.
+
+        A buffer that is already free, or that the pool does not own, is not added;
+        the release is counted, or raises in strict mode.
+
+        Args:
+            buffer (np.ndarray | None): The buffer to return.
+
+        Raises:
+            ValueError: In strict mode, if the buffer is already free or not from this pool.
+        """
+        if buffer is None:
+            return
+        with self.lock:
+            owner = self._find_owner(buffer)
+            if owner is None:
+                self.foreign_release_count += 1
+                if self.strict:
+                    raise ValueError("Released a buffer that does not belong to the pool.")
+                return
+            kind, pooled = owner
+            if id(pooled) in self._free_ids:
+                self.double_release_count += 1
+                if self.strict:
+                    raise ValueError("Released a buffer that is already free.")
+                return
+            self._free[kind].append(pooled)
+            self._free_ids.add(id(pooled))
+
+    def available(self, kind: str) -> int:
+        """
+        Returns the number of free buffers of a kind.
+
+        Args:
+            kind (str): One of RAW, CALIBRATED or DISPLAY.
+
+        Returns:
+            int: The number of buffers that can be acquired without a miss.
+        """
+        with self.lock:
+            return len(self._free[kind])
+
+    def outstanding(self, kind: str) -> int:
+        """
+        Returns the number of buffers of a kind that were acquired and not released yet.
+
+        Args:
+            kind (str): One of RAW, CALIBRATED or DISPLAY.
+        """
+        with self.lock:
+            return self._allocated_counts[kind] - len(self._free[kind])
@@ -1,46 +1,110 @@
-
-import libusb as usb
-import sys
-import threading
-from application import ThermappApplication
-from device import ThermappDevice
-
-if __name__ == '__main__':
-    def keyboard_input(connector, device):
-        try:
-            while True:
-                key = input("Press 'q' to stop the device: ")
-                if key.lower() == 'q':
-                    connector.stop()
-                    device.close()
-                    break
-        except KeyboardInterrupt:
-            connector.stop()
-            device.close()
-
-    def main():
-        # Initialize libusb
-        r = usb.init(None)
-        if r < 0:
-            print(f"Failed to initialize libusb: {r} - {usb.strerror(r)}")
-            sys.exit(1)
-
-        try:
-            # Open Thermapp device
-            device = ThermappDevice()
-            device.open()
-
-            # Start Thermapp application
-            connector = ThermappApplication(device=device)
-            connector.start()
-
-            # Start keyboard input monitoring thread
-            keyboard_thread = threading.Thread(target=keyboard_input, args=(connector, device,))
-            keyboard_thread.start()
-            keyboard_thread.join()
-
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            sys.exit(1)
-
+
+import argparse
+import libusb as usb
+import sys
+import threading
+from agc import AutomaticGainControl
+from application import ThermappApplication
+from denoise import TemporalDenoiser
+from device import ThermappDevice
+from render import FrameRenderer
+from replay import ReplayDevice
+from shared_frames import AcquisitionProcess
+
+if __name__ == '__main__':
+    def keyboard_input(connector, device):
+        try:
+            while True:
+                key = input("Press 'q' to stop the device: ")
+                if key.lower() == 'q':
+                    connector.stop()
+                    if device:
+                        device.close()
+                    break
+        except KeyboardInterrupt:
+            connector.stop()
+            if device:
+                device.close()
+
+    def parse_arguments():
+        parser = argparse.ArgumentParser(description="ThermApp thermal imaging application")
+        parser.add_argument("--replay", metavar="PREFIX",
+                            help="replay a raw recording instead of reading from the camera")
+        parser.add_argument("--synthetic", action="store_true",
+                            help="stream synthetic frames instead of reading from the camera")
+        parser.add_argument("--max-speed", action="store_true",
+                            help="replay as fast as the pipeline runs instead of in real time")
+        parser.add_argument("--serial", help="open the camera with this serial number")
+        parser.add_argument("--list-cameras", action="store_true",
+                            help="list the connected cameras and exit")
+        parser.add_argument("--acquisition-process", action="store_true",
+                            help="read the camera and assemble frames in a separate process")
+        parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                            help="serve pipeline metrics at http://127.0.0.1:PORT/metrics")
+        parser.add_argument("--emissivity", type=float,
+                            help="emissivity of the observed surface used for temperatures")
+        parser.add_argument("--denoise", type=float, metavar="ALPHA",
+                            help="filter frames over time, weighting each new frame with ALPHA (0-1]")
+        parser.add_argument("--motion-threshold", type=float, metavar="COUNTS",
+                            help="with --denoise, stop filtering pixels that change by more than COUNTS")
+        parser.add_argument("--agc", choices=[AutomaticGainControl.LINEAR, AutomaticGainControl.PERCENTILE,
+                                              AutomaticGainControl.PLATEAU],
+                            help="map frames to 8 bits with histogram-based automatic gain control")
+        parser.add_argument("--palette", choices=[FrameRenderer.WHITE_HOT, FrameRenderer.IRONBOW,
+                                                  FrameRenderer.RAINBOW],
+                            help="color palette of the displayed images")
+        return parser.parse_args()
+
+    def main():
+        args = parse_arguments()
+        device = None
+        frame_source = None
+
+        if args.acquisition_process:
+            # The acquisition process opens the camera itself
+            frame_source = AcquisitionProcess(replay=args.replay, synthetic=args.synthetic,
+                                              realtime=not args.max_speed)
+        elif args.replay or args.synthetic:
+            frame_source = ReplayDevice(recording=args.replay, realtime=not args.max_speed)
+        else:
+            # Initialize libusb
+            r = usb.init(None)
+            if r < 0:
+                print(f"Failed to initialize libusb: {r} - {usb.strerror(r)}")
+                sys.exit(1)
+
+            if args.list_cameras:
+                for info in ThermappDevice.enumerate():
+                    print(f"bus {info.bus} address {info.address} serial {info.serial or '?'}")
+                return
+
+        try:
+            if frame_source is None:
+                # Open Thermapp device
+                device = ThermappDevice(serial=args.serial)
+                device.open()
+
+            # Start Thermapp application
+            connector = ThermappApplication(device=device, frame_source=frame_source)
+            if args.emissivity is not None:
+                connector.radiometric_converter.emissivity = args.emissivity
+            if args.denoise is not None:
+                connector.denoiser = TemporalDenoiser(args.denoise, args.motion_threshold)
+            if args.agc is not None:
+                connector.set_agc(AutomaticGainControl(args.agc))
+            if args.palette is not None:
+                connector.display_thread.renderer.palette = args.palette
+            if args.metrics_port is not None:
+                connector.start_metrics_server(args.metrics_port)
+            connector.start()
+
+            # Start keyboard input monitoring thread
+            keyboard_thread = threading.Thread(target=keyboard_input, args=(connector, device,))
+            keyboard_thread.start()
+            keyboard_thread.join()
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            sys.exit(1)
+
     main()
\ No newline at end of file
@@ -0,0 +1,288 @@
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds of the stage timing histogram buckets
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.04, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed bucket bounds, as exposed by Prometheus.
+
+    Attributes:
+        bounds (list): Upper bounds of the buckets, in increasing order.
+        counts (list): Number of observations per bucket, the last one being +Inf.
+        sum (float): Sum of all observations.
+        count (int): Number of observations.
+    """
+
+    def __init__(self, bounds=STAGE_BUCKETS):
+        """
+        Initializes an empty histogram.
+
+        Args:
+            bounds (iterable): Upper bounds of the buckets, in increasing order.
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """
+        Adds one observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape_label(value) -> str:
+    # Backslash, double quote and line feed must be escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    Collects pipeline metrics and renders them in the Prometheus text format.
+
+    Stage timings are updated on the hot path with a few Python operations and no
+    locking; only adding a new stage takes the registry's lock. Counters may be
+    shared by several threads, e.g. the frame readers of several cameras, so they
+    are incremented under the lock, which is cheap since they only count rare
+    events. Callbacks are added under the lock too, and render holds it while it
+    takes a snapshot of all metrics, so metrics first seen while they are scraped
+    are safe. Values that components already keep, such as queue depths or resync
+    counters, are registered as callbacks and only read when the metrics are scraped.
+
+    Attributes:
+        enabled (bool): Whether stage timings and counters are recorded.
+        prefix (str): Prefix of all metric names.
+    """
+
+    def __init__(self, prefix: str = "thermapp"):
+        """
+        Initializes an empty registry.
+
+        Args:
+            prefix (str): Prefix of all metric names.
+        """
+        self.enabled = True
+        self.prefix = prefix
+        self.stage_histograms = {}
+        self.counters = {}
+        self.callbacks = {}
+        self.help_texts = {}
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """
+        Records the time a pipeline stage took for one frame.
+
+        Args:
+            stage (str): Name of the stage, e.g. "parse" or "display".
+            seconds (float): Duration of the stage.
+        """
+        if not self.enabled:
+            return
+        histogram = self.stage_histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stage_histograms.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    @contextmanager
+    def time_stage(self, stage: str):
+        """
+        Context manager recording the duration of its block as a stage timing.
+
+        Args:
+            stage (str): Name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    def increment(self, name: str, value: int = 1, help_text: str = "") -> None:
+        """
+        Increments a counter.
+
+        Args:
+            name (str): Name of the counter, without prefix.
+            value (int): Amount to add.
+            help_text (str): Description shown in the exposition.
+        """
+        if not self.enabled:
+            return
+        # Read-modify-write under the lock, so increments from several threads add up
+        with self._lock:
+            if help_text and name not in self.help_texts:
+                self.help_texts[name] = help_text
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def register(self, name: str, function, help_text: str = "", kind: str = "gauge", label: str = "kind") -> None:
+        """
+        Registers a value read from a callback when the metrics are scraped.
+
+        Args:
+            name (str): Name of the metric, without prefix.
+            function (callable): Returns the current value, None to omit it, or a dict
+                mapping label values to values.
+            help_text (str): Description shown in the exposition.
+            kind (str): Prometheus metric type, "gauge" or "counter".
+            label (str): Name of the label used when the callback returns a dict.
+        """
+        with self._lock:
+            self.callbacks[name] = (function, kind, label)
+            self.help_texts[name] = help_text
+
+    def unregister(self, name: str) -> None:
+        """
+        Removes a callback registered with `register`.
+
+        Args:
+            name (str): Name of the metric, without prefix.
+        """
+        with self._lock:
+            self.callbacks.pop(name, None)
+
+    def _header(self, lines: list, name: str, kind: str) -> str:
+        full_name = f"{self.prefix}_{name}"
+        help_text = self.help_texts.get(name)
+        if help_text:
+            lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        return full_name
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            stage_histograms = sorted(self.stage_histograms.items())
+            counters = sorted(self.counters.items())
+            callbacks = sorted(self.callbacks.items())
+        lines = []
+
+        if stage_histograms:
+            full_name = self._header(lines, "stage_seconds", "histogram")
+            for stage, histogram in stage_histograms:
+                stage = _escape_label(stage)
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{full_name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                # +Inf and the count are summed from the same bucket counts, not taken from
+                # `count`, which observe updates separately, so buckets never decrease
+                cumulative += histogram.counts[-1]
+                lines.append(f'{full_name}_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+                lines.append(f'{full_name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{full_name}_count{{stage="{stage}"}} {cumulative}')
+
+        for name, value in counters:
+            full_name = self._header(lines, name, "counter")
+            lines.append(f"{full_name} {value}")
+
+        for name, (function, kind, label) in callbacks:
+            try:
+                value = function()
+            except Exception as error:
+                print(f"Metrics callback {name} failed: {error}")
+                continue
+            if value is None:
+                continue
+            full_name = self._header(lines, name, kind)
+            if isinstance(value, dict):
+                for label_value, item in sorted(value.items()):
+                    lines.append(f'{full_name}{{{label}="{_escape_label(label_value)}"}} {float(item)}')
+            else:
+                lines.append(f"{full_name} {float(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """
+        Clears the stage timings and counters. Registered callbacks are kept.
+        """
+        with self._lock:
+            self.stage_histograms = {}
+            self.counters = {}
+
+
+class MetricsServer:
+    """
+    Serves a registry over HTTP at /metrics from a background thread.
+
+    Attributes:
+        registry (MetricsRegistry): The registry to expose.
+        host (str): Address to listen on. Defaults to localhost only.
+        port (int): Port to listen on.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        """
+        Initializes the MetricsServer.
+
+        Args:
+            registry (MetricsRegistry): The registry to expose.
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 to pick a free one.
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """
+        Starts serving. The actual port is available in `port` afterwards.
+        """
+        registry = self.registry
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+
+
+# Registry shared by the pipeline stages
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,168 @@
+
+import os
+import numpy as np
+import cv2
+
+from agc import AutomaticGainControl
+from calibration import BadPixelMap, CalibrationCache, NonUniformityCorrection
+from constants import ThermappConstants
+from frame_pool import FramePool
+
+
+class FrameProcessor:
+    """
+    Turns raw pixel data into 8-bit images: bad pixel replacement, non-uniformity
+    correction, calibration, and the global offset or automatic gain control.
+
+    Frames are corrected as gain * (raw - calibration) + global offset, applied as
+    gain * raw - bias with the gain and bias maps recomputed by update_correction()
+    whenever their inputs change. Bad pixels are replaced in the raw pixel data with
+    correct_raw() before anything else reads it; a replaced pixel carries its
+    neighbour's raw counts, so the maps give it the neighbour's correction too.
+
+    One processor holds the state of one sensor, and is used by ThermappApplication
+    and by every ThermappCamera, so a sensor gives the same images either way.
+
+    Attributes:
+        frame_pool (FramePool): Pool of the display and calibrated buffers.
+        calibration_image (np.ndarray): Per-pixel offset subtracted from the frames.
+        global_offset (float): Brightness offset added after calibration.
+        nuc (NonUniformityCorrection | None): Per-pixel gain correction.
+        bad_pixels (BadPixelMap | None): Dead and noisy pixels to replace.
+        agc (AutomaticGainControl | None): Gain control used instead of the global offset.
+    """
+
+    def __init__(self, frame_pool: FramePool, pixel_count: int = ThermappConstants.PIXEL_DATA_SIZE):
+        """
+        Initializes a FrameProcessor without calibration.
+
+        Args:
+            frame_pool (FramePool): Pool of the display and calibrated buffers.
+            pixel_count (int): Number of pixels per frame.
+        """
+        self.frame_pool = frame_pool
+        self.pixel_count = pixel_count
+        self.calibration_image = np.zeros(pixel_count, dtype=np.float32)
+        self.global_offset = 70  # initial brightness offset
+        self.nuc = None
+        self.bad_pixels = None
+        self.agc = None
+        self.agc_frame = np.empty(pixel_count, dtype=np.uint16)
+        self.correction_gain = np.empty(pixel_count, dtype=np.float32)
+        self.correction_bias = np.empty(pixel_count, dtype=np.float32)
+        self.update_correction()
+
+    def _load_stored(self, path: str, load, size, description: str):
+        # Loads a correction stored next to the calibration profiles, None if there is
+        # no usable one
+        if not os.path.exists(path):
+            return None
+        try:
+            stored = load(path)
+        except (OSError, ValueError) as error:
+            print(f"Ignoring {description} {path}: {error}")
+            return None
+        if size(stored) != self.pixel_count:
+            print(f"Ignoring {description} {path}: wrong frame size.")
+            return None
+        print(f"[DEBUG] Loaded {description} {path}.")
+        return stored
+
+    def load_corrections(self, calibration_cache: CalibrationCache, device_key: str) -> None:
+        """
+        Loads and uses the device's stored non-uniformity correction and bad pixel map,
+        where there are usable ones.
+
+        Args:
+            calibration_cache (CalibrationCache): The cache the corrections are stored in.
+            device_key (str): Key of the device, from CalibrationCache.device_key.
+        """
+        self.nuc = self._load_stored(calibration_cache.nuc_path(device_key), NonUniformityCorrection.load,
+                                     lambda nuc: nuc.gain.size, "non-uniformity correction")
+        self.bad_pixels = self._load_stored(calibration_cache.bad_pixel_path(device_key), BadPixelMap.load,
+                                            lambda bad_pixels: bad_pixels.mask.size, "bad pixel map")
+        self.update_correction()
+
+    def update_correction(self):
+        """
+        Recomputes the gain and bias maps process applies, from the calibration image,
+        global offset, non-uniformity gain and bad pixel map. Must be called after
+        changing any of them. With automatic gain control, the gain control's zero
+        level replaces the global offset.
+        """
+        if self.nuc is None:
+            np.copyto(self.correction_bias, self.calibration_image)
+        else:
+            np.copyto(self.correction_gain, self.nuc.gain)
+            np.multiply(self.nuc.gain, self.calibration_image, out=self.correction_bias)
+        offset = self.global_offset if self.agc is None else AutomaticGainControl.ZERO_LEVEL
+        self.correction_bias -= np.float32(offset)
+        # Bad pixels carry their neighbour's raw counts, so they take its correction too
+        if self.bad_pixels is not None:
+            self.bad_pixels.correct(self.correction_bias)
+            if self.nuc is not None:
+                self.bad_pixels.correct(self.correction_gain)
+
+    def set_calibration(self, calibration_image: np.ndarray):
+        """
+        Uses a new calibration image.
+        """
+        np.copyto(self.calibration_image, calibration_image.reshape(-1), casting="unsafe")
+        self.update_correction()
+
+    def blend_calibration(self, new_calibration: np.ndarray, weight: float = 0.1):
+        """
+        Blends a new calibration image into the current one with the given weight.
+        """
+        # Blend in place, without temporaries
+        cv2.addWeighted(self.calibration_image, 1 - weight, new_calibration, weight, 0, dst=self.calibration_image)
+        self.update_correction()
+
+    def set_agc(self, agc: AutomaticGainControl | None):
+        """
+        Maps frames to 8 bits with an automatic gain control, or with the global
+        offset again if None.
+        """
+        self.agc = agc
+        self.update_correction()
+
+    def correct_raw(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Replaces the bad pixels of raw pixel data in place.
+
+        Returns:
+            np.ndarray: `pixels`.
+        """
+        if self.bad_pixels is not None:
+            self.bad_pixels.correct(pixels)
+        return pixels
+
+    def process(self, frame: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Applies non-uniformity correction, calibration and global offset to raw frame
+        data, whose bad pixels have been replaced already.
+
+        The bias subtraction saturates straight to 8 bits, so without a non-uniformity
+        correction this is a single pass; with one, the gain is applied first into a
+        pooled float32 buffer. The result is written to `out`, or to a display buffer
+        from the pool if none is given.
+
+        With automatic gain control, the subtraction saturates to 16 bits around the
+        gain control's zero level instead, and the gain control maps the result to 8 bits.
+        """
+        if out is None:
+            out = self.frame_pool.acquire(FramePool.DISPLAY)
+        if self.agc is None:
+            corrected, depth = out, cv2.CV_8U
+        else:
+            corrected, depth = self.agc_frame, cv2.CV_16U
+        if self.nuc is None:
+            cv2.subtract(frame, self.correction_bias, dst=corrected, dtype=depth)
+        else:
+            calibrated = self.frame_pool.acquire(FramePool.CALIBRATED)
+            cv2.multiply(frame, self.correction_gain, dst=calibrated, dtype=cv2.CV_32F)
+            cv2.subtract(calibrated, self.correction_bias, dst=corrected, dtype=depth)
+            self.frame_pool.release(calibrated)
+        if self.agc is not None:
+            self.agc.apply(corrected, out)
+        return out
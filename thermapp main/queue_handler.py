@@ -1,55 +1,173 @@
-
-
-from multiprocessing import Queue
-import queue
-import numpy as np
-
-class ThermappDataQueueHandler:
-    """
-    Handles the data queue for received Thermapp data.
-
-    Attributes:
-        received_data_queue (queue.Queue): A queue to store received Thermapp data.
-    """
-    remaining_data = np.zeros((0), dtype=np.uint8)
-        
-    received_data_queue = Queue()
-
-    @staticmethod
-    def enqueue_received_data(data_array: np.ndarray) -> None:
-        """
-        Adds data to the received data queue.
-
-        Args:
-            data_array (np.ndarray): The data to be added to the queue.
-
-        Raises:
-            ValueError: If the data is not a numpy ndarray.
-        """
-        if not isinstance(data_array, np.ndarray):
-            raise ValueError("Data must be a numpy ndarray.")
-        try:
-            ThermappDataQueueHandler.received_data_queue.put(data_array, block= True)
-
-        except queue.Full:
-            print("Warning: The queue is full. Data was not added.")
-    
-    
-    def read_data_from_queue(item_count: int) -> np.ndarray:
-        """
-        Reads the specified number of items from the data queue.
-
-        Args:
-            item_count (int): The number of items to read from the queue.
-
-        Returns:
-            np.ndarray: The read data.
-        """
-        read_data = np.append(ThermappDataQueueHandler.remaining_data, np.zeros(0))
-        try:
-            while len(read_data) < item_count:
-                read_data = np.append(read_data, ThermappDataQueueHandler.received_data_queue.get())
-        except queue.Empty:
-            return read_data
-        ThermappDataQueueHandler.remaining_data = read_data[item_count:]
-        return read_data[:item_count]
\ No newline at end of file
+
+
+import numpy as np
+
+from constants import ThermappConstants
+from frame_pool import FramePool
+from ring_buffer import ByteRingBuffer
+
+class ThermappDataQueueHandler:
+    """
+    Handles the data queue for received Thermapp data.
+
+    The USB callback and the frame reader run in threads of the same process, so
+    the data is passed through a shared ring buffer instead of a pickling queue.
+
+    Attributes:
+        received_data_ring (ByteRingBuffer): A ring buffer to store received Thermapp data.
+        read_timeout (float | None): Maximum time a read waits for data, or None to wait forever.
+    """
+    received_data_ring = ByteRingBuffer()
+
+    read_timeout = None
+
+    @staticmethod
+    def enqueue_received_data(data_array: np.ndarray) -> None:
+        """
+        Adds data to the received data ring buffer.
+
+        Data that does not fit is dropped and counted in the ring buffer's overflow counters.
+
+        Args:
+            data_array (np.ndarray): The data to be added to the ring buffer.
+
+        Raises:
+            ValueError: If the data is not a numpy ndarray.
+        """
+        if not isinstance(data_array, np.ndarray):
+            raise ValueError("Data must be a numpy ndarray.")
+        ThermappDataQueueHandler.received_data_ring.write(data_array)
+
+    @staticmethod
+    def read_data_into(out: np.ndarray, ring: ByteRingBuffer | None = None) -> int:
+        """
+        Copies data from the ring buffer straight into a caller-provided buffer.
+
+        Args:
+            out (np.ndarray): The uint8 buffer to fill.
+            ring (ByteRingBuffer | None): Ring buffer to read from, e.g. one camera's when
+                several are used. Defaults to `received_data_ring`.
+
+        Returns:
+            int: The number of bytes written to `out`, less than its length if the read timed out.
+        """
+        if ring is None:
+            ring = ThermappDataQueueHandler.received_data_ring
+        copied = 0
+        while copied < len(out):
+            count = ring.read_into(out[copied:], ThermappDataQueueHandler.read_timeout)
+            if count == 0:
+                break
+            copied += count
+        return copied
+
+    @staticmethod
+    def read_data_from_queue(item_count: int) -> np.ndarray:
+        """
+        Reads the specified number of items from the data queue.
+
+        Args:
+            item_count (int): The number of items to read from the queue.
+
+        Returns:
+            np.ndarray: The read data.
+        """
+        read_data = np.empty(item_count, dtype=np.uint8)
+        copied = ThermappDataQueueHandler.read_data_into(read_data)
+        return read_data[:copied]
+
+
+class ChunkAssembler:
+    """
+    Assembles queued USB chunks into a preallocated frame buffer.
+
+    Every received byte is copied exactly once, from its chunk into the frame
+    buffer. Completed frames are handed over as they are and a new buffer is
+    started for the next frame, taken from the frame pool if one is given.
+
+    Attributes:
+        capacity (int): Size of the frame buffer in bytes.
+        frame_pool (FramePool | None): Pool providing the raw frame buffers.
+        ring (ByteRingBuffer | None): Ring buffer the chunks are read from, None for the shared one.
+        buffer (np.ndarray): The uint8 buffer the chunks are written into.
+        length (int): Number of valid bytes at the start of the buffer.
+    """
+
+    def __init__(self, capacity: int = ThermappConstants.PACKET_LENGTH, frame_pool: FramePool | None = None,
+                 ring: ByteRingBuffer | None = None):
+        """
+        Initializes the ChunkAssembler with an empty frame buffer.
+
+        Args:
+            capacity (int): Size of the frame buffer in bytes.
+            frame_pool (FramePool | None): Pool providing the raw frame buffers.
+            ring (ByteRingBuffer | None): Ring buffer to read from. Defaults to the one
+                ThermappDataQueueHandler reads from.
+        """
+        self.capacity = capacity
+        self.frame_pool = frame_pool
+        self.ring = ring
+        self.buffer = self._new_buffer()
+        self.length = 0
+
+    def _new_buffer(self) -> np.ndarray:
+        if self.frame_pool is not None:
+            return self.frame_pool.acquire(FramePool.RAW)
+        return np.empty(self.capacity, dtype=np.uint8)
+
+    @property
+    def data(self) -> np.ndarray:
+        """
+        np.ndarray: View of the valid bytes in the frame buffer.
+        """
+        return self.buffer[:self.length]
+
+    def fill(self, required_length: int) -> int:
+        """
+        Reads from the queue until the buffer holds at least `required_length` bytes.
+
+        Args:
+            required_length (int): The number of bytes wanted in the buffer.
+
+        Returns:
+            int: The number of valid bytes in the buffer.
+        """
+        required_length = min(required_length, self.capacity)
+        while self.length < required_length:
+            copied = ThermappDataQueueHandler.read_data_into(self.buffer[self.length:required_length], self.ring)
+            if copied == 0:
+                break
+            self.length += copied
+        return self.length
+
+    def discard(self, count: int) -> None:
+        """
+        Drops bytes from the front of the buffer, moving the rest to the start.
+
+        Args:
+            count (int): The number of bytes to drop.
+        """
+        count = min(count, self.length)
+        remaining = self.length - count
+        if count and remaining:
+            self.buffer[:remaining] = self.buffer[count:self.length]
+        self.length = remaining
+
+    def take_frame(self, frame_length: int) -> np.ndarray:
+        """
+        Hands over the first `frame_length` bytes and starts a new frame buffer.
+
+        Frames taken from a pooled buffer must be released to the pool by their consumer.
+
+        Args:
+            frame_length (int): The number of bytes making up the frame.
+
+        Returns:
+            np.ndarray: The frame, backed by the buffer it was assembled in.
+        """
+        frame = self.buffer[:frame_length]
+        leftover = self.buffer[frame_length:self.length]
+        self.buffer = self._new_buffer()
+        self.buffer[:leftover.size] = leftover
+        self.length = leftover.size
+        return frame
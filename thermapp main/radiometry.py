@@ -0,0 +1,227 @@
+
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+
+from constants import ThermappConstants
+
+# Planck calibration constants of the sensor; E is the emissivity of the observed surface
+PlanckConstants = namedtuple("PlanckConstants", ["R1", "B", "F", "O", "R2", "E"])
+
+DEFAULT_PLANCK_CONSTANTS = PlanckConstants(17711.559, 1447.2, 0.57999998, -4096, 0.025931966, 0.987)
+
+# Empirical correction added to the Planck temperature, in kelvin
+KELVIN_CORRECTION = 25
+
+# Number of raw uint16 counts, the size of a conversion table
+TABLE_SIZE = 1 << 16
+
+# Temperature statistics of a region, in degrees Celsius
+RegionTemperature = namedtuple("RegionTemperature", ["min", "max", "mean"])
+
+
+def _counts_to_celsius(counts: np.ndarray, constants: PlanckConstants) -> np.ndarray:
+    # Inverse of Planck's law on float64 counts; non-positive radiances are clamped
+    # so the logarithm stays defined
+    radiance = (counts - constants.O) * constants.R2 / constants.E
+    np.maximum(radiance, 1e-3, out=radiance)
+    kelvin = constants.B / np.log(constants.R1 / radiance + constants.F)
+    return kelvin + KELVIN_CORRECTION - 273.15
+
+
+def pixels_to_celsius(count: float, constants: PlanckConstants = DEFAULT_PLANCK_CONSTANTS) -> float:
+    """
+    Converts one raw count to degrees Celsius.
+
+    Args:
+        count (float): The raw pixel count.
+        constants (PlanckConstants): The Planck constants.
+
+    Returns:
+        float: The temperature in degrees Celsius.
+    """
+    return float(_counts_to_celsius(np.array([count], dtype=np.float64), constants)[0])
+
+
+@lru_cache(maxsize=8)
+def celsius_table(constants: PlanckConstants = DEFAULT_PLANCK_CONSTANTS) -> np.ndarray:
+    """
+    Returns the temperature in degrees Celsius of every raw uint16 count.
+
+    Tables are cached per set of constants and shared, so they are read-only.
+
+    Args:
+        constants (PlanckConstants): The Planck constants.
+
+    Returns:
+        np.ndarray: The read-only TABLE_SIZE float32 table.
+    """
+    table = _counts_to_celsius(np.arange(TABLE_SIZE, dtype=np.float64), constants).astype(np.float32)
+    table.flags.writeable = False
+    return table
+
+
+class RadiometricConverter:
+    """
+    Converts raw uint16 frames to degrees Celsius through a lookup table.
+
+    The table holds the Planck conversion of all 65,536 raw counts, so a frame is
+    converted with a single np.take. It is looked up again when the constants or
+    the emissivity change, and tables of recently used settings are cached.
+
+    Full frames are converted through a preallocated index buffer, so they cause no
+    allocations, but only one thread at a time may convert them.
+
+    The probes `point`, `line_profile` and `rectangle` read the raw counts of a
+    frame and look up only the sampled pixels, so each sample costs one lookup.
+
+    Attributes:
+        constants (PlanckConstants): The Planck constants, including the emissivity.
+        table (np.ndarray): Temperature of every raw count (TABLE_SIZE float32).
+    """
+
+    def __init__(self, constants: PlanckConstants = DEFAULT_PLANCK_CONSTANTS, emissivity: float | None = None,
+                 pixel_count: int = ThermappConstants.PIXEL_DATA_SIZE):
+        """
+        Initializes the RadiometricConverter.
+
+        Args:
+            constants (PlanckConstants): The Planck constants.
+            emissivity (float | None): Emissivity overriding the one in `constants`.
+            pixel_count (int): Number of pixels of a full frame.
+        """
+        if emissivity is not None:
+            constants = constants._replace(E=emissivity)
+        self.constants = constants
+        # np.take converts other index types to intp in a temporary array
+        self._indices = np.empty(pixel_count, dtype=np.intp)
+
+    @property
+    def constants(self) -> PlanckConstants:
+        return self._constants
+
+    @constants.setter
+    def constants(self, constants: PlanckConstants):
+        if not 0 < constants.E <= 1:
+            raise ValueError(f"Emissivity must be in (0, 1], got {constants.E}.")
+        self._constants = PlanckConstants(*(float(value) for value in constants))
+        self.table = celsius_table(self._constants)
+
+    @property
+    def emissivity(self) -> float:
+        """
+        float: Emissivity of the observed surface, between 0 and 1.
+        """
+        return self._constants.E
+
+    @emissivity.setter
+    def emissivity(self, emissivity: float):
+        self.constants = self._constants._replace(E=emissivity)
+
+    def to_celsius(self, raw: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Converts raw counts to degrees Celsius.
+
+        Args:
+            raw (np.ndarray): Raw uint16 counts, of any shape.
+            out (np.ndarray | None): float32 buffer of the same shape to write into.
+
+        Returns:
+            np.ndarray: The float32 temperatures.
+        """
+        if raw.size == self._indices.size:
+            indices = self._indices.reshape(raw.shape)
+            np.copyto(indices, raw, casting="unsafe")
+        else:
+            indices = raw
+        # uint16 counts are always within the table, and "clip" avoids buffering `out`
+        return np.take(self.table, indices, out=out, mode="clip")
+
+    def celsius(self, count: int) -> float:
+        """
+        Converts one raw count to degrees Celsius.
+
+        Args:
+            count (int): The raw count, 0 to 65535.
+
+        Returns:
+            float: The temperature.
+        """
+        return float(self.table[int(count)])
+
+    @staticmethod
+    def _frame(raw: np.ndarray) -> np.ndarray:
+        # Probes take frames as (height, width) arrays or as flat pixel data
+        if raw.ndim == 1:
+            return raw.reshape(ThermappConstants.FRAME_HEIGHT, ThermappConstants.FRAME_WIDTH)
+        return raw
+
+    def point(self, raw: np.ndarray, x: int, y: int) -> float:
+        """
+        Returns the temperature of one pixel of a raw frame.
+
+        Args:
+            raw (np.ndarray): The raw uint16 frame.
+            x (int): Column of the pixel.
+            y (int): Row of the pixel.
+
+        Returns:
+            float: The temperature in degrees Celsius.
+
+        Raises:
+            IndexError: If the pixel is outside the frame.
+        """
+        frame = self._frame(raw)
+        if not (0 <= x < frame.shape[1] and 0 <= y < frame.shape[0]):
+            raise IndexError(f"Pixel ({x}, {y}) is outside the frame.")
+        return float(self.table[frame[y, x]])
+
+    def line_profile(self, raw: np.ndarray, start: tuple, end: tuple) -> np.ndarray:
+        """
+        Returns the temperatures along a line of a raw frame, one sample per pixel step.
+
+        Args:
+            raw (np.ndarray): The raw uint16 frame.
+            start (tuple): (x, y) of the first pixel.
+            end (tuple): (x, y) of the last pixel.
+
+        Returns:
+            np.ndarray: The float32 temperatures from start to end.
+
+        Raises:
+            IndexError: If an end point is outside the frame.
+        """
+        frame = self._frame(raw)
+        (x0, y0), (x1, y1) = start, end
+        for x, y in (start, end):
+            if not (0 <= x < frame.shape[1] and 0 <= y < frame.shape[0]):
+                raise IndexError(f"Pixel ({x}, {y}) is outside the frame.")
+        count = max(abs(x1 - x0), abs(y1 - y0)) + 1
+        xs = np.rint(np.linspace(x0, x1, count)).astype(np.intp)
+        ys = np.rint(np.linspace(y0, y1, count)).astype(np.intp)
+        return np.take(self.table, frame[ys, xs], mode="clip")
+
+    def rectangle(self, raw: np.ndarray, x: int, y: int, width: int, height: int) -> RegionTemperature:
+        """
+        Returns the minimum, maximum and mean temperature of a rectangle of a raw frame.
+
+        Args:
+            raw (np.ndarray): The raw uint16 frame.
+            x (int): Left column of the rectangle.
+            y (int): Top row of the rectangle.
+            width (int): Width of the rectangle in pixels.
+            height (int): Height of the rectangle in pixels.
+
+        Returns:
+            RegionTemperature: The statistics in degrees Celsius.
+
+        Raises:
+            ValueError: If the rectangle does not overlap the frame.
+        """
+        frame = self._frame(raw)
+        counts = frame[max(y, 0):max(y + height, 0), max(x, 0):max(x + width, 0)]
+        if counts.size == 0:
+            raise ValueError(f"Rectangle ({x}, {y}, {width}, {height}) does not overlap the frame.")
+        temperatures = np.take(self.table, counts, mode="clip")
+        return RegionTemperature(float(temperatures.min()), float(temperatures.max()),
+                                 float(temperatures.mean(dtype=np.float64)))
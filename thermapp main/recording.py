@@ -0,0 +1,239 @@
+
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+from constants import ThermappConstants
+from frame_pool import FramePool
+
+# One sidecar index entry per recorded frame
+INDEX_DTYPE = np.dtype([
+    ("frame_number", "<u4"),
+    ("temperature", "<u2"),
+    ("timestamp", "<f8"),
+    ("offset", "<u8"),
+])
+
+DATA_EXTENSION = ".raw"
+INDEX_EXTENSION = ".idx"
+
+
+class RawFrameRecorder:
+    """
+    Records complete raw frames to an append-only file from a background writer thread.
+
+    A recording is made of two files sharing a path prefix: `<prefix>.raw` holds the
+    PACKET_LENGTH frames back to back, exactly as received, and `<prefix>.idx` holds
+    one INDEX_DTYPE entry per frame with its frame number, sensor temperature,
+    capture timestamp and byte offset in the data file.
+
+    Frames are copied when they are queued, so the caller may reuse its buffer right
+    away. The copies come from the recorder's own pool, holding a buffer for every
+    queued frame and the one being written, so a backlog neither allocates nor takes
+    buffers from the pipeline. When the writer falls behind and the queue is full,
+    frames are dropped and counted instead of blocking the caller.
+
+    Attributes:
+        path_prefix (str): Path of the recording without extension.
+        frame_pool (FramePool): Pool providing the buffers frames are copied into.
+        recorded_frames (int): Number of frames written.
+        dropped_frames (int): Number of frames dropped because the queue was full.
+    """
+
+    def __init__(self, path_prefix: str, queue_size: int = 32):
+        """
+        Initializes the RawFrameRecorder and starts its writer thread.
+
+        Args:
+            path_prefix (str): Path of the recording without extension.
+            queue_size (int): Maximum number of frames waiting to be written.
+        """
+        self.path_prefix = path_prefix
+        self.frame_pool = FramePool(raw_count=queue_size + 1, calibrated_count=0, display_count=0)
+        self.recorded_frames = 0
+        self.dropped_frames = 0
+
+        directory = os.path.dirname(path_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.data_file = open(path_prefix + DATA_EXTENSION, "ab")
+        self.index_file = open(path_prefix + INDEX_EXTENSION, "ab")
+        self.offset = self.data_file.tell()
+
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def record(self, frame: np.ndarray, frame_number: int, temperature: int, timestamp: float | None = None) -> bool:
+        """
+        Queues a raw frame for writing.
+
+        Args:
+            frame (np.ndarray): The complete raw frame (PACKET_LENGTH uint8).
+            frame_number (int): The frame number from the frame header.
+            temperature (int): The sensor temperature from the frame header.
+            timestamp (float | None): Capture time in seconds since the epoch, see
+                FrameSequenceInfo.capture_time. Defaults to now.
+
+        Returns:
+            bool: True if the frame was queued, False if it was dropped.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if self.frame_queue.full():
+            self.dropped_frames += 1
+            return False
+
+        buffer = self.frame_pool.acquire(FramePool.RAW)
+        np.copyto(buffer, frame)
+
+        try:
+            self.frame_queue.put_nowait((buffer, frame_number, temperature, timestamp))
+        except queue.Full:
+            self.dropped_frames += 1
+            self.frame_pool.release(buffer)
+            return False
+        return True
+
+    def run(self):
+        while True:
+            item = self.frame_queue.get()
+            if item is None:
+                break
+            buffer, frame_number, temperature, timestamp = item
+            try:
+                self._write(buffer, frame_number, temperature, timestamp)
+            except OSError as error:
+                print(f"Recording error: {error}")
+            finally:
+                self.frame_pool.release(buffer)
+
+    def _write(self, buffer: np.ndarray, frame_number: int, temperature: int, timestamp: float):
+        entry = np.zeros(1, dtype=INDEX_DTYPE)
+        entry["frame_number"] = frame_number
+        entry["temperature"] = temperature
+        entry["timestamp"] = timestamp
+        entry["offset"] = self.offset
+
+        self.data_file.write(buffer)
+        self.index_file.write(entry.tobytes())
+        self.offset += buffer.nbytes
+        self.recorded_frames += 1
+
+    def stop(self):
+        """
+        Writes the queued frames and closes the recording.
+        """
+        self.frame_queue.put(None)
+        self.thread.join()
+        self.data_file.close()
+        self.index_file.close()
+
+
+class RawFrameRecording:
+    """
+    Reads a recording written by RawFrameRecorder through memory maps.
+
+    Frames are returned as views of the mapped data file, so seeking and scrubbing
+    through long sessions neither copies frames nor reads the whole file.
+
+    Attributes:
+        path_prefix (str): Path of the recording without extension.
+        index (np.ndarray): The INDEX_DTYPE entries, one per frame.
+        data (np.ndarray): The mapped data file as uint8.
+    """
+
+    def __init__(self, path_prefix: str):
+        """
+        Initializes the RawFrameRecording and maps its files.
+
+        Args:
+            path_prefix (str): Path of the recording without extension.
+
+        Raises:
+            IOError: If the recording files cannot be found.
+        """
+        self.path_prefix = path_prefix
+        data_path = path_prefix + DATA_EXTENSION
+        index_path = path_prefix + INDEX_EXTENSION
+        if not os.path.exists(data_path) or not os.path.exists(index_path):
+            raise IOError(f"Recording {path_prefix} not found.")
+
+        index_entries = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        data_size = os.path.getsize(data_path)
+        self.index = (np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(index_entries,))
+                      if index_entries else np.zeros(0, dtype=INDEX_DTYPE))
+        self.data = (np.memmap(data_path, dtype=np.uint8, mode="r")
+                     if data_size else np.zeros(0, dtype=np.uint8))
+
+        # Ignore index entries whose frame did not make it to the data file
+        complete = self.index["offset"] + ThermappConstants.PACKET_LENGTH <= data_size
+        self.index = self.index[:int(np.count_nonzero(complete))]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, position: int) -> np.ndarray:
+        """
+        Returns a recorded raw frame as a view of the mapped file.
+
+        Args:
+            position (int): Position of the frame in the recording.
+
+        Returns:
+            np.ndarray: The raw frame (PACKET_LENGTH uint8).
+        """
+        offset = int(self.index[position]["offset"])
+        return self.data[offset:offset + ThermappConstants.PACKET_LENGTH]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """
+        np.ndarray: Capture timestamps of the frames.
+        """
+        return self.index["timestamp"]
+
+    def find_time(self, timestamp: float) -> int:
+        """
+        Finds the first frame captured at or after a given time.
+
+        Args:
+            timestamp (float): Time in seconds since the epoch.
+
+        Returns:
+            int: Position of the frame, len(self) if the time is after the last frame.
+        """
+        return int(np.searchsorted(self.timestamps, timestamp))
+
+    def find_frame_number(self, frame_number: int) -> int:
+        """
+        Finds the first frame with a given header frame number.
+
+        Args:
+            frame_number (int): The frame number from the frame header.
+
+        Returns:
+            int: Position of the frame, or -1 if it is not in the recording.
+        """
+        matches = np.flatnonzero(self.index["frame_number"] == frame_number)
+        return int(matches[0]) if matches.size else -1
+
+    def frames(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """
+        Returns a range of frames as one array when they are stored back to back.
+
+        Args:
+            start (int): Position of the first frame.
+            stop (int | None): Position after the last frame. Defaults to the end.
+
+        Returns:
+            np.ndarray: The frames as a (count, PACKET_LENGTH) view of the mapped file.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if stop <= start:
+            return np.zeros((0, ThermappConstants.PACKET_LENGTH), dtype=np.uint8)
+        first = int(self.index[start]["offset"])
+        return self.data[first:first + (stop - start) * ThermappConstants.PACKET_LENGTH].reshape(
+            stop - start, ThermappConstants.PACKET_LENGTH)
@@ -0,0 +1,214 @@
+
+import numpy as np
+import cv2
+
+from constants import ThermappConstants
+
+
+def _gradient(points) -> np.ndarray:
+    # 256-entry BGR table interpolated between (position 0-1, (r, g, b)) points
+    positions = [position for position, _ in points]
+    levels = np.linspace(0, 1, 256)
+    channels = [np.interp(levels, positions, [color[channel] for _, color in points]) for channel in (2, 1, 0)]
+    return np.rint(np.stack(channels, axis=-1)).astype(np.uint8).reshape(256, 1, 3)
+
+
+def _opencv_colormap(colormap: int) -> np.ndarray:
+    return cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), colormap).reshape(256, 1, 3)
+
+
+# Color tables of the palettes, 256 BGR entries each, from cold to hot
+PALETTES = {
+    "white_hot": _gradient([(0.0, (0, 0, 0)), (1.0, (255, 255, 255))]),
+    "ironbow": _gradient([(0.0, (0, 0, 0)), (0.15, (30, 0, 120)), (0.35, (140, 0, 150)), (0.55, (220, 50, 50)),
+                          (0.75, (255, 150, 0)), (0.9, (255, 220, 50)), (1.0, (255, 255, 255))]),
+    "rainbow": _opencv_colormap(cv2.COLORMAP_JET),
+}
+for _table in PALETTES.values():
+    _table.flags.writeable = False
+
+
+class TextOverlay:
+    """
+    A line of text rasterized once, with an alpha mask, for blending into rendered images.
+
+    Attributes:
+        text (str): The text.
+        position (tuple): (x, y) of the left end of the text's baseline, as for cv2.putText.
+        style (tuple): (color, opacity, font_scale, thickness) the text was rasterized with.
+    """
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+    def __init__(self, text: str, position: tuple, color: tuple = (255, 255, 255), opacity: float = 1.0,
+                 font_scale: float = 0.6, thickness: int = 2):
+        """
+        Rasterizes the text.
+
+        Args:
+            text (str): The text.
+            position (tuple): (x, y) of the left end of the baseline.
+            color (tuple): BGR color.
+            opacity (float): Opacity of the text, 0 to 1.
+            font_scale (float): Font scale, as for cv2.putText.
+            thickness (int): Stroke thickness in pixels.
+        """
+        self.text = text
+        self.position = tuple(position)
+        self.style = (tuple(color), opacity, font_scale, thickness)
+        (width, height), baseline = cv2.getTextSize(text, self.FONT, font_scale, thickness)
+        self._margin = thickness
+        self._ascent = height + thickness
+        mask = np.zeros((height + baseline + 2 * thickness, width + 2 * thickness), dtype=np.uint8)
+        cv2.putText(mask, text, (thickness, self._ascent), self.FONT, font_scale, 255, thickness, cv2.LINE_AA)
+        self._alpha = mask.astype(np.float32) * np.float32(opacity / 255)
+        self._inverse_alpha = 1 - self._alpha
+        self._patch = np.empty(mask.shape + (3,), dtype=np.uint8)
+        self._patch[:] = color
+
+    def blend(self, image: np.ndarray) -> None:
+        """
+        Blends the text into a BGR image in place, clipped to the image.
+        """
+        height, width = self._alpha.shape
+        left, top = self.position[0] - self._margin, self.position[1] - self._ascent
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, image.shape[1]), min(top + height, image.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        rows, columns = slice(y0 - top, y1 - top), slice(x0 - left, x1 - left)
+        region = image[y0:y1, x0:x1]
+        cv2.blendLinear(self._patch[rows, columns], region, self._alpha[rows, columns],
+                        self._inverse_alpha[rows, columns], dst=region)
+
+
+class FrameRenderer:
+    """
+    Renders 8-bit frames as upscaled false-color BGR images with text overlays.
+
+    A frame is colored through the palette's 256-entry table with cv2.applyColorMap,
+    which is a cv2.LUT on the 8-bit values. For the nearest-neighbour upscale, the 8-bit
+    frame is widened first, the colors are written straight into the first row of
+    every group of output rows, and that row is copied to the others. For factors 2 and 4
+    the widening is a single multiplication: each byte times 0x0101 (or 0x01010101)
+    written into a uint16 (or uint32) view repeats it. The output and widening buffers
+    are allocated once.
+
+    Text overlays are rasterized when they are set or their text changes, and only
+    their alpha-blended area is touched per frame.
+
+    The renderer needs no window, so its images can be shown, recorded or streamed.
+
+    Attributes:
+        WHITE_HOT (str): Grayscale palette, hot is white.
+        IRONBOW (str): Black through purple, red and yellow to white.
+        RAINBOW (str): Blue through green and yellow to red.
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        scale (int): Upscaling factor.
+        image (np.ndarray): The rendered (height * scale, width * scale, 3) BGR image,
+            overwritten by every render.
+    """
+    WHITE_HOT = "white_hot"
+    IRONBOW = "ironbow"
+    RAINBOW = "rainbow"
+
+    def __init__(self, width: int = ThermappConstants.FRAME_WIDTH, height: int = ThermappConstants.FRAME_HEIGHT,
+                 scale: int = 2, palette: str = WHITE_HOT):
+        """
+        Initializes the FrameRenderer and allocates its buffers.
+
+        Args:
+            width (int): Frame width in pixels.
+            height (int): Frame height in pixels.
+            scale (int): Integer upscaling factor.
+            palette (str): One of WHITE_HOT, IRONBOW or RAINBOW.
+
+        Raises:
+            ValueError: If the scale or the palette is invalid.
+        """
+        if scale < 1:
+            raise ValueError("The scale must be a positive integer.")
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.palette = palette
+        self.image = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+        self._widened = np.empty((height, width * scale), dtype=np.uint8) if scale > 1 else None
+        self._overlays = {}
+
+    @property
+    def palette(self) -> str:
+        return self._palette
+
+    @palette.setter
+    def palette(self, palette: str):
+        if palette not in PALETTES:
+            raise ValueError(f"Unknown palette '{palette}', expected one of {', '.join(PALETTES)}.")
+        self._palette = palette
+        self._table = PALETTES[palette]
+
+    def set_text(self, name: str, text: str, position: tuple, color: tuple = (255, 255, 255),
+                 opacity: float = 1.0, font_scale: float = 0.6, thickness: int = 2) -> None:
+        """
+        Sets the text overlay of a name, rasterizing it only if the text or its style changed.
+
+        Args:
+            name (str): Name of the overlay; setting it again replaces it.
+            text (str): The text. An empty text removes the overlay.
+            position (tuple): (x, y) of the left end of the baseline in the output image.
+            color (tuple): BGR color.
+            opacity (float): Opacity of the text, 0 to 1.
+            font_scale (float): Font scale, as for cv2.putText.
+            thickness (int): Stroke thickness in pixels.
+        """
+        if not text:
+            self._overlays.pop(name, None)
+            return
+        overlay = self._overlays.get(name)
+        if overlay is not None and overlay.text == text and overlay.style == (tuple(color), opacity,
+                                                                              font_scale, thickness):
+            overlay.position = tuple(position)
+            return
+        self._overlays[name] = TextOverlay(text, position, color, opacity, font_scale, thickness)
+
+    def remove_text(self, name: str) -> None:
+        """
+        Removes a text overlay, if there is one of that name.
+        """
+        self._overlays.pop(name, None)
+
+    def render(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Renders a frame.
+
+        Args:
+            frame (np.ndarray): The 8-bit frame, flat or (height, width).
+
+        Returns:
+            np.ndarray: `image`, overwritten by the next call.
+        """
+        frame = frame.reshape(self.height, self.width)
+        if frame.dtype != np.uint8:
+            frame = frame.astype(np.uint8)
+        if self.scale == 1:
+            cv2.applyColorMap(frame, self._table, dst=self.image)
+        else:
+            rows = self.image.reshape(self.height, self.scale, self.width * self.scale, 3)
+            cv2.applyColorMap(self._widen(frame), self._table, dst=rows[:, 0])
+            # numpy would copy through a temporary, since the rows share a buffer
+            for row in range(1, self.scale):
+                cv2.copyTo(rows[:, 0], None, dst=rows[:, row])
+        for overlay in self._overlays.values():
+            overlay.blend(self.image)
+        return self.image
+
+    def _widen(self, frame: np.ndarray) -> np.ndarray:
+        # Repeats every pixel `scale` times along its row
+        if self.scale in (2, 4):
+            word = np.uint16 if self.scale == 2 else np.uint32
+            repeat = sum(1 << (8 * byte) for byte in range(self.scale))
+            np.multiply(frame, word(repeat), out=self._widened.view(word), dtype=word)
+        else:
+            cv2.resize(frame, (self.width * self.scale, self.height), dst=self._widened,
+                       interpolation=cv2.INTER_NEAREST)
+        return self._widened
@@ -0,0 +1,232 @@
+
+import time
+import numpy as np
+
+from constants import FrameHeaders, ThermappConstants, ThermappStatus
+from data_processing import ThermappDataProcessing
+from queue_handler import ThermappDataQueueHandler
+from recording import RawFrameRecording
+from ring_buffer import ByteRingBuffer
+
+
+class SyntheticFrameGenerator:
+    """
+    Generates valid raw packets: correct headers, an incrementing frame number, a
+    sensor temperature and 14-bit pixel data showing a warm blob moving over a
+    gradient with some noise.
+    """
+
+    def __init__(self, seed: int = 0, base_level: int = 8000, noise_level: float = 20.0, temperature: int = 3000):
+        """
+        Initializes the SyntheticFrameGenerator.
+
+        Args:
+            seed (int): Seed of the noise generator.
+            base_level (int): Mean raw count of the background.
+            noise_level (float): Standard deviation of the pixel noise in raw counts.
+            temperature (int): Value written to the sensor temperature header field.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.noise_level = noise_level
+        self.temperature = temperature
+        self.frame_dtype = ThermappDataProcessing().frame_dtype
+
+        h, w = ThermappConstants.FRAME_HEIGHT, ThermappConstants.FRAME_WIDTH
+        y, x = np.mgrid[0:h, 0:w]
+        self.background = (base_level + 0.5 * x + 0.25 * y).astype(np.float32)
+        blob_y, blob_x = np.mgrid[-24:25, -24:25]
+        self.blob = (1500.0 * np.exp(-(blob_x ** 2 + blob_y ** 2) / 200.0)).astype(np.float32)
+        self.pixels = np.empty((h, w), dtype=np.float32)
+
+    def generate(self, frame_number: int, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Generates one raw packet.
+
+        Args:
+            frame_number (int): Value written to the frame number header field.
+            out (np.ndarray | None): PACKET_LENGTH uint8 buffer to write into.
+
+        Returns:
+            np.ndarray: The raw packet (PACKET_LENGTH uint8).
+        """
+        if out is None:
+            out = np.zeros(ThermappConstants.PACKET_LENGTH, dtype=np.uint8)
+        else:
+            out.fill(0)
+        record = out.view(self.frame_dtype)[0]
+
+        h, w = self.pixels.shape
+        size = self.blob.shape[0]
+        cx = int((frame_number * 3) % (w - size))
+        cy = int((h - size) / 2 * (1 + np.sin(frame_number / 25.0)))
+        np.copyto(self.pixels, self.background)
+        self.pixels[cy:cy + size, cx:cx + size] += self.blob
+        if self.noise_level:
+            self.pixels += self.rng.normal(0.0, self.noise_level, self.pixels.shape).astype(np.float32)
+        # 14-bit counts never form a header pattern inside the pixel data
+        np.clip(self.pixels, 0, 0x3FFF, out=self.pixels)
+        record["pixels_data"] = self.pixels
+
+        record["frame_number"] = frame_number & 0xFFFF
+        record["temperature"] = self.temperature
+        out[:len(FrameHeaders.START)] = FrameHeaders.START
+        out[-len(FrameHeaders.END):] = FrameHeaders.END
+        return out
+
+
+class ReplayDevice:
+    """
+    Frame source that feeds recorded or synthetic packets through the same chunk
+    interface as USBCallbacks, so the pipeline can run without the camera.
+
+    It can be passed to ThermappApplication in place of the AsyncTransferManager:
+    `start_async_read` streams until `stop_async_read` is called or the source is
+    exhausted.
+
+    Attributes:
+        realtime (bool): Whether packets are paced at `fps`. Otherwise they are sent as
+            fast as the consumer takes them, waiting for room in the ring buffer.
+        space_timeout (float): Longest wait for room in the ring buffer before checking
+            whether streaming was stopped.
+        fps (float): Frame rate used for real-time playback.
+        chunk_size (int | tuple): Size of the chunks written, or a (low, high) range for random sizes.
+        misalignment_rate (float): Probability that a packet loses or gains bytes.
+        corruption_rate (float): Probability that bytes of a packet are overwritten.
+        frames_sent (int): Number of packets streamed.
+        bytes_sent (int): Number of bytes written to the ring buffer.
+        misaligned_frames (int): Number of packets with injected misalignment.
+        corrupted_frames (int): Number of packets with injected corruption.
+    """
+
+    def __init__(self, recording: RawFrameRecording | str | None = None, frame_count: int | None = None,
+                 fps: float = 25.0, realtime: bool = True,
+                 chunk_size: int | tuple = ThermappConstants.DEFAULT_BUFFER_LENGTH,
+                 misalignment_rate: float = 0.0, corruption_rate: float = 0.0,
+                 loop: bool = False, seed: int = 0, ring: ByteRingBuffer | None = None):
+        """
+        Initializes the ReplayDevice.
+
+        Args:
+            recording (RawFrameRecording | str | None): Recording, or its path prefix, to replay.
+                Synthetic packets are generated when None.
+            frame_count (int | None): Number of packets to stream, or None for no limit.
+            fps (float): Frame rate used for real-time playback.
+            realtime (bool): Whether packets are paced at `fps`.
+            chunk_size (int | tuple): Size of the chunks written, or a (low, high) range.
+            misalignment_rate (float): Probability that a packet loses or gains bytes.
+            corruption_rate (float): Probability that bytes of a packet are overwritten.
+            loop (bool): Whether a recording restarts from the beginning when it ends.
+            seed (int): Seed for the synthetic data and the injected faults.
+            ring (ByteRingBuffer | None): Ring buffer to write into. Defaults to the one
+                ThermappDataQueueHandler reads from.
+        """
+        if isinstance(recording, str):
+            recording = RawFrameRecording(recording)
+        self.recording = recording
+        self.generator = SyntheticFrameGenerator(seed) if recording is None else None
+        self.frame_count = frame_count
+        self.fps = fps
+        self.realtime = realtime
+        self.chunk_size = chunk_size
+        self.misalignment_rate = misalignment_rate
+        self.corruption_rate = corruption_rate
+        self.loop = loop
+        self.rng = np.random.default_rng(seed)
+        self.ring = ring
+        self.space_timeout = 0.5
+
+        self.async_status = ThermappStatus.INACTIVE
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.misaligned_frames = 0
+        self.corrupted_frames = 0
+
+        self.packet_buffer = np.empty(ThermappConstants.PACKET_LENGTH, dtype=np.uint8)
+
+    def packets(self):
+        """
+        Yields the raw packets to stream, before any fault injection.
+        """
+        sent = 0
+        while self.frame_count is None or sent < self.frame_count:
+            if self.recording is not None:
+                position = sent % len(self.recording) if self.loop and len(self.recording) else sent
+                if position >= len(self.recording):
+                    return
+                yield self.recording[position]
+            else:
+                yield self.generator.generate(sent, out=self.packet_buffer)
+            sent += 1
+
+    def _inject_faults(self, packet: np.ndarray) -> np.ndarray:
+        if self.corruption_rate and self.rng.random() < self.corruption_rate:
+            packet = packet.copy()
+            positions = self.rng.integers(0, packet.size, size=int(self.rng.integers(1, 16)))
+            packet[positions] = self.rng.integers(0, 256, size=positions.size, dtype=np.uint8)
+            self.corrupted_frames += 1
+
+        if self.misalignment_rate and self.rng.random() < self.misalignment_rate:
+            count = int(self.rng.integers(1, ThermappConstants.DEFAULT_BUFFER_LENGTH))
+            if self.rng.random() < 0.5:
+                # Lose bytes somewhere in the packet
+                position = int(self.rng.integers(0, packet.size - count))
+                packet = np.concatenate((packet[:position], packet[position + count:]))
+            else:
+                # Receive extra garbage before the packet
+                packet = np.concatenate((self.rng.integers(0, 256, size=count, dtype=np.uint8), packet))
+            self.misaligned_frames += 1
+        return packet
+
+    def _next_chunk_size(self) -> int:
+        if isinstance(self.chunk_size, tuple):
+            low, high = self.chunk_size
+            return int(self.rng.integers(low, high + 1))
+        return self.chunk_size
+
+    def _write(self, chunk: np.ndarray):
+        ring = self.ring if self.ring is not None else ThermappDataQueueHandler.received_data_ring
+        if not self.realtime:
+            # Apply back-pressure instead of overflowing the consumer
+            while (not ring.wait_for_space(chunk.size, self.space_timeout)
+                   and self.async_status == ThermappStatus.RUNNING):
+                pass
+        ring.write(chunk)
+        self.bytes_sent += chunk.size
+
+    def start_async_read(self):
+        """
+        Streams packets into the ring buffer until stopped or the source is exhausted.
+        """
+        if self.async_status != ThermappStatus.INACTIVE:
+            return -2
+
+        self.async_status = ThermappStatus.RUNNING
+        frame_period = 1.0 / self.fps
+        next_frame_time = time.perf_counter()
+
+        for packet in self.packets():
+            if self.async_status != ThermappStatus.RUNNING:
+                break
+            packet = self._inject_faults(packet)
+
+            position = 0
+            while position < packet.size:
+                size = self._next_chunk_size()
+                self._write(packet[position:position + size])
+                position += size
+            self.frames_sent += 1
+
+            if self.realtime:
+                next_frame_time += frame_period
+                delay = next_frame_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        self.async_status = ThermappStatus.INACTIVE
+
+    def stop_async_read(self):
+        """
+        Stops streaming.
+        """
+        if self.async_status == ThermappStatus.RUNNING:
+            self.async_status = ThermappStatus.CANCELING
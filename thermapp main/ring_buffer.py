@@ -0,0 +1,159 @@
+
+import threading
+import time
+import numpy as np
+
+from constants import ThermappConstants
+
+
+class ByteRingBuffer:
+    """
+    Single-producer/single-consumer byte ring buffer backed by one preallocated array.
+
+    The producer (the libusb callback) only ever advances `write_position` and the
+    consumer (the frame reader) only ever advances `read_position`, each after its
+    copy is complete, so no lock is needed between them. Both positions count the
+    total number of bytes that went through the buffer.
+
+    Attributes:
+        capacity (int): Size of the buffer in bytes.
+        buffer (np.ndarray): The uint8 storage.
+        write_position (int): Total number of bytes written.
+        read_position (int): Total number of bytes read.
+        overflow_count (int): Number of writes dropped because the buffer was full.
+        overflow_bytes (int): Number of bytes dropped because the buffer was full.
+        wait_seconds (float): Total time the consumer spent blocked waiting for data.
+    """
+
+    def __init__(self, capacity: int = ThermappConstants.PACKET_LENGTH * 8):
+        """
+        Initializes the ByteRingBuffer.
+
+        Args:
+            capacity (int): Size of the buffer in bytes. Defaults to eight frames.
+        """
+        self.capacity = capacity
+        self.buffer = np.empty(capacity, dtype=np.uint8)
+        self.write_position = 0
+        self.read_position = 0
+        self.overflow_count = 0
+        self.overflow_bytes = 0
+        self.wait_seconds = 0.0
+        self._data_available = threading.Event()
+        self._space_available = threading.Event()
+
+    @property
+    def available(self) -> int:
+        """
+        int: Number of bytes waiting to be read.
+        """
+        return self.write_position - self.read_position
+
+    @property
+    def free(self) -> int:
+        """
+        int: Number of bytes that can be written without overflowing.
+        """
+        return self.capacity - self.available
+
+    def write(self, data: np.ndarray) -> bool:
+        """
+        Copies data into the buffer. Data that does not fit is dropped as a whole.
+
+        Args:
+            data (np.ndarray): The uint8 data to write.
+
+        Returns:
+            bool: True if the data was written, False if it was dropped.
+        """
+        size = data.size
+        if size > self.free:
+            self.overflow_count += 1
+            self.overflow_bytes += size
+            return False
+
+        start = self.write_position % self.capacity
+        first = min(size, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        if first < size:
+            self.buffer[:size - first] = data[first:]
+
+        self.write_position += size
+        self._data_available.set()
+        return True
+
+    def wait_for_data(self, timeout: float | None = None) -> bool:
+        """
+        Blocks until data is available.
+
+        Args:
+            timeout (float | None): Maximum time to wait in seconds, or None to wait forever.
+
+        Returns:
+            bool: True if data is available, False if the timeout expired.
+        """
+        if self.available:
+            return True
+        self._data_available.clear()
+        # Check again in case the producer wrote between the first check and the clear
+        if self.available:
+            return True
+        start = time.perf_counter()
+        self._data_available.wait(timeout)
+        self.wait_seconds += time.perf_counter() - start
+        return self.available > 0
+
+    def wait_for_space(self, size: int, timeout: float | None = None) -> bool:
+        """
+        Blocks until `size` bytes can be written without overflowing.
+
+        Args:
+            size (int): The number of bytes to be written.
+            timeout (float | None): Maximum time to wait in seconds, or None to wait forever.
+
+        Returns:
+            bool: True if there is room, False if the timeout expired.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.free < size:
+            self._space_available.clear()
+            # Check again in case the consumer read between the first check and the clear
+            if self.free >= size:
+                break
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._space_available.wait(remaining)
+        return True
+
+    def read_into(self, out: np.ndarray, timeout: float | None = None) -> int:
+        """
+        Copies up to `len(out)` bytes into `out`, waiting for data if the buffer is empty.
+
+        Args:
+            out (np.ndarray): The uint8 buffer to fill.
+            timeout (float | None): Maximum time to wait in seconds, or None to wait forever.
+
+        Returns:
+            int: The number of bytes copied, 0 if the timeout expired.
+        """
+        if not self.wait_for_data(timeout):
+            return 0
+
+        size = min(len(out), self.available)
+        start = self.read_position % self.capacity
+        first = min(size, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if first < size:
+            out[first:size] = self.buffer[:size - first]
+
+        self.read_position += size
+        self._space_available.set()
+        return size
+
+    def clear(self) -> None:
+        """
+        Discards all unread data.
+        """
+        self.read_position = self.write_position
+        self._space_available.set()
@@ -0,0 +1,278 @@
+
+import threading
+from collections import namedtuple
+import numpy as np
+import cv2
+
+from constants import ThermappConstants
+from radiometry import RadiometricConverter
+
+# Temperature statistics of all regions for one frame, in degrees Celsius. Each field
+# is an array with one entry per region, in the order of RoiEngine.names;
+# percentiles has one column per requested percentile, and none if none were requested.
+RoiStatistics = namedtuple("RoiStatistics", ["min", "max", "mean", "percentiles"])
+
+
+class RoiEngine:
+    """
+    Computes temperature statistics of many regions of interest per frame.
+
+    Regions are rectangles, polygons or masks, and may overlap. When they change, they
+    are compiled into a label map that splits the covered pixels into cells, each cell
+    holding the pixels covered by the same set of regions, and into a list of the
+    cells of every region. A frame is then processed with a fixed sequence of
+    whole-array operations:
+        1. gather the raw counts of the covered pixels, ordered by cell;
+        2. convert them to temperatures with the lookup table;
+        3. reduce every cell, which is a contiguous run of the gathered pixels: sums
+           with np.add.reduceat, minimum and maximum counts with np.minimum.reduceat
+           and np.maximum.reduceat, all into preallocated arrays;
+        4. combine the cells of every region with the same reductions.
+
+    The per-pixel work depends on the covered area, which is at most one frame, not
+    on the number of regions; only step 4 grows with it, on arrays of one entry per
+    cell. The Planck conversion increases with the raw count, so the minimum and
+    maximum counts give the minimum and maximum temperatures.
+
+    Percentiles need the counts of every region sorted, which costs a sort of all
+    region pixels per frame, so they are only computed when requested.
+
+    Attributes:
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        percentiles (tuple): Percentiles computed for every region, 0 to 100.
+        radiometric_converter (RadiometricConverter): Converts raw counts to temperatures.
+        names (list): Names of the regions, in the order of the statistics.
+    """
+    MAX_REGIONS = 1 << 16
+
+    def __init__(self, width: int = ThermappConstants.FRAME_WIDTH, height: int = ThermappConstants.FRAME_HEIGHT,
+                 percentiles: tuple = (), radiometric_converter: RadiometricConverter | None = None):
+        """
+        Initializes an engine without regions.
+
+        Args:
+            width (int): Frame width in pixels.
+            height (int): Frame height in pixels.
+            percentiles (tuple): Percentiles to compute for every region, 0 to 100.
+                Empty to skip the per-frame sort they need.
+            radiometric_converter (RadiometricConverter | None): Converts raw counts to
+                temperatures. Defaults to one with the default constants.
+
+        Raises:
+            ValueError: If a percentile is outside 0 to 100.
+        """
+        if any(not 0 <= q <= 100 for q in percentiles):
+            raise ValueError("Percentiles must be between 0 and 100.")
+        self.width = width
+        self.height = height
+        self.percentiles = tuple(percentiles)
+        self.radiometric_converter = radiometric_converter or RadiometricConverter()
+        self.names = []
+        self._regions = {}
+        self._lock = threading.Lock()
+        self._compiled = False
+        # float64 copy of the converter's table, so the sums need no conversion pass
+        self._table = None
+        self._table_source = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add_mask(self, name: str, mask: np.ndarray) -> None:
+        """
+        Adds a region given as a mask, replacing a region of the same name.
+
+        Args:
+            name (str): Name of the region.
+            mask (np.ndarray): (height, width) array, nonzero inside the region.
+
+        Raises:
+            ValueError: If the mask has the wrong shape or is empty, or there are too many regions.
+        """
+        mask = np.asarray(mask)
+        if mask.shape != (self.height, self.width):
+            raise ValueError(f"Mask of region '{name}' has shape {mask.shape}, expected {(self.height, self.width)}.")
+        indices = np.flatnonzero(mask)
+        if indices.size == 0:
+            raise ValueError(f"Region '{name}' has no pixels inside the frame.")
+        with self._lock:
+            if name not in self._regions:
+                if len(self.names) >= self.MAX_REGIONS:
+                    raise ValueError(f"At most {self.MAX_REGIONS} regions are supported.")
+                self.names.append(name)
+            self._regions[name] = indices
+            self._compiled = False
+
+    def add_rectangle(self, name: str, x: int, y: int, width: int, height: int) -> None:
+        """
+        Adds a rectangular region, clipped to the frame.
+
+        Args:
+            name (str): Name of the region.
+            x (int): Left column.
+            y (int): Top row.
+            width (int): Width in pixels.
+            height (int): Height in pixels.
+        """
+        mask = np.zeros((self.height, self.width), dtype=bool)
+        mask[max(y, 0):max(y + height, 0), max(x, 0):max(x + width, 0)] = True
+        self.add_mask(name, mask)
+
+    def add_polygon(self, name: str, points) -> None:
+        """
+        Adds a polygonal region, clipped to the frame.
+
+        Args:
+            name (str): Name of the region.
+            points: Sequence of (x, y) vertices.
+        """
+        mask = np.zeros((self.height, self.width), dtype=np.uint8)
+        cv2.fillPoly(mask, [np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)], 1)
+        self.add_mask(name, mask)
+
+    def remove(self, name: str) -> None:
+        """
+        Removes a region.
+
+        Raises:
+            KeyError: If there is no such region.
+        """
+        with self._lock:
+            del self._regions[name]
+            self.names.remove(name)
+            self._compiled = False
+
+    def _compile(self):
+        # Label map: every region splits the cells its pixels are in, so pixels end up
+        # in the same cell exactly when the same regions cover them. Cell 0 is outside
+        # all regions.
+        labels = np.zeros(self.width * self.height, dtype=np.intp)
+        cell_regions = [()]
+        for region, name in enumerate(self.names):
+            indices = self._regions[name]
+            cells, inverse = np.unique(labels[indices], return_inverse=True)
+            labels[indices] = len(cell_regions) + inverse.reshape(-1)
+            cell_regions.extend(cell_regions[cell] + (region,) for cell in cells)
+
+        # Covered pixels ordered by cell, with cells renumbered from 0 in that order
+        pixels = np.flatnonzero(labels)
+        pixels = pixels[np.argsort(labels[pixels], kind="stable")]
+        used, pixel_cells = np.unique(labels[pixels], return_inverse=True)
+        self._pixels = pixels
+        cell_sizes = np.bincount(pixel_cells.reshape(-1))
+        self._cell_starts = np.zeros(len(used), dtype=np.intp)
+        np.cumsum(cell_sizes[:-1], out=self._cell_starts[1:])
+
+        # Cells of every region, grouped by region
+        pairs = sorted((region, cell) for cell, label in enumerate(used) for region in cell_regions[label])
+        pair_regions = np.array([region for region, _ in pairs], dtype=np.intp)
+        self._pair_cells = np.array([cell for _, cell in pairs], dtype=np.intp)
+        self._region_starts = np.flatnonzero(np.diff(pair_regions, prepend=-1))
+        self._sizes = np.add.reduceat(cell_sizes[self._pair_cells], self._region_starts)
+
+        total = pixels.size
+        self._counts = np.empty(total, dtype=np.uint16)
+        self._count_indices = np.empty(total, dtype=np.intp)
+        self._temperatures = np.empty(total, dtype=np.float64)
+        self._cell_sums = np.empty(len(used), dtype=np.float64)
+        self._cell_min = np.empty(len(used), dtype=np.intp)
+        self._cell_max = np.empty(len(used), dtype=np.intp)
+        self._pair_values = np.empty(len(pairs), dtype=np.float64)
+        self._pair_counts = np.empty(len(pairs), dtype=np.intp)
+        if self.percentiles:
+            self._compile_percentiles()
+        self._compiled = True
+
+    def _compile_percentiles(self):
+        sizes = np.array([self._regions[name].size for name in self.names], dtype=np.intp)
+        starts = np.zeros(len(sizes), dtype=np.intp)
+        np.cumsum(sizes[:-1], out=starts[1:])
+        self._region_pixels = np.concatenate([self._regions[name] for name in self.names]).astype(np.intp)
+        self._key_base = (np.repeat(np.arange(len(sizes), dtype=np.uint32), sizes) << np.uint32(16))
+
+        # Linear interpolation between the closest ranks, as np.percentile does
+        ranks = starts[:, None] + (sizes[:, None] - 1) * (np.array(self.percentiles, dtype=np.float64) / 100)
+        self._lower = np.floor(ranks).astype(np.intp)
+        self._upper = np.ceil(ranks).astype(np.intp)
+        self._fraction = ranks - self._lower
+
+        total = self._region_pixels.size
+        self._region_counts = np.empty(total, dtype=np.uint16)
+        self._keys = np.empty(total, dtype=np.uint32)
+        self._sorted_counts = np.empty(total, dtype=np.intp)
+        self._sorted_temperatures = np.empty(total, dtype=np.float64)
+
+    def compute(self, raw: np.ndarray) -> RoiStatistics | None:
+        """
+        Computes the statistics of all regions for a raw frame.
+
+        Args:
+            raw (np.ndarray): The raw uint16 frame, flat or (height, width).
+
+        Returns:
+            RoiStatistics | None: The statistics, or None if there are no regions.
+        """
+        with self._lock:
+            if not self.names:
+                return None
+            if not self._compiled:
+                self._compile()
+            table = self.radiometric_converter.table
+            if table is not self._table_source:
+                self._table = table.astype(np.float64)
+                self._table_source = table
+
+            raw = raw.reshape(-1)
+            np.take(raw, self._pixels, out=self._counts, mode="clip")
+            counts = self._count_indices
+            np.copyto(counts, self._counts)
+            temperatures = np.take(self._table, counts, out=self._temperatures, mode="clip")
+            cell_sums = np.add.reduceat(temperatures, self._cell_starts, out=self._cell_sums)
+            np.minimum.reduceat(counts, self._cell_starts, out=self._cell_min)
+            np.maximum.reduceat(counts, self._cell_starts, out=self._cell_max)
+
+            pair_values, pair_counts = self._pair_values, self._pair_counts
+            np.take(cell_sums, self._pair_cells, out=pair_values)
+            mean = np.add.reduceat(pair_values, self._region_starts) / self._sizes
+            np.take(self._cell_min, self._pair_cells, out=pair_counts)
+            minimum = self._table[np.minimum.reduceat(pair_counts, self._region_starts)]
+            np.take(self._cell_max, self._pair_cells, out=pair_counts)
+            maximum = self._table[np.maximum.reduceat(pair_counts, self._region_starts)]
+
+            if self.percentiles:
+                percentiles = self._compute_percentiles(raw)
+            else:
+                percentiles = np.empty((len(self.names), 0), dtype=np.float64)
+            return RoiStatistics(minimum, maximum, mean, percentiles)
+
+    def _compute_percentiles(self, raw: np.ndarray) -> np.ndarray:
+        # Tag each count with its region in the upper 16 bits of a uint32 key and sort
+        # the keys, which sorts the counts within every region
+        np.take(raw, self._region_pixels, out=self._region_counts, mode="clip")
+        np.bitwise_or(self._key_base, self._region_counts, out=self._keys)
+        self._keys.sort()
+        np.bitwise_and(self._keys, 0xFFFF, out=self._sorted_counts, casting="unsafe")
+        temperatures = np.take(self._table, self._sorted_counts, out=self._sorted_temperatures, mode="clip")
+        lower = temperatures[self._lower]
+        return lower + (temperatures[self._upper] - lower) * self._fraction
+
+    def statistics_by_name(self, statistics: RoiStatistics) -> dict:
+        """
+        Arranges statistics returned by `compute` by region name.
+
+        Args:
+            statistics (RoiStatistics): The statistics.
+
+        Returns:
+            dict: For every region name, a dict with "min", "max", "mean" and
+            "p<percentile>" temperatures.
+        """
+        result = {}
+        for index, name in enumerate(self.names[:len(statistics.mean)]):
+            region = {"min": float(statistics.min[index]), "max": float(statistics.max[index]),
+                      "mean": float(statistics.mean[index])}
+            for column, q in enumerate(self.percentiles):
+                region[f"p{q:g}"] = float(statistics.percentiles[index, column])
+            result[name] = region
+        return result
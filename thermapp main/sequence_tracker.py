@@ -0,0 +1,164 @@
+
+import time
+from collections import namedtuple
+
+# Result of FrameSequenceTracker.observe for one frame
+FrameSequenceInfo = namedtuple("FrameSequenceInfo", ["sequence", "capture_time", "status", "missing"])
+
+
+class FrameSequenceTracker:
+    """
+    Follows the frame_number header counter to account for every frame the camera sent.
+
+    The 16-bit counter is unwrapped into a continuous sequence number. Each observed
+    frame is classified as:
+        FIRST: the first frame, or the first after a reset.
+        OK: the frame following the previous one.
+        GAP: frames were skipped; `missing` tells how many.
+        REORDERED: a frame that was counted missing arrived late.
+        DUPLICATE: a frame number that was already seen.
+        RESET: a jump larger than `max_gap`, e.g. the camera restarted; not counted as loss.
+
+    Attributes:
+        modulus (int): Period of the header counter.
+        max_gap (int): Largest forward jump still counted as lost frames.
+        reorder_window (int): How far back a late frame is still recognized.
+        received (int): Number of distinct frames received.
+        lost (int): Number of frames missing, less those that arrived late.
+        duplicates (int): Number of duplicate frames.
+        reordered (int): Number of frames that arrived after a later one.
+        gaps (int): Number of times frames were skipped.
+        resets (int): Number of sequence resets.
+        first_capture_time (float | None): Monotonic capture time of the first frame.
+        last_capture_time (float | None): Monotonic capture time of the newest frame.
+    """
+    FIRST = "first"
+    OK = "ok"
+    GAP = "gap"
+    REORDERED = "reordered"
+    DUPLICATE = "duplicate"
+    RESET = "reset"
+
+    def __init__(self, modulus: int = 1 << 16, max_gap: int = 1000, reorder_window: int = 16):
+        """
+        Initializes the FrameSequenceTracker.
+
+        Args:
+            modulus (int): Period of the header counter. Defaults to a 16-bit counter.
+            max_gap (int): Largest forward jump still counted as lost frames.
+            reorder_window (int): How far back a late frame is still recognized.
+        """
+        self.modulus = modulus
+        self.max_gap = max_gap
+        self.reorder_window = reorder_window
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets the sequence and clears the statistics.
+        """
+        self.sequence = None
+        self.frame_number = None
+        self.received = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.gaps = 0
+        self.resets = 0
+        self.first_capture_time = None
+        self.last_capture_time = None
+        self._missing = set()
+
+    def observe(self, frame_number: int, capture_time: float | None = None) -> FrameSequenceInfo:
+        """
+        Accounts for one received frame.
+
+        Args:
+            frame_number (int): The frame_number header field.
+            capture_time (float | None): Monotonic time the frame was completed. Defaults to now.
+
+        Returns:
+            FrameSequenceInfo: The unwrapped sequence number, capture time, status and
+            number of frames found missing.
+        """
+        if capture_time is None:
+            capture_time = time.monotonic()
+        frame_number %= self.modulus
+
+        if self.sequence is None:
+            return self._restart(frame_number, capture_time, self.FIRST)
+
+        delta = (frame_number - self.frame_number) % self.modulus
+        if delta == 0:
+            self.duplicates += 1
+            return FrameSequenceInfo(self.sequence, capture_time, self.DUPLICATE, 0)
+
+        if delta <= self.max_gap:
+            sequence = self.sequence + delta
+            missing = delta - 1
+            if missing:
+                self.gaps += 1
+                self.lost += missing
+                self._missing.update(range(self.sequence + 1, sequence))
+            self._accept(sequence, frame_number, capture_time)
+            self._forget_old_missing()
+            return FrameSequenceInfo(sequence, capture_time, self.GAP if missing else self.OK, missing)
+
+        back = self.modulus - delta
+        if back <= self.reorder_window:
+            sequence = self.sequence - back
+            if sequence in self._missing:
+                self._missing.discard(sequence)
+                self.lost -= 1
+                self.reordered += 1
+                self.received += 1
+                return FrameSequenceInfo(sequence, capture_time, self.REORDERED, 0)
+            self.duplicates += 1
+            return FrameSequenceInfo(sequence, capture_time, self.DUPLICATE, 0)
+
+        self.resets += 1
+        return self._restart(frame_number, capture_time, self.RESET)
+
+    def _restart(self, frame_number: int, capture_time: float, status: str) -> FrameSequenceInfo:
+        # Continue the unwrapped sequence from where it was, so it stays increasing
+        sequence = frame_number if self.sequence is None else self.sequence + 1
+        self._missing.clear()
+        self._accept(sequence, frame_number, capture_time)
+        if self.first_capture_time is None:
+            self.first_capture_time = capture_time
+        return FrameSequenceInfo(sequence, capture_time, status, 0)
+
+    def _accept(self, sequence: int, frame_number: int, capture_time: float):
+        self.sequence = sequence
+        self.frame_number = frame_number
+        self.received += 1
+        self.last_capture_time = capture_time
+
+    def _forget_old_missing(self):
+        if self._missing:
+            oldest = self.sequence - self.reorder_window
+            self._missing = {sequence for sequence in self._missing if sequence >= oldest}
+
+    @property
+    def expected(self) -> int:
+        """
+        int: Number of frames the camera sent according to the counter.
+        """
+        return self.received + self.lost
+
+    @property
+    def loss_ratio(self) -> float:
+        """
+        float: Fraction of the sent frames that were lost.
+        """
+        expected = self.expected
+        return self.lost / expected if expected else 0.0
+
+    @property
+    def capture_rate(self) -> float:
+        """
+        float: Received frames per second of capture time.
+        """
+        if self.first_capture_time is None or self.last_capture_time <= self.first_capture_time:
+            return 0.0
+        return (self.received - 1) / (self.last_capture_time - self.first_capture_time)
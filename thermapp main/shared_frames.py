@@ -0,0 +1,387 @@
+
+import multiprocessing as mp
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+
+from constants import ThermappConstants, ThermappStatus
+from frame_pool import FramePool
+
+# Fields of the int64 header at the start of the shared memory block
+HEADER_FIELDS = ("slot_count", "sequence", "resync_count", "skipped_bytes", "overflow_bytes")
+SEQUENCE_FIELD = HEADER_FIELDS.index("sequence")
+
+
+class SharedFrameRing:
+    """
+    Ring of complete raw frames in a shared memory block, written by one producer
+    process and read by any number of consumer processes without copying.
+
+    Every published frame gets the next sequence number, starting at 1, and goes
+    to slot `sequence % slot_count`. Each slot carries a stamp: odd while the
+    producer is writing it, `2 * sequence` once the frame is complete. A consumer
+    reads a frame in place and then checks with `is_current` that its stamp did
+    not change, i.e. that the producer has not lapped it in the meantime.
+
+    Attributes:
+        name (str): Name of the shared memory block, used to attach from other processes.
+        slot_count (int): Number of frames the ring holds.
+        header (np.ndarray): The int64 header, indexed by HEADER_FIELDS.
+        stamps (np.ndarray): The int64 stamp of each slot.
+        capture_times (np.ndarray): The float64 monotonic capture time of each slot.
+        slots (np.ndarray): The frames, (slot_count, PACKET_LENGTH) uint8.
+    """
+
+    def __init__(self, name: str | None = None, slot_count: int = 16):
+        """
+        Creates a new ring, or attaches to an existing one when a name is given.
+
+        Args:
+            name (str | None): Name of the ring to attach to, or None to create one.
+            slot_count (int): Number of frames the new ring holds. Ignored when attaching.
+
+        Raises:
+            ValueError: If the slot count is not positive.
+        """
+        self.owner = name is None
+        if self.owner:
+            if slot_count <= 0:
+                raise ValueError("Slot count must be positive.")
+            size = self._size(slot_count)
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+
+        header_size = len(HEADER_FIELDS) * 8
+        self.header = np.ndarray((len(HEADER_FIELDS),), dtype=np.int64, buffer=self.memory.buf)
+        if self.owner:
+            self.header[:] = 0
+            self.header[HEADER_FIELDS.index("slot_count")] = slot_count
+        self.slot_count = int(self.header[HEADER_FIELDS.index("slot_count")])
+
+        self.stamps = np.ndarray((self.slot_count,), dtype=np.int64, buffer=self.memory.buf, offset=header_size)
+        self.capture_times = np.ndarray((self.slot_count,), dtype=np.float64, buffer=self.memory.buf,
+                                        offset=header_size + self.slot_count * 8)
+        self.slots = np.ndarray((self.slot_count, ThermappConstants.PACKET_LENGTH), dtype=np.uint8,
+                                buffer=self.memory.buf, offset=header_size + self.slot_count * 16)
+        if self.owner:
+            self.stamps[:] = 0
+
+    @staticmethod
+    def _size(slot_count: int) -> int:
+        return len(HEADER_FIELDS) * 8 + slot_count * (16 + ThermappConstants.PACKET_LENGTH)
+
+    def get(self, field: str) -> int:
+        """
+        Returns a header field.
+
+        Args:
+            field (str): One of HEADER_FIELDS.
+        """
+        return int(self.header[HEADER_FIELDS.index(field)])
+
+    def set(self, field: str, value: int) -> None:
+        """
+        Sets a header field. Only the producer writes the header.
+
+        Args:
+            field (str): One of HEADER_FIELDS.
+            value (int): The new value.
+        """
+        self.header[HEADER_FIELDS.index(field)] = value
+
+    @property
+    def sequence(self) -> int:
+        """
+        int: Sequence number of the newest published frame, 0 if none was published yet.
+        """
+        return int(self.header[SEQUENCE_FIELD])
+
+    def publish(self, frame: np.ndarray, capture_time: float = 0.0) -> int:
+        """
+        Copies a complete raw frame into the next slot.
+
+        Args:
+            frame (np.ndarray): The raw frame (PACKET_LENGTH uint8).
+            capture_time (float): Monotonic time at which the frame was completed.
+
+        Returns:
+            int: The sequence number of the frame.
+        """
+        sequence = self.sequence + 1
+        slot = sequence % self.slot_count
+        self.stamps[slot] = 2 * sequence - 1
+        self.slots[slot] = frame
+        self.capture_times[slot] = capture_time
+        self.stamps[slot] = 2 * sequence
+        self.header[SEQUENCE_FIELD] = sequence
+        return sequence
+
+    def view(self, sequence: int) -> np.ndarray | None:
+        """
+        Returns a frame in place. The view stays valid only while `is_current(sequence)` holds.
+
+        Args:
+            sequence (int): Sequence number of the frame.
+
+        Returns:
+            np.ndarray | None: The raw frame, or None if it is not in the ring (anymore).
+        """
+        if not self.is_current(sequence):
+            return None
+        return self.slots[sequence % self.slot_count]
+
+    def is_current(self, sequence: int) -> bool:
+        """
+        Checks that a frame is complete and has not been overwritten.
+
+        Args:
+            sequence (int): Sequence number of the frame.
+        """
+        return sequence > 0 and int(self.stamps[sequence % self.slot_count]) == 2 * sequence
+
+    def close(self) -> None:
+        """
+        Detaches from the shared memory block. The arrays of this ring become unusable.
+        """
+        self.header = self.stamps = self.capture_times = self.slots = None
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """
+        Removes the shared memory block once all processes have detached.
+        """
+        self.memory.unlink()
+
+
+class SharedFrameReader:
+    """
+    Reads frames published by an AcquisitionProcess, as a drop-in replacement for FrameReader.
+
+    `read_frame_view` returns the next frame in place, without copying; check
+    `ring.is_current` after using it, and discard what was computed from it if the
+    producer overwrote it meanwhile. `read_frame` copies the frame into a raw buffer
+    from the frame pool instead, for frames that must be kept after the check.
+    Close the reader to unmap the ring.
+
+    When the reader falls more than the ring size behind, it jumps to the newest
+    frame and counts the frames it skipped.
+
+    Attributes:
+        ring (SharedFrameRing): The ring the frames are read from.
+        timeout (float | None): Maximum time a read waits for a new frame.
+        next_sequence (int): Sequence number of the next frame to read.
+        missed_frames (int): Number of frames overwritten before they were read.
+        capture_time (float | None): Monotonic time at which the last returned frame was
+            completed in the acquisition process.
+    """
+
+    def __init__(self, acquisition: "AcquisitionProcess", frame_pool: FramePool | None = None,
+                 timeout: float | None = 0.5):
+        """
+        Initializes the SharedFrameReader and attaches to the acquisition's ring.
+
+        Args:
+            acquisition (AcquisitionProcess): The process publishing the frames.
+            frame_pool (FramePool | None): Pool providing the buffers frames are copied into.
+            timeout (float | None): Maximum time a read waits for a new frame, or None to wait forever.
+        """
+        self.ring = SharedFrameRing(acquisition.ring_name)
+        self.condition = acquisition.condition
+        self.frame_pool = frame_pool
+        self.timeout = timeout
+        self.next_sequence = self.ring.sequence + 1
+        self.missed_frames = 0
+        self.capture_time = None
+
+    def _wait(self) -> int:
+        # Returns the sequence number to read, or 0 on timeout
+        if self.ring.sequence < self.next_sequence:
+            with self.condition:
+                self.condition.wait_for(lambda: self.ring.sequence >= self.next_sequence, self.timeout)
+        newest = self.ring.sequence
+        if newest < self.next_sequence:
+            return 0
+        if newest - self.next_sequence >= self.ring.slot_count - 1:
+            # Lapped by the producer; skip to the newest frame
+            self.missed_frames += newest - self.next_sequence
+            self.next_sequence = newest
+        return self.next_sequence
+
+    def read_frame_view(self) -> tuple[int, np.ndarray] | None:
+        """
+        Waits for the next frame and returns it in place.
+
+        Returns:
+            tuple | None: The sequence number and the raw frame, or None on timeout.
+        """
+        while True:
+            sequence = self._wait()
+            if sequence == 0:
+                return None
+            self.next_sequence = sequence + 1
+            frame = self.ring.view(sequence)
+            if frame is not None:
+                self.capture_time = float(self.ring.capture_times[sequence % self.ring.slot_count])
+                return sequence, frame
+            self.missed_frames += 1
+
+    def read_frame(self) -> np.ndarray | None:
+        """
+        Waits for the next frame and returns a copy of it.
+
+        Returns:
+            np.ndarray | None: The raw frame (PACKET_LENGTH uint8), or None on timeout.
+        """
+        while True:
+            item = self.read_frame_view()
+            if item is None:
+                return None
+            sequence, view = item
+            if self.frame_pool is not None:
+                frame = self.frame_pool.acquire(FramePool.RAW)
+            else:
+                frame = np.empty(ThermappConstants.PACKET_LENGTH, dtype=np.uint8)
+            np.copyto(frame, view)
+            if self.ring.is_current(sequence):
+                return frame
+            # Overwritten while copying
+            self.missed_frames += 1
+            if self.frame_pool is not None:
+                self.frame_pool.release(frame)
+
+    def close(self) -> None:
+        """
+        Detaches from the ring. Frames returned by `read_frame_view` become unusable.
+        """
+        self.ring.close()
+
+
+def run_acquisition(ring_name: str, condition, stop_event, replay: str | None, synthetic: bool, realtime: bool):
+    """
+    Entry point of the acquisition process: reads frames from the camera, or from a
+    replay source, and publishes them into the shared ring until `stop_event` is set.
+    """
+    # Imported here so consumers of the ring do not need the framing and USB modules
+    from frame import FrameReader
+    from queue_handler import ThermappDataQueueHandler
+
+    ring = SharedFrameRing(ring_name)
+    device = None
+    if replay or synthetic:
+        from replay import ReplayDevice
+        source = ReplayDevice(recording=replay, realtime=realtime)
+    else:
+        import libusb as usb
+        from config import ThermappConfig
+        from device import ThermappDevice
+        from transfer import AsyncTransferManager, TransferManager
+        result = usb.init(None)
+        if result < 0:
+            print(f"Failed to initialize libusb: {result} - {usb.strerror(result)}")
+            return
+        device = ThermappDevice()
+        device.open()
+        source = AsyncTransferManager(TransferManager(device, ThermappConfig().config_package))
+
+    frame_pool = FramePool(raw_count=4, calibrated_count=0, display_count=0)
+    frame_reader = FrameReader(frame_pool=frame_pool)
+    ThermappDataQueueHandler.read_timeout = 0.5
+    received_data_ring = ThermappDataQueueHandler.received_data_ring
+    synchronizer = frame_reader.synchronizer
+
+    transfer_thread = threading.Thread(target=source.start_async_read, daemon=True)
+    transfer_thread.start()
+    try:
+        while not stop_event.is_set():
+            frame = frame_reader.read_frame()
+            if frame is None:
+                continue
+            ring.publish(frame, frame_reader.capture_time)
+            frame_pool.release(frame)
+            ring.set("resync_count", synchronizer.resync_count)
+            ring.set("skipped_bytes", synchronizer.skipped_bytes)
+            ring.set("overflow_bytes", received_data_ring.overflow_bytes)
+            with condition:
+                condition.notify_all()
+    finally:
+        source.stop_async_read()
+        transfer_thread.join(timeout=2)
+        if device is not None:
+            device.close()
+        ring.close()
+
+
+class AcquisitionProcess:
+    """
+    Runs device I/O and framing in a separate process, so that processing stalls
+    in this process (e.g. inference) cannot delay the USB callbacks.
+
+    Complete frames are published into a SharedFrameRing; read them with a
+    SharedFrameReader, in this process or in child processes the acquisition is
+    passed to. It has the same start/stop interface as AsyncTransferManager and
+    can be passed to ThermappApplication as its frame source.
+
+    Attributes:
+        ring (SharedFrameRing): The ring frames are published into.
+        ring_name (str): Name of the ring's shared memory block.
+        condition (multiprocessing.Condition): Notified whenever a frame is published.
+    """
+
+    def __init__(self, slot_count: int = 16, replay: str | None = None, synthetic: bool = False,
+                 realtime: bool = True):
+        """
+        Initializes the AcquisitionProcess and creates its ring.
+
+        Args:
+            slot_count (int): Number of frames the ring holds.
+            replay (str | None): Path prefix of a recording to replay instead of reading the camera.
+            synthetic (bool): Whether to stream synthetic frames instead of reading the camera.
+            realtime (bool): Whether replayed frames are paced at the camera frame rate.
+        """
+        self.ring = SharedFrameRing(slot_count=slot_count)
+        self.ring_name = self.ring.name
+        self.condition = mp.Condition()
+        self.stop_event = mp.Event()
+        self.source_arguments = (replay, synthetic, realtime)
+        self.process = None
+        self.async_status = ThermappStatus.INACTIVE
+
+    def start_async_read(self):
+        """
+        Starts the acquisition process.
+        """
+        if self.process is not None:
+            return -2
+        self.stop_event.clear()
+        self.process = mp.Process(target=run_acquisition, daemon=True,
+                                  args=(self.ring_name, self.condition, self.stop_event) + self.source_arguments)
+        self.process.start()
+        self.async_status = ThermappStatus.RUNNING
+
+    def stop_async_read(self, timeout: float = 5.0):
+        """
+        Stops the acquisition process. The ring is kept, so it can be started again.
+
+        Args:
+            timeout (float): Maximum time to wait for the process to exit before terminating it.
+        """
+        if self.process is None:
+            return
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.process = None
+        self.async_status = ThermappStatus.INACTIVE
+
+    def close(self):
+        """
+        Stops the acquisition process if it runs, then detaches from the ring and removes
+        it. Readers should be closed first; the acquisition cannot be started again.
+        """
+        self.stop_async_read()
+        self.ring.close()
+        self.ring.unlink()
@@ -0,0 +1,83 @@
+
+import numpy as np
+import pytest
+
+from agc import AutomaticGainControl
+
+PIXELS = 4096
+ZERO = AutomaticGainControl.ZERO_LEVEL
+
+
+def ramp_frame(low: int = ZERO - 1000, high: int = ZERO + 1000) -> np.ndarray:
+    return np.linspace(low, high, PIXELS).astype(np.uint16)
+
+
+def apply(agc: AutomaticGainControl, frame: np.ndarray) -> np.ndarray:
+    return agc.apply(frame, np.empty(frame.shape, dtype=np.uint8))
+
+
+@pytest.mark.parametrize("mode", [AutomaticGainControl.LINEAR, AutomaticGainControl.PERCENTILE,
+                                  AutomaticGainControl.PLATEAU])
+def test_every_mode_gives_a_monotonic_table(mode):
+    agc = AutomaticGainControl(mode=mode, pixel_count=PIXELS)
+    frame = ramp_frame()
+    out = apply(agc, frame)
+    assert np.all(np.diff(agc.lut.astype(np.int16)) >= 0)
+    np.testing.assert_array_equal(out, agc.lut[frame])
+    assert agc.low < agc.high
+    # A ramp covers the whole output range
+    assert out.min() <= 5 and out.max() >= 250
+
+
+def test_linear_maps_the_occupied_range():
+    agc = AutomaticGainControl(mode=AutomaticGainControl.LINEAR, pixel_count=PIXELS)
+    frame = ramp_frame()
+    out = apply(agc, frame)
+    assert (agc.low, agc.high) == (int(frame.min()), int(frame.max()))
+    assert (out[0], out[-1]) == (0, 255)
+    assert agc.lut[0] == 0 and agc.lut[-1] == 255
+
+
+def test_percentile_range_ignores_outliers():
+    agc = AutomaticGainControl(mode=AutomaticGainControl.PERCENTILE, low_percentile=1, high_percentile=99,
+                               pixel_count=PIXELS)
+    frame = ramp_frame()
+    frame[:10] = ZERO - 20000
+    frame[-10:] = ZERO + 20000
+    apply(agc, frame)
+    sorted_frame = np.sort(frame)
+    assert abs(agc.low - int(sorted_frame[PIXELS // 100])) <= 1
+    assert abs(agc.high - int(sorted_frame[PIXELS * 99 // 100])) <= 1
+
+
+def test_histogram_follows_a_scene_change():
+    agc = AutomaticGainControl(mode=AutomaticGainControl.LINEAR, smoothing=0.5, pixel_count=PIXELS)
+    apply(agc, ramp_frame())
+    new_frame = ramp_frame(ZERO + 5000, ZERO + 7000)
+    for _ in range(20):
+        apply(agc, new_frame)
+    assert (agc.low, agc.high) == (int(new_frame.min()), int(new_frame.max()))
+    agc.reset()
+    assert not agc.histogram.any()
+
+
+@pytest.mark.parametrize("mode", [AutomaticGainControl.LINEAR, AutomaticGainControl.PERCENTILE,
+                                  AutomaticGainControl.PLATEAU])
+def test_constant_frame(mode):
+    agc = AutomaticGainControl(mode=mode, pixel_count=PIXELS)
+    frame = np.full(PIXELS, ZERO, dtype=np.uint16)
+    for _ in range(3):
+        out = apply(agc, frame)
+    assert np.all(out == out[0])
+    assert agc.low <= agc.high
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        AutomaticGainControl(mode="gamma")
+    with pytest.raises(ValueError):
+        AutomaticGainControl(low_percentile=60, high_percentile=40)
+    with pytest.raises(ValueError):
+        AutomaticGainControl(smoothing=0)
+    with pytest.raises(ValueError):
+        AutomaticGainControl(plateau=0)
@@ -0,0 +1,64 @@
+
+import numpy as np
+import pytest
+
+from calibration import CalibrationRing
+
+
+def random_frames(count: int, pixel_count: int = 64, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 1 << 16, (count, pixel_count), dtype=np.uint16)
+
+
+def test_average_and_variance_of_the_newest_window():
+    frames = random_frames(25)
+    ring = CalibrationRing(capacity=12, window=5, pixel_count=64)
+    for frame in frames:
+        ring.append(frame)
+    newest = frames[-5:].astype(np.float64)
+    # The running sum stays exact however many frames went through it
+    np.testing.assert_array_equal(ring.window_sum, newest.sum(axis=0))
+    np.testing.assert_allclose(ring.average(), newest.mean(axis=0), rtol=1e-6)
+    np.testing.assert_allclose(ring.variance(), newest.var(axis=0), rtol=1e-4)
+
+
+def test_partial_window():
+    frames = random_frames(3)
+    ring = CalibrationRing(capacity=10, window=5, pixel_count=64)
+    for frame in frames:
+        ring.append(frame)
+    assert (len(ring), ring.window_count) == (3, 3)
+    np.testing.assert_allclose(ring.average(), frames.mean(axis=0), rtol=1e-6)
+
+
+def test_latest_and_capacity():
+    frames = random_frames(8)
+    ring = CalibrationRing(capacity=4, window=2, pixel_count=64)
+    for frame in frames:
+        ring.append(frame)
+    assert len(ring) == 4
+    np.testing.assert_array_equal(ring.latest(), frames[-1])
+    np.testing.assert_array_equal(ring.latest(3), frames[-4])
+    with pytest.raises(IndexError):
+        ring.latest(4)
+
+
+def test_append_copies_the_frame():
+    frame = random_frames(1)[0]
+    ring = CalibrationRing(capacity=2, window=1, pixel_count=64)
+    ring.append(frame)
+    expected = frame.copy()
+    frame[:] = 0
+    np.testing.assert_array_equal(ring.latest(), expected)
+
+
+def test_empty_ring_and_invalid_window():
+    ring = CalibrationRing(capacity=2, window=1, pixel_count=64)
+    with pytest.raises(ValueError):
+        ring.average()
+    ring.append(random_frames(1)[0])
+    ring.clear()
+    assert len(ring) == 0
+    with pytest.raises(ValueError):
+        CalibrationRing(capacity=4, window=5)
+    with pytest.raises(ValueError):
+        CalibrationRing(capacity=1000, window=CalibrationRing.MAX_WINDOW + 1)
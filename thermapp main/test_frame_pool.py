@@ -0,0 +1,55 @@
+
+import numpy as np
+import pytest
+
+from frame_pool import FramePool
+
+
+def test_acquire_reuses_released_buffers():
+    pool = FramePool(raw_count=1, calibrated_count=1, display_count=1)
+    buffer = pool.acquire(FramePool.DISPLAY)
+    assert buffer.dtype == np.uint8
+    pool.release(buffer)
+    assert pool.acquire(FramePool.DISPLAY) is buffer
+    assert pool.miss_counts[FramePool.DISPLAY] == 0
+
+
+def test_exhausted_kind_allocates_and_counts_a_miss():
+    pool = FramePool(raw_count=1, calibrated_count=0, display_count=0)
+    first = pool.acquire(FramePool.RAW)
+    second = pool.acquire(FramePool.RAW)
+    assert first is not second
+    assert pool.miss_counts[FramePool.RAW] == 1
+    assert pool.outstanding(FramePool.RAW) == 2
+    pool.release(first)
+    pool.release(second)
+    assert (pool.available(FramePool.RAW), pool.outstanding(FramePool.RAW)) == (2, 0)
+
+
+def test_view_is_released_as_its_buffer():
+    pool = FramePool(raw_count=1, calibrated_count=0, display_count=0)
+    buffer = pool.acquire(FramePool.RAW)
+    pool.release(buffer[32:].view(np.uint16))
+    assert pool.available(FramePool.RAW) == 1
+    assert pool.double_release_count == 0
+
+
+def test_double_and_foreign_releases_are_counted():
+    pool = FramePool(raw_count=0, calibrated_count=0, display_count=1)
+    buffer = pool.acquire(FramePool.DISPLAY)
+    pool.release(buffer)
+    pool.release(buffer)
+    pool.release(np.empty_like(buffer))
+    pool.release(None)
+    assert (pool.double_release_count, pool.foreign_release_count) == (1, 1)
+    assert pool.available(FramePool.DISPLAY) == 1
+
+
+def test_strict_pool_raises_on_bad_release():
+    pool = FramePool(raw_count=0, calibrated_count=0, display_count=1, strict=True)
+    buffer = pool.acquire(FramePool.DISPLAY)
+    pool.release(buffer)
+    with pytest.raises(ValueError):
+        pool.release(buffer)
+    with pytest.raises(ValueError):
+        pool.release(np.empty_like(buffer))
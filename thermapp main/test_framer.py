@@ -0,0 +1,98 @@
+
+import numpy as np
+import pytest
+
+from constants import FrameHeaders, ThermappConstants
+from frame import FrameReader
+from framer import FrameSynchronizer, find_header
+from queue_handler import ThermappDataQueueHandler
+from replay import SyntheticFrameGenerator
+from ring_buffer import ByteRingBuffer
+
+HEADER = FrameHeaders.START
+
+
+@pytest.fixture(autouse=True)
+def short_read_timeout(monkeypatch):
+    monkeypatch.setattr(ThermappDataQueueHandler, "read_timeout", 0.05)
+
+
+def stream(*parts) -> np.ndarray:
+    return np.concatenate([np.asarray(part, dtype=np.uint8) for part in parts])
+
+
+def test_find_header_at_start():
+    assert find_header(stream(HEADER, [1, 2, 3]), HEADER) == 0
+
+
+def test_find_header_after_near_misses():
+    # Partial matches of the first bytes must not be taken for the header
+    data = stream([0xA5, 0xA5, 0x00], [0xA5] * 5, HEADER, [7])
+    assert find_header(data, HEADER) == 8
+
+
+def test_find_header_from_start_position():
+    data = stream(HEADER, [0] * 10, HEADER)
+    assert find_header(data, HEADER, start=1) == 4 + 10
+
+
+def test_find_header_missing_or_incomplete():
+    assert find_header(stream([0] * 32), HEADER) == -1
+    assert find_header(stream([0] * 8, HEADER[:3]), HEADER) == -1
+    assert find_header(stream(HEADER[:2]), HEADER) == -1
+
+
+def test_synchronizer_resumes_scan_and_keeps_partial_header():
+    synchronizer = FrameSynchronizer()
+    data = stream([0] * 20, HEADER[:2])
+    assert synchronizer.find_start(data) == -1
+    # The incomplete header at the end must be scanned again
+    assert synchronizer.scan_position == len(data) - len(HEADER) + 1
+    data = stream(data, HEADER[2:], [0] * 4)
+    assert synchronizer.find_start(data) == 20
+
+
+def test_synchronizer_counts_one_resync_per_episode():
+    synchronizer = FrameSynchronizer()
+    synchronizer.skip(5)
+    synchronizer.skip(3)
+    assert (synchronizer.resync_count, synchronizer.skipped_bytes) == (1, 8)
+    synchronizer.consume(ThermappConstants.PACKET_LENGTH)
+    synchronizer.skip(2)
+    assert (synchronizer.resync_count, synchronizer.skipped_bytes, synchronizer.frame_count) == (2, 10, 1)
+
+
+def test_synchronizer_checks_end_header():
+    packet = SyntheticFrameGenerator().generate(0)
+    synchronizer = FrameSynchronizer()
+    assert synchronizer.has_valid_end_header(packet)
+    packet[-1] = 0
+    assert not synchronizer.has_valid_end_header(packet)
+    assert not synchronizer.has_valid_end_header(packet[:-1])
+
+
+def test_frame_reader_resyncs_after_garbage():
+    generator = SyntheticFrameGenerator()
+    packets = [generator.generate(number) for number in range(3)]
+    ring = ByteRingBuffer()
+    ring.write(packets[0])
+    ring.write(np.full(100, 0x11, dtype=np.uint8))
+    ring.write(packets[1])
+    # A frame cut short by a new start header is dropped
+    ring.write(packets[2][:1000])
+    ring.write(packets[2])
+
+    reader = FrameReader(ring=ring)
+    frames = []
+    while True:
+        frame = reader.read_frame()
+        if frame is None and not ring.available:
+            break
+        if frame is not None:
+            frames.append(frame.copy())
+
+    assert len(frames) == 3
+    for frame, packet in zip(frames, packets):
+        np.testing.assert_array_equal(frame, packet)
+    assert reader.synchronizer.resync_count == 2
+    assert reader.synchronizer.skipped_bytes >= 100 + 1000
@@ -0,0 +1,122 @@
+
+import threading
+import urllib.error
+import urllib.request
+import pytest
+
+from metrics import Histogram, MetricsRegistry, MetricsServer
+
+
+def samples(text: str) -> dict:
+    # Metric lines of an exposition, by name and labels
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            result[name] = float(value)
+    return result
+
+
+def test_histogram_buckets():
+    histogram = Histogram(bounds=(1, 2, 5))
+    for value in (0.5, 1, 1.5, 3, 10):
+        histogram.observe(value)
+    # A value equal to a bound falls in that bucket, as Prometheus' "le" requires
+    assert histogram.counts == [2, 1, 1, 1]
+    assert (histogram.count, histogram.sum) == (5, 16.0)
+
+
+def test_stage_histogram_exposition_is_cumulative():
+    registry = MetricsRegistry(prefix="test")
+    for seconds in (0.00005, 0.003, 0.003, 2.0):
+        registry.observe_stage("parse", seconds)
+    text = registry.render()
+    assert "# TYPE test_stage_seconds histogram" in text
+    values = samples(text)
+    buckets = [value for name, value in values.items() if name.startswith("test_stage_seconds_bucket")]
+    assert buckets == sorted(buckets)
+    assert values['test_stage_seconds_bucket{stage="parse",le="0.0001"}'] == 1
+    assert values['test_stage_seconds_bucket{stage="parse",le="0.005"}'] == 3
+    assert values['test_stage_seconds_bucket{stage="parse",le="1.0"}'] == 3
+    assert values['test_stage_seconds_bucket{stage="parse",le="+Inf"}'] == 4
+    assert values['test_stage_seconds_count{stage="parse"}'] == 4
+    assert values['test_stage_seconds_sum{stage="parse"}'] == pytest.approx(2.00605)
+
+
+def test_buckets_never_decrease_during_an_observation():
+    registry = MetricsRegistry(prefix="test")
+    registry.observe_stage("parse", 0.003)
+    # A scrape between the bucket and the count updates of observe
+    registry.stage_histograms["parse"].counts[-1] += 1
+    values = samples(registry.render())
+    assert values['test_stage_seconds_bucket{stage="parse",le="+Inf"}'] == 2
+    assert values['test_stage_seconds_count{stage="parse"}'] == 2
+    assert values['test_stage_seconds_bucket{stage="parse",le="1.0"}'] == 1
+
+
+def test_counters_and_help():
+    registry = MetricsRegistry(prefix="test")
+    registry.increment("frames_total", help_text="Frames processed.")
+    registry.increment("frames_total", 2)
+    text = registry.render()
+    assert "# HELP test_frames_total Frames processed." in text
+    assert "# TYPE test_frames_total counter" in text
+    assert samples(text)["test_frames_total"] == 3
+    registry.reset()
+    assert registry.render() == "\n"
+
+
+def test_counter_increments_from_several_threads_add_up():
+    registry = MetricsRegistry(prefix="test")
+
+    def count():
+        for _ in range(20000):
+            registry.increment("invalid_frames_total")
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.counters["invalid_frames_total"] == 80000
+
+
+def test_callbacks_and_label_escaping():
+    registry = MetricsRegistry(prefix="test")
+    registry.register("queue_depth", lambda: 7, help_text="Queued frames.")
+    registry.register("pool_misses", lambda: {"raw": 1, 'a"b\\c\nd': 2}, kind="counter", label="pool")
+    registry.register("absent", lambda: None)
+    registry.register("broken", lambda: 1 / 0)
+    text = registry.render()
+    values = samples(text)
+    assert values["test_queue_depth"] == 7
+    assert "# TYPE test_pool_misses counter" in text
+    assert values['test_pool_misses{pool="raw"}'] == 1
+    assert values['test_pool_misses{pool="a\\"b\\\\c\\nd"}'] == 2
+    assert "test_absent" not in text
+    assert "test_broken" not in text
+    registry.unregister("queue_depth")
+    assert "test_queue_depth" not in registry.render()
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(prefix="test")
+    registry.enabled = False
+    registry.observe_stage("parse", 0.001)
+    registry.increment("frames_total")
+    assert registry.render() == "\n"
+
+
+def test_server_exposes_metrics():
+    registry = MetricsRegistry(prefix="test")
+    registry.increment("frames_total")
+    server = MetricsServer(registry, port=0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert samples(response.read().decode("utf-8"))["test_frames_total"] == 1
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other", timeout=5)
+    finally:
+        server.stop()
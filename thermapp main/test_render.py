@@ -0,0 +1,76 @@
+
+import numpy as np
+import pytest
+
+from render import PALETTES, FrameRenderer
+
+WIDTH, HEIGHT = 40, 30
+
+
+def random_frame(seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (HEIGHT, WIDTH), dtype=np.uint8)
+
+
+def expected_image(frame: np.ndarray, palette: str, scale: int) -> np.ndarray:
+    colors = PALETTES[palette].reshape(256, 3)[frame]
+    return np.repeat(np.repeat(colors, scale, axis=0), scale, axis=1)
+
+
+@pytest.mark.parametrize("scale", [1, 2, 3, 4])
+@pytest.mark.parametrize("palette", list(PALETTES))
+def test_render_matches_palette_lookup_and_repeat(scale, palette):
+    renderer = FrameRenderer(WIDTH, HEIGHT, scale=scale, palette=palette)
+    frame = random_frame(scale)
+    image = renderer.render(frame.reshape(-1))
+    assert image.shape == (HEIGHT * scale, WIDTH * scale, 3)
+    np.testing.assert_array_equal(image, expected_image(frame, palette, scale))
+
+
+def test_render_reuses_its_image():
+    renderer = FrameRenderer(WIDTH, HEIGHT, scale=2)
+    first = renderer.render(random_frame(1))
+    second = renderer.render(random_frame(2))
+    assert first is second
+    np.testing.assert_array_equal(second, expected_image(random_frame(2), FrameRenderer.WHITE_HOT, 2))
+
+
+def test_palettes_are_ordered_cold_to_hot():
+    white_hot = PALETTES[FrameRenderer.WHITE_HOT].reshape(256, 3)
+    assert white_hot[0].tolist() == [0, 0, 0]
+    assert white_hot[255].tolist() == [255, 255, 255]
+    # The tables are shared by all renderers
+    with pytest.raises(ValueError):
+        white_hot[0] = 1
+
+
+def test_text_overlay_is_blended_and_removed():
+    renderer = FrameRenderer(WIDTH, HEIGHT, scale=4)
+    frame = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+    renderer.set_text("label", "42.0", (4, 30))
+    image = renderer.render(frame)
+    assert image[:40, :80].any()
+    # Only the area of the text is touched
+    assert not image[60:].any()
+    renderer.remove_text("label")
+    assert not renderer.render(frame).any()
+    renderer.set_text("label", "42.0", (4, 30))
+    renderer.set_text("label", "", (4, 30))
+    assert not renderer.render(frame).any()
+
+
+def test_text_outside_the_image_is_clipped():
+    renderer = FrameRenderer(WIDTH, HEIGHT, scale=1)
+    renderer.set_text("edge", "clipped text", (WIDTH - 5, 5))
+    renderer.set_text("outside", "gone", (WIDTH + 100, HEIGHT + 100))
+    renderer.render(random_frame())
+
+
+def test_invalid_palette_and_scale():
+    with pytest.raises(ValueError):
+        FrameRenderer(WIDTH, HEIGHT, palette="sepia")
+    with pytest.raises(ValueError):
+        FrameRenderer(WIDTH, HEIGHT, scale=0)
+    renderer = FrameRenderer(WIDTH, HEIGHT)
+    with pytest.raises(ValueError):
+        renderer.palette = "sepia"
+    assert renderer.palette == FrameRenderer.WHITE_HOT
@@ -0,0 +1,69 @@
+
+import threading
+import numpy as np
+
+from ring_buffer import ByteRingBuffer
+
+
+def test_write_and_read_wrap_around():
+    ring = ByteRingBuffer(capacity=10)
+    out = np.empty(10, dtype=np.uint8)
+    assert ring.write(np.arange(7, dtype=np.uint8))
+    assert ring.read_into(out[:5]) == 5
+    # The next write wraps around the end of the storage
+    assert ring.write(np.arange(10, 16, dtype=np.uint8))
+    assert ring.available == 8
+    assert ring.read_into(out) == 8
+    np.testing.assert_array_equal(out[:8], [5, 6, 10, 11, 12, 13, 14, 15])
+    assert (ring.write_position, ring.read_position) == (13, 13)
+
+
+def test_overflowing_write_is_dropped_whole():
+    ring = ByteRingBuffer(capacity=8)
+    assert ring.write(np.ones(6, dtype=np.uint8))
+    assert not ring.write(np.ones(3, dtype=np.uint8))
+    assert (ring.overflow_count, ring.overflow_bytes, ring.available) == (1, 3, 6)
+
+
+def test_read_times_out_without_data():
+    ring = ByteRingBuffer(capacity=8)
+    assert ring.read_into(np.empty(4, dtype=np.uint8), timeout=0.01) == 0
+
+
+def test_clear_discards_unread_data():
+    ring = ByteRingBuffer(capacity=8)
+    ring.write(np.ones(5, dtype=np.uint8))
+    ring.clear()
+    assert ring.available == 0
+    assert ring.free == 8
+
+
+def test_wait_for_space():
+    ring = ByteRingBuffer(capacity=8)
+    ring.write(np.ones(8, dtype=np.uint8))
+    assert not ring.wait_for_space(1, timeout=0.01)
+    ring.read_into(np.empty(4, dtype=np.uint8))
+    assert ring.wait_for_space(4, timeout=0)
+
+
+def test_producer_and_consumer_threads_keep_order():
+    ring = ByteRingBuffer(capacity=64)
+    data = (np.arange(20000) % 251).astype(np.uint8)
+
+    def produce():
+        for start in range(0, data.size, 37):
+            chunk = data[start:start + 37]
+            ring.wait_for_space(chunk.size, timeout=5)
+            assert ring.write(chunk)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    received = np.empty_like(data)
+    copied = 0
+    while copied < data.size:
+        count = ring.read_into(received[copied:copied + 50], timeout=5)
+        assert count > 0
+        copied += count
+    producer.join()
+    np.testing.assert_array_equal(received, data)
+    assert ring.overflow_count == 0
@@ -0,0 +1,86 @@
+
+import numpy as np
+import pytest
+
+from roi import RoiEngine
+
+WIDTH, HEIGHT = 32, 24
+
+
+def random_frame(seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(4000, 12000, (HEIGHT, WIDTH), dtype=np.uint16)
+
+
+def expected_statistics(engine: RoiEngine, raw: np.ndarray, mask: np.ndarray) -> dict:
+    temperatures = engine.radiometric_converter.table[raw[mask.astype(bool)]].astype(np.float64)
+    result = {"min": temperatures.min(), "max": temperatures.max(), "mean": temperatures.mean()}
+    for q in engine.percentiles:
+        result[f"p{q:g}"] = np.percentile(temperatures, q)
+    return result
+
+
+def rectangle_mask(x: int, y: int, width: int, height: int) -> np.ndarray:
+    mask = np.zeros((HEIGHT, WIDTH), dtype=bool)
+    mask[y:y + height, x:x + width] = True
+    return mask
+
+
+def test_overlapping_regions_match_numpy():
+    engine = RoiEngine(WIDTH, HEIGHT, percentiles=(0, 10, 50, 95, 100))
+    rng = np.random.default_rng(1)
+    masks = {
+        "left": rectangle_mask(0, 0, 16, 24),
+        "center": rectangle_mask(8, 6, 16, 12),
+        "random": rng.random((HEIGHT, WIDTH)) < 0.3,
+    }
+    for name, mask in masks.items():
+        engine.add_mask(name, mask)
+    raw = random_frame()
+    statistics = engine.statistics_by_name(engine.compute(raw))
+    assert list(statistics) == list(masks)
+    for name, mask in masks.items():
+        expected = expected_statistics(engine, raw, mask)
+        assert statistics[name] == pytest.approx(expected, rel=1e-9)
+
+
+def test_flat_frame_and_rectangle_clipping():
+    engine = RoiEngine(WIDTH, HEIGHT)
+    engine.add_rectangle("corner", -4, -4, 8, 8)
+    raw = random_frame(2)
+    statistics = engine.statistics_by_name(engine.compute(raw.reshape(-1)))
+    assert statistics["corner"] == pytest.approx(expected_statistics(engine, raw, rectangle_mask(0, 0, 4, 4)))
+
+
+def test_polygon_region():
+    engine = RoiEngine(WIDTH, HEIGHT)
+    engine.add_polygon("square", [(2, 2), (9, 2), (9, 9), (2, 9)])
+    raw = random_frame(3)
+    statistics = engine.statistics_by_name(engine.compute(raw))
+    assert statistics["square"] == pytest.approx(expected_statistics(engine, raw, rectangle_mask(2, 2, 8, 8)))
+
+
+def test_replace_and_remove_regions():
+    engine = RoiEngine(WIDTH, HEIGHT)
+    raw = random_frame(4)
+    assert engine.compute(raw) is None
+    engine.add_rectangle("a", 0, 0, 4, 4)
+    engine.add_rectangle("b", 4, 4, 4, 4)
+    engine.compute(raw)
+    # Changing the regions after a frame recompiles them
+    engine.add_rectangle("a", 10, 10, 2, 2)
+    engine.remove("b")
+    statistics = engine.statistics_by_name(engine.compute(raw))
+    assert list(statistics) == ["a"]
+    assert statistics["a"] == pytest.approx(expected_statistics(engine, raw, rectangle_mask(10, 10, 2, 2)))
+    with pytest.raises(KeyError):
+        engine.remove("b")
+
+
+def test_invalid_regions_and_percentiles():
+    engine = RoiEngine(WIDTH, HEIGHT)
+    with pytest.raises(ValueError):
+        engine.add_mask("small", np.ones((HEIGHT, WIDTH - 1), dtype=bool))
+    with pytest.raises(ValueError):
+        engine.add_rectangle("outside", WIDTH, 0, 4, 4)
+    with pytest.raises(ValueError):
+        RoiEngine(WIDTH, HEIGHT, percentiles=(50, 101))
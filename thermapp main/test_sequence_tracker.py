@@ -0,0 +1,61 @@
+
+from sequence_tracker import FrameSequenceTracker
+
+
+def observe_all(tracker, frame_numbers):
+    return [tracker.observe(number, capture_time=float(index)) for index, number in enumerate(frame_numbers)]
+
+
+def test_consecutive_frames():
+    tracker = FrameSequenceTracker()
+    infos = observe_all(tracker, [10, 11, 12])
+    assert [info.status for info in infos] == [FrameSequenceTracker.FIRST, FrameSequenceTracker.OK,
+                                               FrameSequenceTracker.OK]
+    assert [info.sequence for info in infos] == [10, 11, 12]
+    assert (tracker.received, tracker.lost, tracker.loss_ratio) == (3, 0, 0.0)
+
+
+def test_gap_counts_missing_frames():
+    tracker = FrameSequenceTracker()
+    info = observe_all(tracker, [1, 2, 6])[-1]
+    assert (info.status, info.missing) == (FrameSequenceTracker.GAP, 3)
+    assert (tracker.lost, tracker.gaps, tracker.expected) == (3, 1, 6)
+
+
+def test_counter_wrap_is_unwrapped():
+    tracker = FrameSequenceTracker()
+    infos = observe_all(tracker, [0xFFFE, 0xFFFF, 0, 1])
+    assert [info.sequence for info in infos] == [0xFFFE, 0xFFFF, 0x10000, 0x10001]
+    assert tracker.lost == 0
+
+
+def test_late_frame_is_reordered_not_lost():
+    tracker = FrameSequenceTracker()
+    infos = observe_all(tracker, [1, 3, 2])
+    assert infos[1].missing == 1
+    assert (infos[2].status, infos[2].sequence) == (FrameSequenceTracker.REORDERED, 2)
+    assert (tracker.lost, tracker.reordered, tracker.received) == (0, 1, 3)
+
+
+def test_duplicates():
+    tracker = FrameSequenceTracker()
+    infos = observe_all(tracker, [5, 5, 6, 5])
+    assert infos[1].status == FrameSequenceTracker.DUPLICATE
+    assert infos[3].status == FrameSequenceTracker.DUPLICATE
+    assert (tracker.duplicates, tracker.received) == (2, 2)
+
+
+def test_large_jump_is_a_reset_not_a_loss():
+    tracker = FrameSequenceTracker(max_gap=100)
+    infos = observe_all(tracker, [1, 2, 5000, 5001])
+    assert infos[2].status == FrameSequenceTracker.RESET
+    # The unwrapped sequence keeps increasing across the reset
+    assert [info.sequence for info in infos] == [1, 2, 3, 4]
+    assert (tracker.resets, tracker.lost) == (1, 0)
+
+
+def test_capture_rate():
+    tracker = FrameSequenceTracker()
+    for number in range(11):
+        tracker.observe(number, capture_time=number / 25)
+    assert abs(tracker.capture_rate - 25) < 1e-9
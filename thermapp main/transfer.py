@@ -1,105 +1,237 @@
-
-import libusb as usb
-import ctypes as ct
-
-from constants import ThermappConstants, ThermappEndpoint, ThermappStatus
-from usb_callbacks import USBCallbacks
-
-class TransferManager:
-    """
-    Manages USB transfers for a Thermapp device.
-    """
-
-    def __init__(self, device, config):
-        self.device = device
-        self.config = config
-        self.outgoing_transfer = None
-        self.incoming_transfers = []
-        self.incoming_buffers = []
-    
-    def allocate_outgoing_transfer(self):
-        self.outgoing_transfer = usb.alloc_transfer(0)
-        if self.outgoing_transfer is None:
-            raise OSError("Cannot allocate space for outgoing_transfer")
-
-        usb.fill_bulk_transfer(
-            self.outgoing_transfer,
-            self.device.handler,
-            ThermappEndpoint.OUT | 2,
-            ct.cast(ct.addressof(self.config), ct.POINTER(ct.c_ubyte)),
-            64,
-            TransferManager.outgoing_transfer_callback,
-            None,
-            -1
-        )
-        usb.submit_transfer(self.outgoing_transfer)
-    
-    def allocate_async_buffers(self):
-        buffer_count = ThermappConstants.DEFAULT_BUFFER_COUNT + int(ThermappConstants.DEFAULT_BUFFER_REMAIN != 0)
-        buffer_size = ThermappConstants.DEFAULT_BUFFER_LENGTH * ct.sizeof(ct.c_ubyte)
-
-        self.incoming_transfers = [usb.alloc_transfer(0) for _ in range(buffer_count)]
-        self.incoming_buffers = [ct.create_string_buffer(buffer_size) for _ in range(buffer_count)]
-    
-    @usb.transfer_cb_fn
-    def outgoing_transfer_callback(transfer):
-        pass
-            
-class AsyncTransferManager:
-    """
-    Manages asynchronous USB transfers.
-    """
-    def __init__(self, transfer_manager):
-        self.transfer_manager = transfer_manager
-        self.async_status = ThermappStatus.INACTIVE
-    
-    def stop_async_read(self):
-        """
-        Stops asynchronous USB transfers.
-        """
-        if self.async_status == ThermappStatus.INACTIVE:
-            return  # If already stopped, do nothing
-
-        self.async_status = ThermappStatus.CANCELING
-        
-        # Cancel all incoming transfers
-        for transfer in self.transfer_manager.incoming_transfers:
-            if transfer:
-                usb.cancel_transfer(transfer)
-
-        # Clean up resources
-        self.transfer_manager.incoming_transfers.clear()
-        self.transfer_manager.incoming_buffers.clear()
-
-        # Reset async status
-        self.async_status = ThermappStatus.INACTIVE
-
-    def start_async_read(self):
-        self.transfer_manager.incoming_transfers = []
-        self.transfer_manager.incoming_buffers = []
-
-        if self.async_status != ThermappStatus.INACTIVE:
-            return -2
-
-        self.async_status = ThermappStatus.RUNNING
-        self.transfer_manager.allocate_outgoing_transfer()
-        self.transfer_manager.allocate_async_buffers()
-
-        for i in range(ThermappConstants.DEFAULT_BUFFER_COUNT + int(ThermappConstants.DEFAULT_BUFFER_REMAIN != 0)):
-            usb.fill_bulk_transfer(
-                self.transfer_manager.incoming_transfers[i],
-                self.transfer_manager.device.handler,
-                ThermappEndpoint.IN | 1,
-                ct.cast(ct.pointer(self.transfer_manager.incoming_buffers[i]), ct.POINTER(ct.c_ubyte)),
-                ThermappConstants.DEFAULT_BUFFER_LENGTH,
-                USBCallbacks.handle_usb_transfer_completion,
-                None,
-                ThermappConstants.BULK_TIMEOUT
-            )
-            if usb.submit_transfer(self.transfer_manager.incoming_transfers[i]) < 0:
-                self.async_status = ThermappStatus.CANCELING
-                break
-
-        tv = usb.timeval(1, 0)
-        while self.async_status != ThermappStatus.INACTIVE:
-            usb.handle_events_timeout_completed(None, ct.byref(tv), None)
\ No newline at end of file
+
+import itertools
+import time
+import libusb as usb
+import ctypes as ct
+
+from constants import ThermappConstants, ThermappEndpoint, ThermappStatus
+from usb_callbacks import TransferStatistics, USBCallbacks
+
+class TransferStrategy:
+    """
+    Describes how incoming bulk transfers are sized and kept in flight.
+
+    Attributes:
+        name (str): Name under which the strategy's statistics are reported.
+        transfer_size (int): Size of each incoming transfer in bytes.
+        transfer_count (int): Number of incoming transfers kept in flight.
+        reuse_buffers (bool): Whether transfers and buffers are kept and reused when reading restarts.
+    """
+
+    def __init__(self, name: str = "chunked",
+                 transfer_size: int = ThermappConstants.DEFAULT_BUFFER_LENGTH,
+                 transfer_count: int = ThermappConstants.DEFAULT_BUFFER_COUNT + int(ThermappConstants.DEFAULT_BUFFER_REMAIN != 0),
+                 reuse_buffers: bool = True):
+        """
+        Initializes the TransferStrategy. The defaults match one frame worth of 16 KB transfers.
+
+        Args:
+            name (str): Name under which the strategy's statistics are reported.
+            transfer_size (int): Size of each incoming transfer in bytes.
+            transfer_count (int): Number of incoming transfers kept in flight.
+            reuse_buffers (bool): Whether transfers and buffers are kept and reused when reading restarts.
+
+        Raises:
+            ValueError: If the size or count is not positive.
+        """
+        if transfer_size <= 0 or transfer_count <= 0:
+            raise ValueError("Transfer size and count must be positive.")
+        self.name = name
+        self.transfer_size = transfer_size
+        self.transfer_count = transfer_count
+        self.reuse_buffers = reuse_buffers
+
+    @classmethod
+    def chunked(cls) -> "TransferStrategy":
+        """
+        Returns the original strategy: 16 KB transfers, one frame's worth in flight.
+        """
+        return cls()
+
+    @classmethod
+    def frame_sized(cls, transfer_count: int = 4) -> "TransferStrategy":
+        """
+        Returns a strategy with whole-frame transfers, i.e. one callback per frame.
+
+        Args:
+            transfer_count (int): Number of frame-sized transfers kept in flight.
+        """
+        return cls("frame_sized", ThermappConstants.PACKET_LENGTH, transfer_count)
+
+    def __repr__(self):
+        return (f"TransferStrategy(name={self.name!r}, transfer_size={self.transfer_size}, "
+                f"transfer_count={self.transfer_count}, reuse_buffers={self.reuse_buffers})")
+
+class TransferManager:
+    """
+    Manages USB transfers for a Thermapp device.
+    """
+
+    def __init__(self, device, config):
+        self.device = device
+        self.config = config
+        self.outgoing_transfer = None
+        self.incoming_transfers = []
+        self.incoming_buffers = []
+    
+    def allocate_outgoing_transfer(self):
+        self.outgoing_transfer = usb.alloc_transfer(0)
+        if self.outgoing_transfer is None:
+            raise OSError("Cannot allocate space for outgoing_transfer")
+
+        usb.fill_bulk_transfer(
+            self.outgoing_transfer,
+            self.device.handler,
+            ThermappEndpoint.OUT | 2,
+            ct.cast(ct.addressof(self.config), ct.POINTER(ct.c_ubyte)),
+            64,
+            TransferManager.outgoing_transfer_callback,
+            None,
+            -1
+        )
+        usb.submit_transfer(self.outgoing_transfer)
+    
+    def allocate_async_buffers(self, strategy: TransferStrategy):
+        buffer_count = strategy.transfer_count
+        buffer_size = strategy.transfer_size * ct.sizeof(ct.c_ubyte)
+
+        if (strategy.reuse_buffers and len(self.incoming_buffers) == buffer_count
+                and all(ct.sizeof(buffer) == buffer_size for buffer in self.incoming_buffers)):
+            return
+
+        self.incoming_transfers = [usb.alloc_transfer(0) for _ in range(buffer_count)]
+        self.incoming_buffers = [ct.create_string_buffer(buffer_size) for _ in range(buffer_count)]
+    
+    @usb.transfer_cb_fn
+    def outgoing_transfer_callback(transfer):
+        pass
+            
+class AsyncTransferManager:
+    """
+    Manages asynchronous USB transfers.
+
+    Attributes:
+        strategy (TransferStrategy): How incoming transfers are sized and kept in flight.
+        statistics (dict): TransferStatistics for each strategy used, keyed by strategy name.
+        ring (ByteRingBuffer | None): Ring buffer the received data is routed to, None for
+            the one ThermappDataQueueHandler reads from.
+        route_id (int | None): Id passed as user data to the transfers when a ring is given.
+        cancel_timeout (float): Longest time stop_async_read waits for cancelled transfers.
+    """
+    _route_ids = itertools.count(1)
+
+    def __init__(self, transfer_manager, strategy: TransferStrategy | None = None, ring=None):
+        self.transfer_manager = transfer_manager
+        self.async_status = ThermappStatus.INACTIVE
+        self.strategy = strategy or TransferStrategy.chunked()
+        self.statistics = {}
+        self.ring = ring
+        self.route_id = next(AsyncTransferManager._route_ids) if ring is not None else None
+        self.cancel_timeout = 1.0
+        # Transfers that were still in flight when reading stopped; libusb may still
+        # write to them, so they are kept alive but never reused
+        self._abandoned = []
+
+    def set_strategy(self, strategy: TransferStrategy):
+        """
+        Sets the transfer strategy used the next time reading starts.
+        """
+        self.strategy = strategy
+
+    @property
+    def current_statistics(self) -> TransferStatistics:
+        """
+        TransferStatistics: Statistics of the current strategy.
+        """
+        return self.statistics.setdefault(self.strategy.name, TransferStatistics())
+    
+    def stop_async_read(self):
+        """
+        Stops asynchronous USB transfers.
+
+        Cancelled transfers are handed back by libusb while events are handled, so
+        events are handled here too until they are back, whether or not another thread
+        handles them as well. Transfers are only reused once they are back; those still
+        in flight after `cancel_timeout` are set aside.
+        """
+        if self.async_status == ThermappStatus.INACTIVE:
+            return  # If already stopped, do nothing
+
+        self.async_status = ThermappStatus.CANCELING
+        USBCallbacks.stopping.add(self.route_id)
+
+        # Cancel all incoming transfers and wait until libusb hands them back
+        transfers = [transfer for transfer in self.transfer_manager.incoming_transfers if transfer]
+        for transfer in transfers:
+            usb.cancel_transfer(transfer)
+        deadline = time.monotonic() + self.cancel_timeout
+        tv = usb.timeval(0, 10000)
+        while not USBCallbacks.all_returned(transfers) and time.monotonic() < deadline:
+            usb.handle_events_timeout_completed(None, ct.byref(tv), None)
+        returned = USBCallbacks.all_returned(transfers)
+        USBCallbacks.stopping.discard(self.route_id)
+        if not returned:
+            print("Incoming transfers still in flight after cancelling, they are not reused.")
+            self._abandoned.append((list(self.transfer_manager.incoming_transfers),
+                                    list(self.transfer_manager.incoming_buffers)))
+
+        # Clean up resources unless they are reused on the next start
+        if not self.strategy.reuse_buffers or not returned:
+            self.transfer_manager.incoming_transfers.clear()
+            self.transfer_manager.incoming_buffers.clear()
+
+        # Reset async status
+        self.async_status = ThermappStatus.INACTIVE
+
+    def start_async_read(self):
+        if self.submit_transfers() < 0:
+            return -2
+
+        tv = usb.timeval(1, 0)
+        while self.async_status != ThermappStatus.INACTIVE:
+            usb.handle_events_timeout_completed(None, ct.byref(tv), None)
+
+    def submit_transfers(self) -> int:
+        """
+        Submits the configuration and incoming transfers without handling events.
+
+        The transfers complete while another thread handles libusb events, which lets
+        several devices share one event thread.
+
+        Returns:
+            int: 0 on success, -2 if reading was already started, or the libusb error
+            code if an incoming transfer could not be submitted.
+        """
+        if self.async_status != ThermappStatus.INACTIVE:
+            return -2
+
+        self.async_status = ThermappStatus.RUNNING
+        self.transfer_manager.allocate_outgoing_transfer()
+        self.transfer_manager.allocate_async_buffers(self.strategy)
+
+        statistics = self.current_statistics
+        statistics.reset()
+        if self.ring is None:
+            USBCallbacks.statistics = statistics
+        else:
+            USBCallbacks.routes[self.route_id] = (self.ring, statistics)
+
+        for i in range(self.strategy.transfer_count):
+            usb.fill_bulk_transfer(
+                self.transfer_manager.incoming_transfers[i],
+                self.transfer_manager.device.handler,
+                ThermappEndpoint.IN | 1,
+                ct.cast(ct.pointer(self.transfer_manager.incoming_buffers[i]), ct.POINTER(ct.c_ubyte)),
+                self.strategy.transfer_size,
+                USBCallbacks.handle_usb_transfer_completion,
+                self.route_id,
+                ThermappConstants.BULK_TIMEOUT
+            )
+            transfer = self.transfer_manager.incoming_transfers[i]
+            USBCallbacks.transfer_submitted(transfer)
+            result = usb.submit_transfer(transfer)
+            if result < 0:
+                USBCallbacks.transfer_returned(transfer)
+                self.stop_async_read()
+                return result
+        return 0
\ No newline at end of file
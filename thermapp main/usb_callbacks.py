@@ -1,21 +1,152 @@
-
-
-import libusb as usb
-import numpy as np
-from constants import ThermappTransferStatus
-from queue_handler import ThermappDataQueueHandler
-
-class USBCallbacks:
-    @usb.transfer_cb_fn
-    def handle_usb_transfer_completion(transfer):
-        """
-        Callback function for USB transfer completion.
-
-        Args:
-            transfer (ctypes.Structure): USB transfer object.
-
-        """
-        if transfer.contents.status == ThermappTransferStatus.COMPLETED:
-            received_data = np.array(transfer.contents.buffer[:transfer.contents.actual_length])
-            ThermappDataQueueHandler.enqueue_received_data(received_data)
-            usb.submit_transfer(transfer)
\ No newline at end of file
+
+
+import threading
+import time
+import ctypes as ct
+import libusb as usb
+import numpy as np
+from constants import ThermappTransferStatus
+from metrics import metrics_registry
+from queue_handler import ThermappDataQueueHandler
+
+class TransferStatistics:
+    """
+    Counts completed incoming transfers to measure throughput and callback rate.
+
+    Attributes:
+        callback_count (int): Number of completed transfers handled by the callback.
+        byte_count (int): Number of bytes received.
+        start_time (float): Time at which counting started.
+    """
+
+    def __init__(self):
+        """
+        Initializes the counters.
+        """
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Resets the counters and restarts the measurement period.
+        """
+        self.callback_count = 0
+        self.byte_count = 0
+        self.start_time = time.perf_counter()
+
+    def record(self, length: int) -> None:
+        """
+        Records one completed transfer.
+
+        Args:
+            length (int): Number of bytes received in the transfer.
+        """
+        self.callback_count += 1
+        self.byte_count += length
+
+    @property
+    def elapsed(self) -> float:
+        """
+        float: Seconds since counting started.
+        """
+        return time.perf_counter() - self.start_time
+
+    @property
+    def throughput(self) -> float:
+        """
+        float: Received bytes per second.
+        """
+        elapsed = self.elapsed
+        return self.byte_count / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def callback_rate(self) -> float:
+        """
+        float: Completed transfers per second.
+        """
+        elapsed = self.elapsed
+        return self.callback_count / elapsed if elapsed > 0 else 0.0
+
+
+class USBCallbacks:
+    """
+    Callbacks invoked by libusb from the event loop thread.
+
+    Transfers submitted with a route id as their user data are delivered to that
+    route's ring buffer and statistics, so that several cameras can share one
+    event thread. Other transfers go to ThermappDataQueueHandler. The data of a
+    route that was removed is dropped.
+
+    Completed transfers are resubmitted unless their route is stopping or removed. A transfer is
+    in flight from its submission until libusb hands it back without it being
+    resubmitted, for instance after it was cancelled; only then may it be reused.
+
+    Attributes:
+        statistics (TransferStatistics): Counters updated for every completed incoming transfer without a route.
+        routes (dict): Ring buffer and TransferStatistics of each route, keyed by route id.
+        stopping (set): Route ids whose transfers are not resubmitted; None for transfers without a route.
+        in_flight (set): Addresses of the transfers in flight.
+    """
+    statistics = TransferStatistics()
+    routes = {}
+    stopping = set()
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+
+    @staticmethod
+    def transfer_key(transfer) -> int:
+        return ct.addressof(transfer.contents)
+
+    @classmethod
+    def transfer_submitted(cls, transfer) -> None:
+        """
+        Records a transfer as in flight. Call it before submitting the transfer.
+        """
+        with cls.in_flight_lock:
+            cls.in_flight.add(cls.transfer_key(transfer))
+
+    @classmethod
+    def transfer_returned(cls, transfer) -> None:
+        """
+        Records that libusb handed a transfer back, or that submitting it failed.
+        """
+        with cls.in_flight_lock:
+            cls.in_flight.discard(cls.transfer_key(transfer))
+
+    @classmethod
+    def all_returned(cls, transfers) -> bool:
+        """
+        Returns True if none of the given transfers is in flight.
+        """
+        keys = {cls.transfer_key(transfer) for transfer in transfers}
+        with cls.in_flight_lock:
+            return not keys & cls.in_flight
+
+    @usb.transfer_cb_fn
+    def handle_usb_transfer_completion(transfer):
+        """
+        Callback function for USB transfer completion.
+
+        Args:
+            transfer (ctypes.Structure): USB transfer object.
+
+        """
+        route_id = transfer.contents.user_data
+        if transfer.contents.status == ThermappTransferStatus.COMPLETED:
+            start = time.perf_counter()
+            # View the transfer buffer in place; the ring buffer makes the only copy
+            received_data = np.ctypeslib.as_array(transfer.contents.buffer,
+                                                  shape=(transfer.contents.actual_length,))
+            route = USBCallbacks.routes.get(route_id)
+            if route_id is None:
+                ThermappDataQueueHandler.enqueue_received_data(received_data)
+                USBCallbacks.statistics.record(transfer.contents.actual_length)
+            elif route is not None:  # None once the route's camera is closed
+                ring, statistics = route
+                ring.write(received_data)
+                statistics.record(transfer.contents.actual_length)
+            resubmitted = (route_id not in USBCallbacks.stopping and (route_id is None or route is not None)
+                           and usb.submit_transfer(transfer) >= 0)
+            metrics_registry.observe_stage("acquisition", time.perf_counter() - start)
+            if resubmitted:
+                return
+        USBCallbacks.transfer_returned(transfer)
\ No newline at end of file
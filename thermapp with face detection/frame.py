@@ -1,178 +1,379 @@
-import threading
-import numpy as np
-import cv2
-from constants import FrameHeaders, ThermappConstants
-from queue_handler import ThermappDataQueueHandler
-import time
-
-# Planck conversion constants 
-R1, B, F, O, R2 , E = 17711.559, 1447.2, 0.57999998, -4096, 0.025931966, 0.987  
-
-def pixels_to_celsius(count: float) -> float:
-    # Force to float32 so downstream math works
-    c = np.float32(count)
-
-    # **Subtract** the offset, then scale
-    L = (c - O) * R2/E
-    # avoid zero or negative arguments to log
-    if L <= 0:
-        L = 1e-3
-
-    # invert Planck’s law
-    T_k = B / np.log(R1 / L + F)
-    T_k =  T_k + 25
-
-    # to Celsius
-    return float(T_k - 273.15) 
-
-class FrameReader:
-    """
-    Reads and processes frames from a data queue.
-    """
-    
-    def __init__(self):
-        self.remaining_data = np.zeros((0), dtype=np.uint8)
-
-    def read_frame(self) -> np.ndarray | None:
-        data = self.remaining_data.copy()
-
-        # Find and align the start header
-        while True:
-            data = self._ensure_data_length(data, ThermappConstants.PACKET_LENGTH)
-            start_header_position = self._find_subarray_position(data, FrameHeaders.START)
-            if start_header_position > -1:
-                data = data[start_header_position:]
-                break
-            else:
-                data = data[-len(FrameHeaders.START) + 1:]
-
-        data = self._ensure_data_length(data, ThermappConstants.PACKET_LENGTH)
-
-        if self._has_valid_end_header(data):
-            self.remaining_data = np.zeros((0), dtype=np.uint8)
-            return data.astype(np.uint8)
-        else:
-            self.remaining_data = data[len(FrameHeaders.START):]
-            return None
-
-    def _ensure_data_length(self, data: np.ndarray, required_length: int) -> np.ndarray:
-        while len(data) < required_length:
-            new_data = ThermappDataQueueHandler.read_data_from_queue(required_length - len(data))
-            if new_data.size == 0:
-                break
-            data = np.append(data, new_data)
-        return data
-
-    def _find_subarray_position(self, array: np.ndarray, subarray: np.ndarray) -> int:
-        subarray_length = len(subarray)
-        for i in range(len(array) - subarray_length + 1):
-            if (array[i:i + subarray_length] == subarray).all():
-                return i
-        return -1
-    
-    def _has_valid_end_header(self, data: np.ndarray) -> bool:
-        return data.size >= len(FrameHeaders.END) and np.array_equal(data[-len(FrameHeaders.END):], FrameHeaders.END)
-
-
-class DisplayThread:
-    """
-    Displays only the raw thermal frames in a window with FPS, basic stats,
-    and live temperature overlay at the mouse cursor.
-    """
-    def __init__(self, resize_factor=2):
-        # Frame queue and threading
-        self.frame_queue = []
-        self.lock = threading.Lock()
-        self.running = True
-
-        # Upscaling factor
-        self.resize_factor = resize_factor
-
-        # FPS tracking
-        self.prev_time = None
-        self.fps = 0.0
-
-        # For mouse‐driven temperature overlay
-        self.last_pixel_frame = None       # last_pixels holds the 8-bit, calibration+offset image
-        self.temp_text = ''        # text to overlay
-        self.text_pos = (10, 30)   # where to draw the text
-
-
-        # Launch display thread
-        self.thread = threading.Thread(target=self.run, daemon=True)
-        self.thread.start()
-
-    def _mouse_callback(self, event, x, y, flags, param):
-        if event == cv2.EVENT_MOUSEMOVE and self.last_pixel_frame is not None:
-            h, w = self.last_pixel_frame.shape
-            fx, fy = x // self.resize_factor, y // self.resize_factor
-            if 0 <= fx < w and 0 <= fy < h:
-                count = float(self.last_pixel_frame[fy, fx])
-                temp_c =  pixels_to_celsius(count)
-                self.temp_text = f"{temp_c:.1f}C"
-                # offset the text so it doesn't cover the cursor
-                self.text_pos = (x + 10, y - 10)
-
-    def enqueue_frame(self, frame: np.ndarray):
-        with self.lock:
-            self.frame_queue.append(frame)
-
-    def run(self):
-        while self.running:
-            frame = None
-            with self.lock:
-                if self.frame_queue:
-                    frame = self.frame_queue.pop(0)
-            if frame is not None:
-                self.display_frame(frame)
-            else:
-                cv2.waitKey(1)
-
-    def display_frame(self, calibrated_frame: np.ndarray):
-        # 1) compute raw stats
-        min_v = int(calibrated_frame.min())
-        max_v = int(calibrated_frame.max())
-
-        # 2) reshape to 2D
-        h, w = 288, 384
-        pixels_8bit = calibrated_frame.reshape((h, w)).astype(np.uint8)
-        self.last_pixel_frame = pixels_8bit  # store for mouse callback
-
-        # 3) prepare raw-BGR
-        raw_bgr = cv2.cvtColor(pixels_8bit, cv2.COLOR_GRAY2BGR)
-
-        # 4) upscale
-        factor = self.resize_factor
-        raw_res = cv2.resize(
-            raw_bgr,
-            (w * factor, h * factor),
-            interpolation=cv2.INTER_NEAREST
-        )
-
-        # 5) compute FPS
-        now = time.time()
-        if self.prev_time is not None:
-            dt = now - self.prev_time
-            if dt > 0:
-                self.fps = 1.0 / dt
-        self.prev_time = now
-
-        # 6) overlay resolution and stats
-        overlay = f"Res: {w}x{h}  FPS: {self.fps:4.1f}  Min:{min_v}  Max:{max_v}"
-        cv2.putText(raw_res, overlay, (10, 20),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-        # 7) overlay temperature at cursor
-        if self.temp_text:
-            cv2.putText(raw_res, self.temp_text, self.text_pos,
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-
-        # 8) show
-        cv2.imshow('Thermal Raw', raw_res)
-        cv2.setMouseCallback('Thermal Raw', self._mouse_callback)
-        cv2.waitKey(1)
-
-    def stop(self):
-        self.running = False
-        self.thread.join()
-        cv2.destroyWindow('Thermal Raw')
+import threading
+from collections import deque
+import numpy as np
+import cv2
+from constants import FrameHeaders, ThermappConstants
+from framer import FrameSynchronizer
+from metrics import metrics_registry
+from queue_handler import ChunkAssembler, ThermappDataQueueHandler
+from radiometry import RadiometricConverter
+from render import FrameRenderer
+import time
+
+class FrameReader:
+    """
+    Reads and processes frames from a data queue.
+    """
+    
+    def __init__(self, frame_pool=None, ring=None):
+        # Each camera has its own ring buffer; None reads from the shared one
+        self.ring = ring if ring is not None else ThermappDataQueueHandler.received_data_ring
+        self.assembler = ChunkAssembler(frame_pool=frame_pool, ring=self.ring)
+        self.synchronizer = FrameSynchronizer()
+        # Monotonic time at which the last returned frame was completed
+        self.capture_time = None
+
+    def read_frame(self) -> np.ndarray | None:
+        # Time spent waiting for the USB stream is not part of the framing stage
+        ring = self.ring
+        start = time.perf_counter()
+        wait_start = ring.wait_seconds
+        frame = self._read_frame()
+        metrics_registry.observe_stage("framing", time.perf_counter() - start - (ring.wait_seconds - wait_start))
+        return frame
+
+    def _read_frame(self) -> np.ndarray | None:
+        # Find and align the start header
+        while True:
+            data = self._ensure_data_length(ThermappConstants.PACKET_LENGTH)
+            start_header_position = self.synchronizer.find_start(data)
+            if start_header_position > -1:
+                self._skip(start_header_position)
+                break
+            else:
+                self._skip(max(len(data) - len(FrameHeaders.START) + 1, 0))
+                if len(data) < ThermappConstants.PACKET_LENGTH:
+                    # The read timed out; keep what we have for the next call
+                    return None
+
+        data = self._ensure_data_length(ThermappConstants.PACKET_LENGTH)
+        if len(data) < ThermappConstants.PACKET_LENGTH:
+            return None
+
+        if self.synchronizer.has_valid_end_header(data):
+            self.synchronizer.consume(ThermappConstants.PACKET_LENGTH)
+            self.capture_time = time.monotonic()
+            return self.assembler.take_frame(ThermappConstants.PACKET_LENGTH)
+        else:
+            self._skip(len(FrameHeaders.START))
+            metrics_registry.increment("invalid_frames_total", help_text="Frames discarded for a missing end header")
+            return None
+
+    def _ensure_data_length(self, required_length: int) -> np.ndarray:
+        self.assembler.fill(required_length)
+        return self.assembler.data
+
+    def _skip(self, count: int) -> None:
+        self.synchronizer.skip(count)
+        self.assembler.discard(count)
+
+
+class FrameChannel:
+    """
+    Bounded hand-off of frames between a producer and a consumer thread.
+
+    The policy decides what happens when a frame is put into a full channel:
+    LATEST keeps only the newest frame, so the consumer always gets the most
+    recent one; DROP_OLDEST keeps the newest `capacity` frames; BLOCK makes the
+    producer wait for room. Frames that are replaced or discarded are passed to
+    `on_drop`, e.g. to return them to a frame pool.
+
+    Attributes:
+        LATEST (str): Keep only the newest frame.
+        DROP_OLDEST (str): Discard the oldest frame when full.
+        BLOCK (str): Wait for room when full.
+        policy (str): One of LATEST, DROP_OLDEST or BLOCK.
+        capacity (int): Maximum number of frames held; always 1 for LATEST.
+        put_count (int): Number of frames put into the channel.
+        dropped_count (int): Number of frames discarded without being taken.
+    """
+    LATEST = "latest"
+    DROP_OLDEST = "drop_oldest"
+    BLOCK = "block"
+
+    def __init__(self, policy: str = LATEST, capacity: int = 1, on_drop=None):
+        """
+        Initializes the FrameChannel.
+
+        Args:
+            policy (str): One of LATEST, DROP_OLDEST or BLOCK.
+            capacity (int): Maximum number of frames held. Ignored for LATEST.
+            on_drop (callable | None): Called with every frame that is discarded.
+
+        Raises:
+            ValueError: If the policy or capacity is invalid.
+        """
+        if policy not in (self.LATEST, self.DROP_OLDEST, self.BLOCK):
+            raise ValueError(f"Unknown frame channel policy '{policy}'.")
+        if capacity < 1:
+            raise ValueError("Frame channel capacity must be at least 1.")
+        self.policy = policy
+        self.capacity = 1 if policy == self.LATEST else capacity
+        self.on_drop = on_drop
+        self.put_count = 0
+        self.dropped_count = 0
+        self.closed = False
+        self._frames = deque()
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def put(self, frame: np.ndarray, timeout: float | None = None) -> bool:
+        """
+        Puts a frame into the channel according to its policy.
+
+        Args:
+            frame (np.ndarray): The frame to hand over.
+            timeout (float | None): With BLOCK, maximum time to wait for room, or None to wait forever.
+
+        Returns:
+            bool: False if the frame itself was dropped because the channel is closed or
+            the wait timed out, True otherwise.
+        """
+        dropped = None
+        with self._condition:
+            if self.policy == self.BLOCK:
+                self._condition.wait_for(lambda: self.closed or len(self._frames) < self.capacity, timeout)
+            if self.closed or len(self._frames) >= self.capacity and self.policy == self.BLOCK:
+                dropped = frame
+            else:
+                if len(self._frames) >= self.capacity:
+                    dropped = self._frames.popleft()
+                self._frames.append(frame)
+                self.put_count += 1
+                self._condition.notify_all()
+            if dropped is not None:
+                self.dropped_count += 1
+
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return dropped is not frame
+
+    def get(self, timeout: float | None = 0) -> np.ndarray | None:
+        """
+        Takes the oldest frame in the channel.
+
+        Args:
+            timeout (float | None): Maximum time to wait for a frame, 0 not to wait
+                or None to wait until a frame arrives or the channel is closed.
+
+        Returns:
+            np.ndarray | None: The frame, or None if there was none in time.
+        """
+        with self._condition:
+            if not self._frames and timeout != 0:
+                self._condition.wait_for(lambda: self.closed or self._frames, timeout)
+            if not self._frames:
+                return None
+            frame = self._frames.popleft()
+            self._condition.notify_all()
+            return frame
+
+    def close(self) -> None:
+        """
+        Wakes up waiting threads and drops all frames still in the channel.
+        """
+        with self._condition:
+            self.closed = True
+            frames = list(self._frames)
+            self._frames.clear()
+            self.dropped_count += len(frames)
+            self._condition.notify_all()
+        if self.on_drop is not None:
+            for frame in frames:
+                self.on_drop(frame)
+
+
+class DisplayThread:
+    """
+    Displays only the raw thermal frames in a window with FPS, basic stats,
+    and live temperature overlay at the mouse cursor.
+
+    Each displayed image may come with the raw uint16 pixel data it was made from.
+    The display keeps a reference to it, not a copy, until the next image replaces
+    it, and reads temperatures from the raw counts.
+
+    Images are colored, upscaled and annotated by a FrameRenderer. Rendered images
+    are also passed to the render sinks, such as recorders or streams, in headless
+    mode too.
+    """
+    def __init__(self, resize_factor=2, frame_pool=None, headless=False,
+                 channel_policy=FrameChannel.LATEST, channel_capacity=1, idle_timeout=0.05,
+                 radiometric_converter=None, palette=FrameRenderer.WHITE_HOT):
+        # Bounded frame hand-off; by default only the newest frame waits for display,
+        # so a slow display drops frames instead of falling behind
+        self.frame_channel = FrameChannel(channel_policy, channel_capacity, on_drop=self._release_frames)
+        self.running = True
+
+        # Longest wait for a frame before the window events are handled
+        self.idle_timeout = idle_timeout
+
+        # Headless mode renders frames without opening a window
+        self.headless = headless
+        self.last_rendered = None
+        self.render_sinks = []
+
+        # Upscaling factor
+        self.resize_factor = resize_factor
+        self.renderer = FrameRenderer(scale=resize_factor, palette=palette)
+
+        # Displayed frames are released to the pool once they are replaced
+        self.frame_pool = frame_pool
+
+        # FPS tracking; the stats overlay is refreshed at most every overlay_interval
+        # seconds, so its text is not rasterized again for every frame
+        self.prev_time = None
+        self.fps = 0.0
+        self.overlay_interval = 0.5
+        self.overlay_time = None
+
+        # For mouse‐driven temperature overlay
+        self.last_pixel_frame = None       # last_pixels holds the 8-bit, calibration+offset image
+        self.last_raw_frame = None         # raw counts of the displayed image, if given
+        self.raw_lock = threading.Lock()   # held while the raw frame is read or replaced
+        self.radiometric_converter = radiometric_converter or RadiometricConverter()
+        self.cursor = None         # frame pixel under the mouse
+        self.temp_text = ''        # text to overlay
+        self.text_pos = (10, 30)   # where to draw the text
+
+
+        # Launch display thread
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def _mouse_callback(self, event, x, y, flags, param):
+        if event == cv2.EVENT_MOUSEMOVE and self.last_pixel_frame is not None:
+            h, w = self.last_pixel_frame.shape
+            fx, fy = x // self.resize_factor, y // self.resize_factor
+            if 0 <= fx < w and 0 <= fy < h:
+                # The temperature is read when the next frame is rendered
+                self.cursor = (fx, fy)
+                # offset the text so it doesn't cover the cursor
+                self.text_pos = (x + 10, y - 10)
+
+    def _release_frames(self, frames):
+        if self.frame_pool is not None:
+            for frame in frames:
+                self.frame_pool.release(frame)
+
+    def enqueue_frame(self, frame: np.ndarray, raw: np.ndarray | None = None) -> bool:
+        """
+        Hands an image, and optionally the raw pixel data it was made from, to the display.
+
+        Both belong to the display afterwards and are released to the frame pool once
+        replaced, including when the frame is dropped. They must be pooled buffers, or
+        views of them, that the caller neither uses nor releases afterwards; a caller
+        that keeps the raw data hands over a pooled copy of it instead.
+
+        Args:
+            frame (np.ndarray): The 8-bit image.
+            raw (np.ndarray | None): The raw uint16 pixel data, used for temperatures.
+
+        Returns:
+            bool: False if the frame was dropped right away.
+        """
+        return self.frame_channel.put((frame, raw))
+
+    def temperature_at(self, x: int, y: int) -> float | None:
+        """
+        Returns the temperature of a pixel of the displayed frame.
+
+        Args:
+            x (int): Column of the pixel in the frame.
+            y (int): Row of the pixel in the frame.
+
+        Returns:
+            float | None: The temperature in degrees Celsius, or None if the displayed
+            frame came without raw data.
+        """
+        with self.raw_lock:
+            if self.last_raw_frame is None:
+                return None
+            return self.radiometric_converter.point(self.last_raw_frame, x, y)
+
+    def add_render_sink(self, sink) -> None:
+        """
+        Passes every rendered image to a callable, in the display thread.
+
+        Args:
+            sink: Callable taking the BGR image. The image is overwritten by the next
+                render, so the sink must copy what it keeps.
+        """
+        self.render_sinks.append(sink)
+
+    @property
+    def dropped_frames(self) -> int:
+        return self.frame_channel.dropped_count
+
+    def run(self):
+        while self.running:
+            # Sleep until a frame arrives; stop() closes the channel to wake up
+            frames = self.frame_channel.get(timeout=self.idle_timeout)
+            if frames is not None:
+                self.display_frame(*frames)
+            elif not self.headless:
+                # Keep the window responsive while no frames arrive
+                cv2.waitKey(1)
+
+    def display_frame(self, calibrated_frame: np.ndarray, raw: np.ndarray | None = None):
+        start = time.perf_counter()
+        raw_res = self.render_frame(calibrated_frame, raw)
+        self.last_rendered = raw_res
+        for sink in self.render_sinks:
+            sink(raw_res)
+        if self.headless:
+            metrics_registry.observe_stage("display", time.perf_counter() - start)
+            return
+
+        # 8) show
+        cv2.imshow('Thermal Raw', raw_res)
+        cv2.setMouseCallback('Thermal Raw', self._mouse_callback)
+        cv2.waitKey(1)
+        metrics_registry.observe_stage("display", time.perf_counter() - start)
+
+    def render_frame(self, calibrated_frame: np.ndarray, raw: np.ndarray | None = None) -> np.ndarray:
+        # 1) reshape to 2D
+        h, w = ThermappConstants.FRAME_HEIGHT, ThermappConstants.FRAME_WIDTH
+        pixels_8bit = calibrated_frame.reshape((h, w))
+        if pixels_8bit.dtype != np.uint8:
+            pixels_8bit = pixels_8bit.astype(np.uint8)
+        if self.frame_pool is not None:
+            self.frame_pool.release(self.last_pixel_frame)
+        self.last_pixel_frame = pixels_8bit  # store for mouse callback
+        with self.raw_lock:
+            previous_raw = self.last_raw_frame
+            self.last_raw_frame = raw.reshape((h, w)) if raw is not None else None
+        if self.frame_pool is not None:
+            self.frame_pool.release(previous_raw)
+
+        # 2) compute FPS
+        now = time.time()
+        if self.prev_time is not None:
+            dt = now - self.prev_time
+            if dt > 0:
+                self.fps = 1.0 / dt
+        self.prev_time = now
+
+        # 3) overlay resolution and stats
+        if self.overlay_time is None or now - self.overlay_time >= self.overlay_interval:
+            self.overlay_time = now
+            min_v, max_v = cv2.minMaxLoc(pixels_8bit)[:2]
+            self.renderer.set_text("stats", f"Res: {w}x{h}  FPS: {self.fps:4.1f}  Min:{int(min_v)}  Max:{int(max_v)}",
+                                   (10, 20))
+
+        # 4) overlay temperature at cursor
+        if self.cursor is not None:
+            temperature = self.temperature_at(*self.cursor)
+            self.temp_text = f"{temperature:.1f}C" if temperature is not None else ''
+        self.renderer.set_text("temperature", self.temp_text, self.text_pos, color=(0, 255, 255))
+
+        # 5) color, upscale and blend the overlays
+        return self.renderer.render(pixels_8bit)
+
+    def stop(self):
+        self.running = False
+        self.frame_channel.close()
+        self.thread.join()
+        if not self.headless:
+            cv2.destroyWindow('Thermal Raw')
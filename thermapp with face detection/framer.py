@@ -0,0 +1,133 @@
+
+import numpy as np
+
+from constants import FrameHeaders, ThermappConstants
+
+
+def find_header(data: np.ndarray, header: np.ndarray, start: int = 0) -> int:
+    """
+    Finds the first occurrence of a header in a byte array using vectorized comparisons.
+
+    Candidate positions are taken from the first header byte and then filtered
+    with one comparison per remaining header byte, so the cost is a single pass
+    over the data plus the (small) number of candidates.
+
+    Args:
+        data (np.ndarray): The uint8 array to search.
+        header (np.ndarray): The uint8 header to look for.
+        start (int): Position from which to start searching.
+
+    Returns:
+        int: The position of the header, or -1 if it was not found.
+    """
+    header_length = len(header)
+    stop = len(data) - header_length + 1
+    if stop <= start:
+        return -1
+
+    # Fast path for an aligned stream, avoids building the comparison mask
+    if np.array_equal(data[start:start + header_length], header):
+        return start
+
+    candidates = np.flatnonzero(data[start:stop] == header[0]) + start
+    for offset in range(1, header_length):
+        if candidates.size == 0:
+            return -1
+        candidates = candidates[data[candidates + offset] == header[offset]]
+
+    return int(candidates[0]) if candidates.size else -1
+
+
+class FrameSynchronizer:
+    """
+    Locates frame boundaries in the raw byte stream received from the device.
+
+    The synchronizer remembers how far it has scanned the buffer it is given, so
+    bytes are only inspected once even when a frame arrives over several calls.
+    Callers report the bytes they drop from the front of the buffer through
+    `skip` (garbage discarded while resyncing) and `consume` (a complete frame).
+
+    Attributes:
+        packet_length (int): Length of a complete frame in bytes.
+        scan_position (int): Offset in the current buffer up to which the stream was scanned.
+        skipped_bytes (int): Total number of bytes discarded while resyncing.
+        resync_count (int): Number of times the stream lost alignment.
+        frame_count (int): Number of frames consumed with valid headers.
+    """
+
+    def __init__(self, packet_length: int = ThermappConstants.PACKET_LENGTH):
+        """
+        Initializes the FrameSynchronizer.
+
+        Args:
+            packet_length (int): Length of a complete frame in bytes.
+        """
+        self.packet_length = packet_length
+        self.scan_position = 0
+        self.skipped_bytes = 0
+        self.resync_count = 0
+        self.frame_count = 0
+        self._resyncing = False
+
+    def find_start(self, data: np.ndarray) -> int:
+        """
+        Finds the start header in the buffer, continuing from the last scan position.
+
+        Args:
+            data (np.ndarray): The buffered stream data.
+
+        Returns:
+            int: The position of the start header, or -1 if it is not in the buffer yet.
+        """
+        position = find_header(data, FrameHeaders.START, self.scan_position)
+        if position < 0:
+            # The last bytes may hold the beginning of a header that is not complete yet
+            self.scan_position = max(len(data) - len(FrameHeaders.START) + 1, self.scan_position)
+            return -1
+        self.scan_position = position
+        return position
+
+    def has_valid_end_header(self, data: np.ndarray) -> bool:
+        """
+        Checks that a frame starting at the beginning of the buffer ends with the end header.
+
+        Args:
+            data (np.ndarray): The buffered stream data, aligned on a start header.
+
+        Returns:
+            bool: True if the end header is where it is expected.
+        """
+        end = self.packet_length
+        return data.size >= end and np.array_equal(data[end - len(FrameHeaders.END):end], FrameHeaders.END)
+
+    def skip(self, count: int) -> None:
+        """
+        Records that bytes were discarded from the front of the buffer while resyncing.
+
+        Args:
+            count (int): Number of bytes discarded.
+        """
+        if count <= 0:
+            return
+        if not self._resyncing:
+            self._resyncing = True
+            self.resync_count += 1
+        self.skipped_bytes += count
+        self.scan_position = max(self.scan_position - count, 0)
+
+    def consume(self, count: int) -> None:
+        """
+        Records that a complete frame was removed from the front of the buffer.
+
+        Args:
+            count (int): Number of bytes removed.
+        """
+        self._resyncing = False
+        self.frame_count += 1
+        self.scan_position = max(self.scan_position - count, 0)
+
+    def reset(self) -> None:
+        """
+        Forgets the scan position, e.g. when the buffered data is thrown away.
+        """
+        self.scan_position = 0
@@ -1,47 +1,63 @@
-
-
-import libusb as usb
-import sys
-import threading
-from application import ThermappApplication
-from device import ThermappDevice
-
-if __name__ == '__main__':
-    def keyboard_input(connector, device):
-        try:
-            while True:
-                key = input("Press 'q' to stop the device: ")
-                if key.lower() == 'q':
-                    connector.stop()
-                    device.close()
-                    break
-        except KeyboardInterrupt:
-            connector.stop()
-            device.close()
-
-    def main():
-        # Initialize libusb
-        r = usb.init(None)
-        if r < 0:
-            print(f"Failed to initialize libusb: {r} - {usb.strerror(r)}")
-            sys.exit(1)
-
-        try:
-            # Open Thermapp device
-            device = ThermappDevice()
-            device.open()
-
-            # Start Thermapp application
-            connector = ThermappApplication(device=device)
-            connector.start()
-
-            # Start keyboard input monitoring thread
-            keyboard_thread = threading.Thread(target=keyboard_input, args=(connector, device,))
-            keyboard_thread.start()
-            keyboard_thread.join()
-
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            sys.exit(1)
-
+
+
+import argparse
+import libusb as usb
+import sys
+import threading
+from application import ThermappApplication
+from device import ThermappDevice
+
+if __name__ == '__main__':
+    def keyboard_input(connector, device):
+        try:
+            while True:
+                key = input("Press 'q' to stop the device: ")
+                if key.lower() == 'q':
+                    connector.stop()
+                    device.close()
+                    break
+        except KeyboardInterrupt:
+            connector.stop()
+            device.close()
+
+    def parse_arguments():
+        parser = argparse.ArgumentParser(description="ThermApp thermal imaging application with face detection")
+        parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                            help="serve pipeline metrics at http://127.0.0.1:PORT/metrics")
+        parser.add_argument("--denoise", type=float, metavar="ALPHA",
+                            help="filter frames over time, weighting each new frame with ALPHA (0-1]")
+        parser.add_argument("--motion-threshold", type=float, metavar="COUNTS",
+                            help="with --denoise, stop filtering pixels that change by more than COUNTS")
+        return parser.parse_args()
+
+    def main():
+        args = parse_arguments()
+
+        # Initialize libusb
+        r = usb.init(None)
+        if r < 0:
+            print(f"Failed to initialize libusb: {r} - {usb.strerror(r)}")
+            sys.exit(1)
+
+        try:
+            # Open Thermapp device
+            device = ThermappDevice()
+            device.open()
+
+            # Start Thermapp application
+            connector = ThermappApplication(device=device, denoise_alpha=args.denoise,
+                                            motion_threshold=args.motion_threshold)
+            if args.metrics_port is not None:
+                connector.start_metrics_server(args.metrics_port)
+            connector.start()
+
+            # Start keyboard input monitoring thread
+            keyboard_thread = threading.Thread(target=keyboard_input, args=(connector, device,))
+            keyboard_thread.start()
+            keyboard_thread.join()
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            sys.exit(1)
+
     main()
\ No newline at end of file